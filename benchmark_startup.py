@@ -0,0 +1,108 @@
+"""启动耗时基准测试：多次冷启动应用脚本和打包后的程序，统计各阶段耗时的分位数
+
+用法：
+    python benchmark_startup.py -n 20
+    python benchmark_startup.py -n 20 --exe dist/健康追踪应用.exe
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import startup_profiler
+
+# 报告中按此顺序列出各阶段；tkcalendar 在第一次打开带日期选择的界面时才导入，
+# 启动后立即退出的冷启动测试中没有这一阶段
+STAGES = ["interpreter_start", "import_tkinter", "first_paint", "load_data", "import_tkcalendar", "total"]
+
+
+def default_exe_path(current_dir):
+    """返回默认的打包程序路径（不存在则返回 None）"""
+    for candidate in (current_dir / "dist" / "健康追踪应用.exe",
+                      current_dir / "dist" / "健康追踪应用"):
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def launch_once(command, cwd, timeout):
+    """冷启动一次，返回 {阶段: 距启动的毫秒数}"""
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, "startup.json")
+        env = dict(os.environ)
+        env[startup_profiler.PROFILE_ENV] = report_path
+        env[startup_profiler.EXIT_ENV] = "1"
+
+        start = time.time()
+        env[startup_profiler.LAUNCH_TIME_ENV] = repr(start)
+        subprocess.run(command, cwd=cwd, env=env, timeout=timeout, check=True)
+        total = (time.time() - start) * 1000
+
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+
+    result = {"interpreter_start": report['interpreter_start_ms'], "total": total}
+    for stage in report['stages']:
+        result[stage['name']] = stage['since_launch_ms']
+    return result
+
+
+def percentile(values, p):
+    """最近秩法计算分位数"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[rank - 1]
+
+
+def benchmark(name, command, cwd, runs, timeout):
+    """多次启动并打印各阶段的分位数"""
+    samples = []
+    for i in range(runs):
+        samples.append(launch_once(command, cwd, timeout))
+        print(f"\r{name}: {i + 1}/{runs}", end="", flush=True)
+    print()
+
+    print(f"{'阶段':<20}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (毫秒，距启动)")
+    summary = {}
+    for stage in STAGES:
+        values = [sample[stage] for sample in samples if sample.get(stage) is not None]
+        if not values:
+            continue
+        summary[stage] = {p: percentile(values, p) for p in (50, 90, 99, 100)}
+        print(f"{stage:<20}" + "".join(f"{summary[stage][p]:>10.1f}" for p in (50, 90, 99, 100)))
+    print()
+    return summary
+
+
+def main(argv=None):
+    current_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="健康追踪应用启动耗时基准测试")
+    parser.add_argument("-n", "--runs", type=int, default=10, help="每个目标的冷启动次数")
+    parser.add_argument("--script", default=str(current_dir / "health_tracker_app.py"),
+                        help="应用主脚本路径")
+    parser.add_argument("--exe", help="打包后的程序路径，默认自动查找 dist 目录")
+    parser.add_argument("--no-exe", action="store_true", help="只测试脚本")
+    parser.add_argument("--cwd", default=str(current_dir), help="启动时的工作目录（数据文件所在目录）")
+    parser.add_argument("--timeout", type=float, default=120, help="单次启动超时秒数")
+    args = parser.parse_args(argv)
+
+    results = {}
+    results["script"] = benchmark("脚本", [sys.executable, args.script],
+                                  args.cwd, args.runs, args.timeout)
+
+    if not args.no_exe:
+        exe = Path(args.exe) if args.exe else default_exe_path(current_dir)
+        if exe is None or not exe.exists():
+            print("未找到打包后的程序，跳过（可用 --exe 指定路径）")
+        else:
+            results["exe"] = benchmark(f"打包程序 {exe.name}", [str(exe)],
+                                       args.cwd, args.runs, args.timeout)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""快照格式基准测试：生成多年的模拟数据，比较 JSON 与二进制快照的文件大小和读写耗时
+
+用法：
+    python benchmark_storage.py --years 5 -n 5
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from health_core import make_bmi_record, make_bmr_record, make_intake_item
+from health_storage import JournalStore, empty_data, read_snapshot, write_snapshot
+
+FOODS = ["米饭", "面条", "馒头", "鸡蛋", "牛奶", "苹果", "香蕉", "鸡胸肉", "牛肉", "青菜",
+         "豆腐", "酸奶", "燕麦", "全麦面包", "红薯", "西兰花", "三文鱼", "橙子", "坚果", "饺子"]
+
+
+def generate_data(years, seed=0):
+    """模拟每天一条BMI、每周一条代谢率记录和 4~8 样食物的数据"""
+    rng = random.Random(seed)
+    data = empty_data()
+    start = datetime.date.today() - datetime.timedelta(days=365 * years)
+    weight = 75.0
+    for i in range(365 * years):
+        date = (start + datetime.timedelta(days=i)).isoformat()
+        weight = round(min(95.0, max(50.0, weight + rng.uniform(-0.3, 0.3))), 1)
+        data['bmi_records'].append(make_bmi_record(weight, 175, date))
+        if i % 7 == 0:
+            data['bmr_records'].append(
+                make_bmr_record(weight, 175, 30 + i // 365, "男", rng.randint(1, 5), date)
+            )
+        data['calorie_intake'][date] = [
+            make_intake_item(rng.choice(FOODS), rng.randint(50, 800))
+            for _ in range(rng.randint(4, 8))
+        ]
+    return data
+
+
+def timed(func, runs):
+    """执行多次，返回耗时中位数（毫秒）"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def benchmark(years, runs):
+    """打印两种格式的大小、写入、读取和完整加载耗时"""
+    data = generate_data(years)
+    print(f"{years} 年数据：BMI {len(data['bmi_records'])} 条，代谢率 {len(data['bmr_records'])} 条，"
+          f"能量摄入 {sum(map(len, data['calorie_intake'].values()))} 条")
+    print(f"{'格式':<8}{'大小(KB)':>12}{'写入':>10}{'读取':>10}{'加载':>10}  (毫秒，中位数)")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, binary in (("JSON", False), ("二进制", True)):
+            path = os.path.join(tmp, f"health_data_{int(binary)}.json")
+            write_ms = timed(lambda: write_snapshot(path, data, 0, binary), runs)
+            read_ms = timed(lambda: read_snapshot(path), runs)
+            load_ms = timed(lambda: JournalStore(path).load(), runs)
+            size = os.path.getsize(path) / 1024
+            results[name] = {'size_kb': size, 'write_ms': write_ms, 'read_ms': read_ms,
+                             'load_ms': load_ms}
+            print(f"{name:<8}{size:>12.1f}{write_ms:>10.1f}{read_ms:>10.1f}{load_ms:>10.1f}")
+
+        reloaded, _ = read_snapshot(os.path.join(tmp, "health_data_1.json"))
+        if {key: reloaded[key] for key in data} != data:
+            raise AssertionError("二进制快照读回的数据与原数据不一致")
+    print()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较 JSON 与二进制快照的读写性能")
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 10], help="模拟数据的年数")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="每项测试的重复次数")
+    args = parser.parse_args(argv)
+    return {years: benchmark(years, args.runs) for years in args.years}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import datetime
+
+
+def date_range(start_date, end_date):
+    """生成从 start_date 到 end_date（含两端）的每一天"""
+    day = datetime.date.fromisoformat(start_date)
+    end = datetime.date.fromisoformat(end_date)
+    one_day = datetime.timedelta(days=1)
+    while day <= end:
+        yield day.isoformat()
+        day += one_day
+
+
+def analyze_range(store, start_date, end_date):
+    """分析日期区间内每天的热量平衡
+
+    返回按日期排列的列表，每项包含 date、intake（当日摄入）、tdee（当日生效的TDEE，
+    与 get_latest_tdee 语义相同，没有则为 None）、balance（TDEE - 摄入，正数为热量缺口）
+    和 cumulative（截至当天的累计缺口）。TDEE 通过一次归并批量解析，
+    摄入量来自每日总量缓存，整个区间只扫描一遍。
+    """
+    days = list(date_range(start_date, end_date))
+    tdees = store.latest_tdee_many(days)
+    totals = store.intake_totals
+
+    rows = []
+    cumulative = 0
+    for date, tdee in zip(days, tdees):
+        intake = totals.total_on(date)
+        if tdee is None:
+            balance = None
+        else:
+            balance = tdee - intake
+            cumulative += balance
+        rows.append({
+            'date': date,
+            'intake': intake,
+            'tdee': tdee,
+            'balance': balance,
+            'cumulative': cumulative
+        })
+    return rows
+
+
+def summarize_range(rows):
+    """汇总区间分析结果：总摄入、总消耗、累计缺口及有效天数"""
+    counted = [row for row in rows if row['tdee'] is not None]
+    return {
+        'days': len(rows),
+        'days_with_tdee': len(counted),
+        'total_intake': sum(row['intake'] for row in rows),
+        'total_tdee': sum(row['tdee'] for row in counted),
+        'balance': rows[-1]['cumulative'] if rows else 0
+    }
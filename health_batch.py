@@ -0,0 +1,133 @@
+"""批量计算 BMI、BMI类别、基础代谢率和TDEE
+
+安装了 NumPy 时按数组向量化计算并返回 NumPy 数组，否则逐条调用 health_core 中的
+公式并返回列表。两种方式的取整结果与界面中单条计算完全一致。
+NaN 和无穷大与非正数一样视为无效输入。
+"""
+import math
+
+from health_core import (
+    ACTIVITY_FACTORS, GENDERS, InvalidInputError, bmi_category, calculate_bmi,
+    calculate_bmr, calculate_tdee
+)
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖
+    np = None
+
+
+def _use_numpy(use_numpy):
+    if use_numpy is None:
+        return np is not None
+    if use_numpy and np is None:
+        raise ImportError("未安装 NumPy，请执行 pip install numpy 或使用 use_numpy=False")
+    return use_numpy
+
+
+def _check_lengths(*columns):
+    lengths = {len(column) for column in columns}
+    if len(lengths) > 1:
+        raise InvalidInputError("各列数据的长度必须一致")
+
+
+def _first_invalid(mask):
+    """返回掩码中第一个为 True 的行号"""
+    return int(np.argmax(mask))
+
+
+def compute_bmi_batch(weights, heights, use_numpy=None):
+    """批量计算BMI及类别，返回 {'bmi': ..., 'category': ...}"""
+    _check_lengths(weights, heights)
+
+    if not _use_numpy(use_numpy):
+        bmi = []
+        for i, (weight, height) in enumerate(zip(weights, heights)):
+            if not (math.isfinite(weight) and math.isfinite(height)) or weight <= 0 or height <= 0:
+                raise InvalidInputError(f"第 {i + 1} 行：体重和身高必须为有效的正数")
+            bmi.append(calculate_bmi(weight, height))
+        return {'bmi': bmi, 'category': [bmi_category(value) for value in bmi]}
+
+    weights = np.asarray(weights, dtype=np.float64)
+    heights = np.asarray(heights, dtype=np.float64)
+    invalid = ~(np.isfinite(weights) & np.isfinite(heights)) | (weights <= 0) | (heights <= 0)
+    if invalid.any():
+        raise InvalidInputError(f"第 {_first_invalid(invalid) + 1} 行：体重和身高必须为有效的正数")
+
+    # 运算顺序与 calculate_bmi 相同，得到的浮点数逐位一致
+    height_m = heights / 100
+    raw = weights / (height_m ** 2)
+    bmi = _round1(raw)
+
+    category = np.select(
+        [bmi < 18.5, bmi < 24, bmi < 28],
+        ["偏瘦", "正常", "超重"],
+        default="肥胖"
+    )
+    return {'bmi': bmi, 'category': category}
+
+
+def _round1(values):
+    """保留一位小数，结果与内置 round(x, 1) 一致
+
+    np.round 先乘 10 再取整，对十进制下恰好“逢五”的边界值可能与内置 round 相差一位，
+    这类值极少，单独用内置 round 重新计算。
+    """
+    rounded = np.round(values, 1)
+    scaled = values * 10
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_half):
+        rounded[i] = round(float(values[i]), 1)
+    return rounded
+
+
+def compute_batch(weights, heights, ages, genders, activity_levels, use_numpy=None):
+    """批量计算BMI、BMI类别、BMR和TDEE
+
+    genders 为“男”/“女”，activity_levels 为 1 到 5 的整数。
+    返回 {'bmi', 'category', 'bmr', 'tdee'}，每项与输入等长。
+    """
+    _check_lengths(weights, heights, ages, genders, activity_levels)
+    bmi = compute_bmi_batch(weights, heights, use_numpy)
+
+    if not _use_numpy(use_numpy):
+        bmr = []
+        tdee = []
+        rows = zip(weights, heights, ages, genders, activity_levels)
+        for i, (weight, height, age, gender, level) in enumerate(rows):
+            if not math.isfinite(age) or age <= 0:
+                raise InvalidInputError(f"第 {i + 1} 行：体重、身高和年龄必须为有效的正数")
+            if gender not in GENDERS:
+                raise InvalidInputError(f"第 {i + 1} 行：性别必须为“男”或“女”")
+            if level not in ACTIVITY_FACTORS:
+                raise InvalidInputError(f"第 {i + 1} 行：活动水平必须为1到5之间的整数")
+            value = calculate_bmr(weight, height, age, gender)
+            bmr.append(value)
+            tdee.append(calculate_tdee(value, level))
+        return dict(bmi, bmr=bmr, tdee=tdee)
+
+    weights = np.asarray(weights, dtype=np.float64)
+    heights = np.asarray(heights, dtype=np.float64)
+    ages = np.asarray(ages)
+    genders = np.asarray(genders)
+    levels = np.asarray(activity_levels)
+
+    checks = [
+        (~np.isfinite(ages.astype(np.float64)) | (ages <= 0), "体重、身高和年龄必须为有效的正数"),
+        (~np.isin(genders, GENDERS), "性别必须为“男”或“女”"),
+        (~np.isin(levels, list(ACTIVITY_FACTORS)), "活动水平必须为1到5之间的整数"),
+    ]
+    for invalid, message in checks:
+        if invalid.any():
+            raise InvalidInputError(f"第 {_first_invalid(invalid) + 1} 行：{message}")
+
+    # Mifflin-St Jeor 公式，运算顺序与 calculate_bmr 相同；np.rint 与 round 同为“四舍六入五成双”
+    offset = np.where(genders == "男", 5, -161)
+    bmr = np.rint(10 * weights + 6.25 * heights - 5 * ages + offset).astype(np.int64)
+
+    factor_table = np.zeros(max(ACTIVITY_FACTORS) + 1)
+    for level, factor in ACTIVITY_FACTORS.items():
+        factor_table[level] = factor
+    tdee = np.rint(bmr * factor_table[levels.astype(np.int64)]).astype(np.int64)
+
+    return dict(bmi, bmr=bmr, tdee=tdee)
@@ -0,0 +1,269 @@
+"""紧凑的二进制快照格式：按列存放记录，字符串统一放在字符串表中只存一份
+
+文件结构（整数均为小端）：
+    文件头      4 字节魔数 b"HTRK"、u16 格式版本、u16 保留、u64 journal_seq
+    字符串表    u32 个数、每个字符串的 UTF-8 字节长度（u32 数组）、拼接后的 UTF-8 字节
+    分段个数    u32
+    每个分段    u32 名称（字符串表下标）、u8 类型、u64 内容长度、内容
+    校验和      u32，之前全部字节的 CRC32（格式版本 2 起），读取时校验，发现损坏即报错
+
+分段类型：
+    SECTION_JSON     内容为该值的 UTF-8 JSON，用于结构不规则的数据
+    SECTION_RECORDS  记录列表按列存放：u32 行数、u8 列数，每列为 u32 字段名、
+                     1 字节类型码（q 整数、d 浮点数、I 字符串表下标）和整列数据
+    SECTION_INTAKE   能量摄入按日期分组：u32 日期数、日期列、每天条数列，
+                     之后是全部摄入项按 SECTION_RECORDS 的方式存放
+
+只有同一列的值类型完全一致时才按列存放，否则整个集合退回 JSON 分段，
+因此整数和浮点数（如 70 与 70.0）、字段顺序和未知字段都能原样保留。
+"""
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+from health_fileio import atomic_file
+from health_records import RECORD_CLASSES, CompactRecord, IntakeItem, to_json
+
+MAGIC = b"HTRK"
+FORMAT_VERSION = 2
+
+SECTION_JSON = 0
+SECTION_RECORDS = 1
+SECTION_INTAKE = 2
+
+_HEADER = struct.Struct("<4sHHQ")
+_U8 = struct.Struct("<B")
+_U32 = struct.Struct("<I")
+_SECTION = struct.Struct("<IBQ")
+
+_SWAP = sys.byteorder != 'little'
+
+
+def is_binary_file(path):
+    """判断文件是否为二进制快照（按魔数识别）"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return False
+
+
+def header_seq(head):
+    """从二进制快照开头的字节中取出 journal_seq"""
+    return _HEADER.unpack_from(head)[3]
+
+
+def _array_bytes(values):
+    if _SWAP:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _array_from(typecode, buf, offset, count):
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    if end > len(buf):
+        raise ValueError("数据不完整")
+    values.frombytes(buf[offset:end])
+    if _SWAP:
+        values.byteswap()
+    return values, end
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def id(self, value):
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return string_id
+
+    def to_bytes(self):
+        encoded = [value.encode('utf-8') for value in self.values]
+        lengths = array('I', [len(value) for value in encoded])
+        return _U32.pack(len(encoded)) + _array_bytes(lengths) + b"".join(encoded)
+
+
+def _encode_column(values, strings):
+    """按值类型选择列类型；类型不一致或无法表示时返回 None"""
+    types = set(map(type, values))
+    if types <= {int}:
+        try:
+            return b"q" + _array_bytes(array('q', values))
+        except OverflowError:
+            return None
+    if types == {float}:
+        return b"d" + _array_bytes(array('d', values))
+    if types == {str}:
+        return b"I" + _array_bytes(array('I', [strings.id(value) for value in values]))
+    return None
+
+
+def _encode_records(records, strings):
+    """按列编码一组字段完全相同的记录；不满足条件时返回 None"""
+    if not records or not all(isinstance(record, (dict, CompactRecord)) for record in records):
+        return None
+    fields = tuple(records[0])
+    if not fields or len(fields) > 255 or any(tuple(record) != fields for record in records):
+        return None
+
+    parts = [_U32.pack(len(records)), _U8.pack(len(fields))]
+    for name in fields:
+        column = _encode_column([record[name] for record in records], strings)
+        if column is None:
+            return None
+        parts.append(_U32.pack(strings.id(name)))
+        parts.append(column)
+    return b"".join(parts)
+
+
+def _encode_intake(intake, strings):
+    """按日期分组编码能量摄入；不满足条件时返回 None"""
+    if not isinstance(intake, dict) or not all(isinstance(items, list) for items in intake.values()):
+        return None
+    items = [item for day in intake.values() for item in day]
+    if not items:
+        return None
+    encoded_items = _encode_records(items, strings)
+    if encoded_items is None:
+        return None
+    dates = array('I', [strings.id(date) for date in intake])
+    counts = array('I', [len(day) for day in intake.values()])
+    return (_U32.pack(len(dates)) + _array_bytes(dates) + _array_bytes(counts)
+            + encoded_items)
+
+
+def encode_snapshot(data, seq):
+    """把数据编码为二进制快照"""
+    strings = _StringTable()
+    sections = []
+    for name, value in data.items():
+        kind, payload = SECTION_JSON, None
+        if name == 'calorie_intake':
+            kind, payload = SECTION_INTAKE, _encode_intake(value, strings)
+        elif isinstance(value, list):
+            kind, payload = SECTION_RECORDS, _encode_records(value, strings)
+        if payload is None:
+            kind = SECTION_JSON
+            payload = json.dumps(value, ensure_ascii=False, default=to_json).encode('utf-8')
+        sections.append(_SECTION.pack(strings.id(name), kind, len(payload)) + payload)
+
+    payload = b"".join([
+        _HEADER.pack(MAGIC, FORMAT_VERSION, 0, seq),
+        strings.to_bytes(),
+        _U32.pack(len(sections)),
+        *sections
+    ])
+    return payload + _U32.pack(zlib.crc32(payload))
+
+
+def _decode_records(buf, offset, strings, record_class=None):
+    count = _U32.unpack_from(buf, offset)[0]
+    field_count = _U8.unpack_from(buf, offset + 4)[0]
+    offset += 5
+
+    fields = []
+    columns = []
+    for _ in range(field_count):
+        fields.append(strings[_U32.unpack_from(buf, offset)[0]])
+        typecode = chr(buf[offset + 4])
+        column, offset = _array_from(typecode, buf, offset + 5, count)
+        if typecode == 'I':
+            column = [strings[i] for i in column]
+        columns.append(column)
+
+    fields = tuple(fields)
+    if record_class is not None and fields == record_class.__slots__:
+        records = [record_class.from_values(row) for row in zip(*columns)]
+    else:
+        records = [dict(zip(fields, row)) for row in zip(*columns)]
+    return records, offset
+
+
+def _decode_intake(buf, offset, strings):
+    day_count = _U32.unpack_from(buf, offset)[0]
+    dates, offset = _array_from('I', buf, offset + 4, day_count)
+    counts, offset = _array_from('I', buf, offset, day_count)
+    items, offset = _decode_records(buf, offset, strings, IntakeItem)
+
+    intake = {}
+    start = 0
+    for date, count in zip(dates, counts):
+        intake[strings[date]] = items[start:start + count]
+        start += count
+    return intake, offset
+
+
+def iter_binary_snapshot(path):
+    """逐个解码二进制快照的分段，先产出 ('journal_seq', 序号)，再产出各 (键, 值)
+
+    文件不完整或校验失败时抛出 ValueError。
+    """
+    try:
+        yield from _iter_sections(path)
+    except (struct.error, IndexError, KeyError) as e:
+        raise ValueError(f"数据文件已损坏: {path}（{e}）") from e
+
+
+def _iter_sections(path):
+    with open(path, 'rb') as f:
+        buf = memoryview(f.read())
+
+    magic, version, _, seq = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError(f"不是二进制数据文件: {path}")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"数据文件格式版本 {version} 高于当前程序支持的版本 {FORMAT_VERSION}，请升级程序")
+    if version >= 2:
+        body = buf[:-_U32.size]
+        if len(buf) < _HEADER.size + _U32.size or \
+                _U32.unpack_from(buf, len(body))[0] != zlib.crc32(body):
+            raise ValueError(f"数据文件已损坏（校验和不符）: {path}")
+        buf = body
+    yield 'journal_seq', seq
+
+    offset = _HEADER.size
+    string_count = _U32.unpack_from(buf, offset)[0]
+    lengths, offset = _array_from('I', buf, offset + 4, string_count)
+    strings = []
+    for length in lengths:
+        strings.append(sys.intern(str(buf[offset:offset + length], 'utf-8')))
+        offset += length
+
+    section_count = _U32.unpack_from(buf, offset)[0]
+    offset += 4
+    for _ in range(section_count):
+        name_id, kind, length = _SECTION.unpack_from(buf, offset)
+        offset += _SECTION.size
+        name = strings[name_id]
+        if kind == SECTION_RECORDS:
+            value, _ = _decode_records(buf, offset, strings, RECORD_CLASSES.get(name))
+        elif kind == SECTION_INTAKE:
+            value, _ = _decode_intake(buf, offset, strings)
+        elif kind == SECTION_JSON:
+            value = json.loads(str(buf[offset:offset + length], 'utf-8'))
+        else:
+            raise ValueError(f"数据文件包含未知的分段类型 {kind}: {path}")
+        offset += length
+        yield name, value
+
+
+def read_binary_snapshot(path):
+    """读取二进制快照，返回 (数据, journal_seq)"""
+    sections = iter_binary_snapshot(path)
+    _, seq = next(sections)
+    return dict(sections), seq
+
+
+def write_binary_snapshot(path, data, seq, backup=False):
+    """写入二进制快照：先写临时文件并落盘，再原子替换（backup 见 atomic_file）"""
+    payload = encode_snapshot(data, seq)
+    with atomic_file(path, 'wb', backup=backup) as f:
+        f.write(payload)
@@ -0,0 +1,96 @@
+"""趋势图数据：从记录中提取时间序列，并按像素宽度降采样
+
+横坐标统一为日期的日序号（date_ordinal），纵坐标为数值。
+
+降采样把横轴等分为与绘图宽度相当的若干桶，每桶只保留最小值和最大值两个点
+（按时间先后排列），折线的形状和峰谷都不会丢失，点数却与数据量无关。
+某个桶内的数据变化时只需重新计算这一个桶。
+"""
+import bisect
+
+from health_index import date_ordinal
+
+
+def bucket_of(x, x0, x1, count):
+    """横坐标 x 所在的桶号（x0 <= x <= x1）"""
+    if x1 <= x0:
+        return 0
+    return min(int((x - x0) / (x1 - x0) * count), count - 1)
+
+
+def bucket_bounds(i, x0, x1, count):
+    """第 i 个桶的横坐标范围 [左, 右)"""
+    width = (x1 - x0) / count
+    return x0 + i * width, x0 + (i + 1) * width
+
+
+def summarize_bucket(xs, ys, lo, hi):
+    """xs/ys[lo:hi] 的最小点和最大点，按时间先后返回；区间为空时返回空元组"""
+    if lo >= hi:
+        return ()
+    low = high = lo
+    for i in range(lo + 1, hi):
+        if ys[i] < ys[low]:
+            low = i
+        elif ys[i] > ys[high]:
+            high = i
+    if low == high:
+        return ((xs[low], ys[low]),)
+    first, second = sorted((low, high))
+    return ((xs[first], ys[first]), (xs[second], ys[second]))
+
+
+def minmax_buckets(xs, ys, x0, x1, count):
+    """一次扫描把按横坐标排序的序列分桶，返回每桶的 summarize_bucket 结果"""
+    buckets = [()] * count
+    start = 0
+    n = len(xs)
+    while start < n:
+        i = bucket_of(xs[start], x0, x1, count)
+        end = start + 1
+        while end < n and bucket_of(xs[end], x0, x1, count) == i:
+            end += 1
+        buckets[i] = summarize_bucket(xs, ys, start, end)
+        start = end
+    return buckets
+
+
+def rebucket(xs, ys, x0, x1, count, i):
+    """重新计算第 i 个桶"""
+    left, right = bucket_bounds(i, x0, x1, count)
+    n = len(xs)
+    # 先按边界二分，再以 bucket_of 为准修正浮点误差，保证与 minmax_buckets 的分桶一致
+    lo = bisect.bisect_left(xs, left)
+    while lo > 0 and bucket_of(xs[lo - 1], x0, x1, count) >= i:
+        lo -= 1
+    while lo < n and bucket_of(xs[lo], x0, x1, count) < i:
+        lo += 1
+    hi = max(bisect.bisect_left(xs, right), lo)
+    while hi > lo and bucket_of(xs[hi - 1], x0, x1, count) > i:
+        hi -= 1
+    while hi < n and bucket_of(xs[hi], x0, x1, count) == i:
+        hi += 1
+    return summarize_bucket(xs, ys, lo, hi)
+
+
+def record_series(records, field):
+    """按日期先后的记录中提取 (日序号列表, 数值列表)"""
+    xs = []
+    ys = []
+    for record in records:
+        xs.append(date_ordinal(record['date']))
+        ys.append(record[field])
+    return xs, ys
+
+
+def balance_series(store):
+    """每个有摄入记录且有TDEE的日子的热量缺口（TDEE - 摄入），返回 (日序号列表, 数值列表)"""
+    days = store.intake_totals.days()
+    tdees = store.latest_tdee_many(days)
+    xs = []
+    ys = []
+    for date, tdee in zip(days, tdees):
+        if tdee is not None:
+            xs.append(date_ordinal(date))
+            ys.append(tdee - store.intake_totals.total_on(date))
+    return xs, ys
@@ -0,0 +1,207 @@
+"""健康追踪核心功能：BMI、基础代谢率、热量平衡计算与记录存储，不依赖任何界面
+
+可在脚本中直接使用：
+    tracker = HealthTracker.open("health_data.json")
+    tracker.record_bmi(70, 175)
+    tracker.close()
+"""
+import datetime
+import math
+
+from health_analytics import analyze_range, summarize_range
+from health_profiles import ProfileIndex
+from health_storage import JournalStore, SQLiteStore, migrate_json_to_sqlite, open_store
+
+# 活动水平对应的TDEE系数
+ACTIVITY_FACTORS = {1: 1.2, 2: 1.375, 3: 1.55, 4: 1.725, 5: 1.9}
+
+# 活动水平描述
+ACTIVITY_DESCRIPTIONS = {
+    1: "几乎不运动或久坐不动",
+    2: "轻度活动（每周1-3天）",
+    3: "中度活动（每周3-5天）",
+    4: "高度活动（每周6-7天）",
+    5: "极高度活动（每天）"
+}
+
+GENDERS = ("男", "女")
+
+
+class InvalidInputError(ValueError):
+    """输入数据不符合要求，消息可直接展示给用户"""
+
+
+def is_valid_number(value):
+    """是否为有限的整数或浮点数（NaN、无穷大和布尔值都不算）"""
+    return (isinstance(value, (int, float)) and not isinstance(value, bool)
+            and math.isfinite(value))
+
+
+def today():
+    """今天的日期字符串"""
+    return datetime.date.today().isoformat()
+
+
+def calculate_bmi(weight, height):
+    """根据体重(kg)和身高(cm)计算BMI，保留一位小数"""
+    height_m = height / 100
+    bmi = weight / (height_m ** 2)
+    return round(bmi, 1)
+
+
+def bmi_category(bmi):
+    """确定BMI类别"""
+    if bmi < 18.5:
+        return "偏瘦"
+    elif 18.5 <= bmi < 24:
+        return "正常"
+    elif 24 <= bmi < 28:
+        return "超重"
+    else:
+        return "肥胖"
+
+
+def calculate_bmr(weight, height, age, gender):
+    """用 Mifflin-St Jeor 公式计算基础代谢率，取整"""
+    if gender == "男":
+        bmr = 10 * weight + 6.25 * height - 5 * age + 5
+    else:
+        bmr = 10 * weight + 6.25 * height - 5 * age - 161
+    return round(bmr)
+
+
+def calculate_tdee(bmr, activity_level):
+    """根据活动水平计算每日总能量消耗，取整"""
+    return round(bmr * ACTIVITY_FACTORS[activity_level])
+
+
+def calorie_balance(tdee, intake):
+    """热量缺口：消耗 - 摄入，正数为热量赤字，负数为热量盈余"""
+    return tdee - intake
+
+
+def make_bmi_record(weight, height, date=None):
+    """校验输入并生成一条BMI记录"""
+    if not (is_valid_number(weight) and is_valid_number(height)):
+        raise InvalidInputError("体重和身高必须为有效的数字")
+    if weight <= 0 or height <= 0:
+        raise InvalidInputError("体重和身高必须为正数")
+
+    bmi = calculate_bmi(weight, height)
+    return {
+        'date': date or today(),
+        'weight': weight,
+        'height': height,
+        'bmi': bmi,
+        'category': bmi_category(bmi)
+    }
+
+
+def make_bmr_record(weight, height, age, gender, activity_level, date=None):
+    """校验输入并生成一条代谢率记录"""
+    if not all(is_valid_number(value) for value in (weight, height, age)):
+        raise InvalidInputError("体重、身高和年龄必须为有效的数字")
+    if weight <= 0 or height <= 0 or age <= 0:
+        raise InvalidInputError("体重、身高和年龄必须为正数")
+    if gender not in GENDERS:
+        raise InvalidInputError("性别必须为“男”或“女”")
+    if activity_level not in ACTIVITY_FACTORS:
+        raise InvalidInputError("活动水平必须为1到5之间的整数")
+
+    bmr = calculate_bmr(weight, height, age, gender)
+    return {
+        'date': date or today(),
+        'weight': weight,
+        'height': height,
+        'age': age,
+        'gender': gender,
+        'activity_level': activity_level,
+        'activity_description': ACTIVITY_DESCRIPTIONS[activity_level],
+        'bmr': bmr,
+        'tdee': calculate_tdee(bmr, activity_level)
+    }
+
+
+def make_intake_item(food, calories):
+    """校验输入并生成一条食物能量记录"""
+    food = food.strip()
+    if not food:
+        raise InvalidInputError("请输入食物名称")
+    # 卡路里按整数存储和显示（统计报表以 :+d 格式化），布尔值不算整数
+    if not isinstance(calories, int) or isinstance(calories, bool):
+        raise InvalidInputError("卡路里必须为整数")
+    if calories <= 0:
+        raise InvalidInputError("卡路里必须为正数")
+    return {
+        'food': food,
+        'calories': calories
+    }
+
+
+class HealthTracker:
+    """健康记录的无界面入口：计算、记录和查询都通过记录存储完成"""
+
+    def __init__(self, store):
+        self.store = store
+
+    @classmethod
+    def open(cls, data_file="health_data.json"):
+        """打开数据文件并同步加载"""
+        tracker = cls(open_store(data_file))
+        tracker.store.load()
+        return tracker
+
+    @classmethod
+    def open_profile(cls, profile_id=None, index_file="profiles.json"):
+        """打开某个用户（默认为当前用户）的数据文件并同步加载"""
+        return cls.open(ProfileIndex.load(index_file).data_file(profile_id))
+
+    def record_bmi(self, weight, height, date=None):
+        """计算并记录BMI，返回记录"""
+        record = make_bmi_record(weight, height, date)
+        self.store.add_bmi_record(record)
+        return record
+
+    def record_bmr(self, weight, height, age, gender, activity_level, date=None):
+        """计算并记录基础代谢率，返回记录"""
+        record = make_bmr_record(weight, height, age, gender, activity_level, date)
+        self.store.add_bmr_record(record)
+        return record
+
+    def add_intake(self, date, food, calories):
+        """记录一条食物能量摄入，返回记录"""
+        item = make_intake_item(food, calories)
+        self.store.add_intake(date, item)
+        return item
+
+    def balance_on(self, date):
+        """某一天的摄入、TDEE和热量缺口；没有代谢率数据时 tdee 和 balance 为 None"""
+        intake = self.store.intake_totals.total_on(date)
+        tdee = self.store.latest_tdee(date)
+        return {
+            'date': date,
+            'intake': intake,
+            'tdee': tdee,
+            'balance': None if tdee is None else calorie_balance(tdee, intake)
+        }
+
+    def analyze_range(self, start_date, end_date):
+        """日期区间内的逐日热量平衡"""
+        return analyze_range(self.store, start_date, end_date)
+
+    def summarize_range(self, start_date, end_date):
+        """日期区间内热量平衡的汇总"""
+        return summarize_range(self.analyze_range(start_date, end_date))
+
+    def close(self):
+        """把待写入的数据落盘并关闭存储"""
+        self.store.close()
+
+
+__all__ = [
+    'ACTIVITY_FACTORS', 'ACTIVITY_DESCRIPTIONS', 'GENDERS', 'InvalidInputError',
+    'calculate_bmi', 'bmi_category', 'calculate_bmr', 'calculate_tdee', 'calorie_balance',
+    'make_bmi_record', 'make_bmr_record', 'make_intake_item', 'HealthTracker',
+    'JournalStore', 'SQLiteStore', 'open_store', 'migrate_json_to_sqlite',
+    'analyze_range', 'summarize_range', 'ProfileIndex'
+]
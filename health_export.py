@@ -0,0 +1,177 @@
+"""导出历史记录：以生成器逐条读取记录并写出，内存占用与记录总数无关
+
+用法：
+    python health_export.py bmi -o bmi.csv
+    python health_export.py intake -o intake.parquet --start 2024-01-01 --end 2024-12-31
+
+支持 CSV、JSON Lines 和 Parquet（需安装 pyarrow）。能量摄入按 date, food, calories 展开为行。
+先写入同一目录下的临时文件，写完才替换目标文件，中途出错或取消不会留下写了一半的文件。
+"""
+import argparse
+import csv
+import json
+import os
+
+from health_fileio import atomic_path
+from health_profiles import ProfileIndex
+from health_storage import BMI_COLUMNS, BMR_COLUMNS, INTAKE_COLUMNS, open_store
+
+EXPORT_COLUMNS = {
+    'bmi': BMI_COLUMNS,
+    'bmr': BMR_COLUMNS,
+    'intake': INTAKE_COLUMNS
+}
+
+FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet'
+}
+
+# Parquet 每个行组的行数，也是写出时在内存中缓存的最大行数
+PARQUET_BATCH_SIZE = 10000
+
+# 每导出多少行回调一次进度
+PROGRESS_INTERVAL = 1000
+
+
+def iter_export_rows(store, record_type, start_date=None, end_date=None):
+    """按日期先后逐条产出要导出的行（字典），可限定日期区间（含两端）"""
+    if record_type == 'bmi':
+        return store.iter_bmi_records(start_date, end_date)
+    if record_type == 'bmr':
+        return store.iter_bmr_records(start_date, end_date)
+    return (
+        {'date': date, 'food': item['food'], 'calories': item['calories']}
+        for date, item in store.iter_intake(start_date, end_date)
+    )
+
+
+def _with_progress(rows, on_progress):
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if on_progress is not None and count % PROGRESS_INTERVAL == 0:
+            on_progress(count)
+
+
+def write_csv(rows, columns, path):
+    """逐行写出 CSV（带 BOM，便于 Excel 识别中文），返回行数"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_jsonl(rows, columns, path):
+    """逐行写出 JSON Lines，返回行数"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps({c: row[c] for c in columns}, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def _parquet_schema(pa, columns):
+    floats = {'weight', 'height', 'bmi'}
+    ints = {'age', 'activity_level', 'bmr', 'tdee', 'calories'}
+    fields = []
+    for column in columns:
+        if column in floats:
+            fields.append((column, pa.float64()))
+        elif column in ints:
+            fields.append((column, pa.int64()))
+        else:
+            fields.append((column, pa.string()))
+    return pa.schema(fields)
+
+
+def write_parquet(rows, columns, path):
+    """按行组分批写出 Parquet，内存中最多缓存 PARQUET_BATCH_SIZE 行，返回行数"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("导出 Parquet 需要安装 pyarrow：pip install pyarrow")
+
+    schema = _parquet_schema(pa, columns)
+    count = 0
+    batch = {column: [] for column in columns}
+
+    def flush(writer):
+        writer.write_table(pa.table(batch, schema=schema))
+        for values in batch.values():
+            values.clear()
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for row in rows:
+            for column in columns:
+                batch[column].append(row[column])
+            count += 1
+            if count % PARQUET_BATCH_SIZE == 0:
+                flush(writer)
+        if count % PARQUET_BATCH_SIZE or count == 0:
+            flush(writer)
+    return count
+
+
+WRITERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'parquet': write_parquet
+}
+
+
+def format_for(path):
+    """根据扩展名推断导出格式"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"无法根据扩展名确定导出格式: {path}（支持 .csv / .jsonl / .parquet）")
+    return FORMATS[ext]
+
+
+def export_records(store, record_type, path, export_format=None,
+                   start_date=None, end_date=None, on_progress=None):
+    """把一类记录导出到文件，返回导出的行数"""
+    export_format = export_format or format_for(path)
+    columns = EXPORT_COLUMNS[record_type]
+    rows = _with_progress(iter_export_rows(store, record_type, start_date, end_date), on_progress)
+    with atomic_path(path) as tmp_path:
+        return WRITERS[export_format](rows, columns, tmp_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导出健康记录（CSV / JSON Lines / Parquet）")
+    parser.add_argument("type", choices=list(EXPORT_COLUMNS), help="要导出的记录类型")
+    parser.add_argument("-o", "--output", required=True, help="输出文件路径")
+    parser.add_argument("--format", choices=list(WRITERS), help="导出格式，默认按扩展名推断")
+    parser.add_argument("--start", help="开始日期 YYYY-MM-DD（含）")
+    parser.add_argument("--end", help="结束日期 YYYY-MM-DD（含）")
+    parser.add_argument("--data-file", default="health_data.json", help="数据文件路径")
+    parser.add_argument("--profile", help="用户编号（见 profiles.json），指定后忽略 --data-file")
+    args = parser.parse_args(argv)
+
+    data_file = args.data_file
+    if args.profile:
+        data_file = ProfileIndex.load().data_file(args.profile)
+    store = open_store(data_file)
+    store.load()
+    try:
+        count = export_records(store, args.type, args.output, args.format, args.start, args.end)
+    except ImportError as e:
+        parser.exit(1, f"导出失败：{e}\n")
+    finally:
+        store.close()
+    print(f"已导出 {count} 条记录到 {args.output}")
+    return count
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""可靠落盘：原子替换写入、目录同步、日志文件末尾残行的修复，以及跨进程文件锁
+
+原子写入先写临时文件并 fsync，再用 os.replace 替换目标文件并同步所在目录，
+任何时刻断电，目标文件要么是旧内容，要么是完整的新内容。
+"""
+import contextlib
+import os
+import threading
+import time
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+TMP_SUFFIX = ".tmp"
+BACKUP_SUFFIX = ".bak"
+LOCK_SUFFIX = ".lock"
+
+
+def fsync_dir(path):
+    """同步文件所在的目录，使刚完成的重命名落盘（Windows 不支持打开目录，跳过）"""
+    if os.name == 'nt':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def atomic_file(path, mode='w', encoding=None, backup=False):
+    """以原子替换的方式写文件：with 块正常结束后才替换目标文件
+
+    backup 为 True 时先把原文件改名为 .bak 保留一份，供目标文件损坏时恢复。
+    """
+    tmp_path = path + TMP_SUFFIX
+    try:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+    if backup and os.path.exists(path):
+        os.replace(path, path + BACKUP_SUFFIX)
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+
+
+@contextlib.contextmanager
+def atomic_path(path):
+    """与 atomic_file 相同，但 with 块得到的是临时文件路径，供需要自己打开文件的写出函数使用"""
+    tmp_path = path + TMP_SUFFIX
+    try:
+        yield tmp_path
+        with open(tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+
+
+def recover_interrupted_replace(path):
+    """处理上次崩溃遗留的临时文件，返回是否用它恢复了目标文件
+
+    目标文件已改名为 .bak 而临时文件还没来得及改名时，临时文件已经完整落盘，
+    直接把它改名为目标文件；其余情况下临时文件可能没写完，删除。
+    """
+    tmp_path = path + TMP_SUFFIX
+    if not os.path.exists(tmp_path):
+        return False
+    if not os.path.exists(path) and os.path.exists(path + BACKUP_SUFFIX):
+        os.replace(tmp_path, path)
+        fsync_dir(path)
+        return True
+    os.remove(tmp_path)
+    return False
+
+
+def truncate_torn_tail(path, is_valid):
+    """截掉文件末尾写了一半的行，返回截掉的字节数
+
+    追加写入在断电时可能只写入了最后一行的一部分（或一串零字节）：
+    去掉最后一个换行符之后的内容，最后一个完整行若无效（is_valid(行) 为假）也一并去掉。
+    更前面的行若损坏说明文件本身出了问题，保留原样交给读取方报错。
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    end = data.rfind(b"\n") + 1
+    if end:
+        start = data.rfind(b"\n", 0, end - 1) + 1
+        line = data[start:end]
+        if line.strip() and not is_valid(line):
+            end = start
+
+    dropped = len(data) - end
+    if dropped:
+        with open(path, 'r+b') as f:
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+    return dropped
+
+
+class FileLock:
+    """跨进程的咨询锁：锁住一个单独的锁文件（Windows 用 msvcrt，其他系统用 flock）
+
+    同一进程内的线程之间同样互斥。持有锁的进程退出（包括崩溃）时由操作系统释放。
+    timeout 为等待秒数，None 表示一直等待；超时抛出 TimeoutError。
+    """
+
+    # 锁被占用时重试的间隔（秒）
+    POLL_INTERVAL = 0.002
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def acquire(self):
+        """获取锁"""
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=-1 if self.timeout is None else self.timeout):
+            raise TimeoutError(f"等待文件锁超时: {self.path}")
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                self._lock_fd(fd, deadline)
+            except BaseException:
+                os.close(fd)
+                raise
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._fd = fd
+
+    def _lock_fd(self, fd, deadline):
+        while True:
+            try:
+                if os.name == 'nt':
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except OSError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"等待文件锁超时: {self.path}") from None
+                time.sleep(self.POLL_INTERVAL)
+
+    def release(self):
+        """释放锁"""
+        fd, self._fd = self._fd, None
+        try:
+            if os.name == 'nt':
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,165 @@
+"""本地食物营养数据库：随程序附带的常见食物每100克能量表，支持中文名称查询
+
+附带的 food_nutrition.csv 在第一次查询时导入 SQLite 缓存文件 food_nutrition.db，
+之后直接打开缓存；CSV 内容变化（按哈希判断）时自动重建。
+
+名称去掉空白并忽略大小写后，按单字和相邻两字建立倒排索引（二元组索引）：
+查询两个字以上时取包含查询中全部二元组的食物，单字查询用单字索引，
+再确认查询确实是名称的连续子串，按“完全相同、开头相同、包含”的顺序排列。
+"""
+import csv
+import hashlib
+import os
+import sqlite3
+import sys
+
+SEED_FILE = "food_nutrition.csv"
+CACHE_FILE = "food_nutrition.db"
+
+# 缓存表结构的版本，结构变化时加一以触发重建
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE foods (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    kcal_per_100g REAL NOT NULL
+);
+CREATE TABLE food_grams (
+    gram TEXT NOT NULL,
+    food_id INTEGER NOT NULL,
+    PRIMARY KEY (gram, food_id)
+) WITHOUT ROWID;
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def seed_path():
+    """附带的食物表路径（打包后位于解压目录中）"""
+    base = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, SEED_FILE)
+
+
+def normalize(text):
+    """去掉空白并忽略大小写"""
+    return "".join(text.split()).casefold()
+
+
+def name_grams(name):
+    """名称的全部单字和相邻两字"""
+    name = normalize(name)
+    return set(name) | {name[i:i + 2] for i in range(len(name) - 1)}
+
+
+def query_grams(query):
+    """查询用的索引项：单字查询用单字，否则用全部相邻两字"""
+    query = normalize(query)
+    if len(query) == 1:
+        return {query}
+    return {query[i:i + 2] for i in range(len(query) - 1)}
+
+
+def scale_calories(kcal_per_100g, grams):
+    """按份量（克）换算能量，取整"""
+    return round(kcal_per_100g * grams / 100)
+
+
+class FoodDatabase:
+    """食物营养数据库，第一次查询时才打开（必要时建立）缓存"""
+
+    def __init__(self, cache_file=CACHE_FILE, seed_file=None):
+        self.cache_file = cache_file
+        self.seed_file = seed_file or seed_path()
+        self._conn = None
+
+    def open(self):
+        """打开缓存数据库；缓存不存在或与附带的食物表不一致时重建"""
+        if self._conn is not None:
+            return
+        with open(self.seed_file, 'rb') as f:
+            seed_hash = hashlib.sha1(f.read()).hexdigest()
+        if self._cached_hash() != seed_hash:
+            self._build(seed_hash)
+        self._conn = sqlite3.connect(self.cache_file)
+
+    def _cached_hash(self):
+        """缓存对应的食物表哈希；缓存不存在或版本不符时返回 None"""
+        if not os.path.exists(self.cache_file):
+            return None
+        try:
+            conn = sqlite3.connect(self.cache_file)
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                    return None
+                row = conn.execute("SELECT value FROM meta WHERE key = 'seed_sha1'").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError:
+            return None
+        return row[0] if row else None
+
+    def _build(self, seed_hash):
+        """从 CSV 导入食物并建立二元组索引，先写临时文件再原子替换"""
+        tmp_file = self.cache_file + ".tmp"
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+        conn = sqlite3.connect(tmp_file)
+        try:
+            conn.executescript(SCHEMA)
+            with open(self.seed_file, 'r', newline='', encoding='utf-8-sig') as f:
+                for row in csv.DictReader(f):
+                    name = row['name'].strip()
+                    if not name:
+                        continue
+                    cursor = conn.execute(
+                        "INSERT INTO foods (name, category, kcal_per_100g) VALUES (?, ?, ?)",
+                        (name, row.get('category', '').strip(), float(row['kcal_per_100g']))
+                    )
+                    conn.executemany(
+                        "INSERT INTO food_grams (gram, food_id) VALUES (?, ?)",
+                        [(gram, cursor.lastrowid) for gram in name_grams(name)]
+                    )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('seed_sha1', ?)", (seed_hash,))
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_file, self.cache_file)
+
+    def search(self, query, limit=10):
+        """按名称查询，返回 [{'name', 'category', 'kcal_per_100g'}]，最相关的在前"""
+        grams = query_grams(query)
+        if not grams:
+            return []
+        self.open()
+
+        rows = self._conn.execute(
+            "SELECT f.name, f.category, f.kcal_per_100g FROM food_grams g "
+            "JOIN foods f ON f.id = g.food_id "
+            f"WHERE g.gram IN ({', '.join('?' for _ in grams)}) "
+            "GROUP BY g.food_id HAVING COUNT(*) = ?",
+            (*grams, len(grams))
+        ).fetchall()
+
+        query = normalize(query)
+        matches = []
+        for name, category, kcal in rows:
+            position = normalize(name).find(query)
+            if position < 0:
+                continue
+            rank = 0 if normalize(name) == query else 1 if position == 0 else 2
+            matches.append(((rank, position, len(name), name),
+                            {'name': name, 'category': category, 'kcal_per_100g': kcal}))
+        matches.sort(key=lambda match: match[0])
+        return [food for _, food in matches[:limit]]
+
+    def close(self):
+        """关闭数据库连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
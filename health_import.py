@@ -0,0 +1,214 @@
+"""批量导入历史记录：逐行读取 CSV 或 JSON Lines 文件，校验、去重后一次性写入
+
+用法：
+    python health_import.py meals.csv --type intake
+    python health_import.py records.jsonl           # 每行用 type 字段注明 bmi / bmr / intake
+
+字段名与 health_data.json 中一致：
+    bmi:    date, weight, height
+    bmr:    date, weight, height, age, gender, activity_level
+    intake: date, food, calories
+BMI、BMR、TDEE 等计算值按界面中的公式重新计算，校验规则与表单相同。
+"""
+import argparse
+import csv
+import datetime
+import json
+import math
+import os
+from collections import Counter
+
+from health_core import InvalidInputError, make_bmi_record, make_bmr_record, make_intake_item
+from health_profiles import ProfileIndex
+from health_storage import open_store
+
+RECORD_TYPES = ('bmi', 'bmr', 'intake')
+
+# 每处理多少行回调一次进度
+PROGRESS_INTERVAL = 1000
+
+
+def iter_rows(path):
+    """按扩展名逐行读取 CSV 或 JSON Lines 文件，产出 (行号, 字段字典)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        # utf-8-sig 兼容 Excel 导出的带 BOM 文件
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+    elif ext in ('.jsonl', '.ndjson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                if not isinstance(row, dict):
+                    # 交给 parse_row 报告为该行错误
+                    row = {'__invalid__': line}
+                yield line_no, row
+    else:
+        raise ValueError(f"不支持的文件格式: {path}（仅支持 .csv 和 .jsonl）")
+
+
+def _field(row, name):
+    value = row.get(name)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        raise InvalidInputError(f"缺少字段 {name}")
+    return value.strip() if isinstance(value, str) else value
+
+
+def _float(row, name):
+    value = _field(row, name)
+    try:
+        # JSON 中的 true/false 不是数字；"nan"、"inf" 能被 float 解析，同样不接受
+        if isinstance(value, bool):
+            raise ValueError
+        value = float(value)
+        if not math.isfinite(value):
+            raise ValueError
+        return value
+    except (TypeError, ValueError):
+        raise InvalidInputError(f"{name} 不是有效的数字")
+
+
+def _int(row, name):
+    value = _field(row, name)
+    try:
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidInputError(f"{name} 不是有效的整数")
+
+
+def _date(row):
+    try:
+        return datetime.date.fromisoformat(str(_field(row, 'date'))).isoformat()
+    except ValueError:
+        raise InvalidInputError("date 的格式应为 YYYY-MM-DD")
+
+
+def parse_row(row, default_type=None):
+    """把一行输入转换为 (类型, 记录)；摄入记录为 (日期, 摄入项)。不合法时抛出 InvalidInputError"""
+    if '__invalid__' in row:
+        raise InvalidInputError("不是有效的 JSON 对象")
+
+    record_type = str(row.get('type') or default_type or '').strip()
+    if record_type not in RECORD_TYPES:
+        raise InvalidInputError("无法确定记录类型，请用 --type 指定或在 type 字段中注明")
+
+    date = _date(row)
+    if record_type == 'bmi':
+        return 'bmi', make_bmi_record(_float(row, 'weight'), _float(row, 'height'), date)
+    if record_type == 'bmr':
+        return 'bmr', make_bmr_record(
+            _float(row, 'weight'), _float(row, 'height'), _int(row, 'age'),
+            str(_field(row, 'gender')), _int(row, 'activity_level'), date
+        )
+    return 'intake', (date, make_intake_item(str(row.get('food') or ''), _int(row, 'calories')))
+
+
+def record_key(record_type, record):
+    """记录的身份：用于判断导入的记录是否已存在"""
+    if record_type == 'bmi':
+        return ('bmi', record['date'], record['weight'], record['height'])
+    if record_type == 'bmr':
+        return ('bmr', record['date'], record['weight'], record['height'], record['age'],
+                record['gender'], record['activity_level'])
+    date, item = record
+    return ('intake', date, item['food'], item['calories'])
+
+
+def existing_keys(store):
+    """统计存储中已有记录的身份"""
+    keys = Counter()
+    keys.update(record_key('bmi', record) for record in store.iter_bmi_records())
+    keys.update(record_key('bmr', record) for record in store.iter_bmr_records())
+    keys.update(record_key('intake', entry) for entry in store.iter_intake())
+    return keys
+
+
+def import_files(store, paths, default_type=None, dry_run=False, on_progress=None):
+    """导入多个文件并一次性写入存储
+
+    每条已存在的记录抵消一条身份相同的导入记录，因此重复导入同一文件不会产生重复，
+    而文件中同一天吃了两次的同一食物仍会保留两条。不合法的行被跳过并记录在 errors 中。
+    返回 {'imported': {类型: 条数}, 'duplicates': 条数, 'errors': [(文件, 行号, 原因)]}。
+    """
+    remaining = existing_keys(store)
+    accepted = {record_type: [] for record_type in RECORD_TYPES}
+    duplicates = 0
+    errors = []
+    processed = 0
+
+    for path in paths:
+        for line_no, row in iter_rows(path):
+            processed += 1
+            if on_progress is not None and processed % PROGRESS_INTERVAL == 0:
+                on_progress(processed)
+
+            try:
+                record_type, record = parse_row(row, default_type)
+            except InvalidInputError as e:
+                errors.append((path, line_no, str(e)))
+                continue
+
+            key = record_key(record_type, record)
+            if remaining[key] > 0:
+                remaining[key] -= 1
+                duplicates += 1
+                continue
+            accepted[record_type].append(record)
+
+    # 写入前再回调一次：报告总行数，调用方也可在此抛出异常放弃写入（如界面中取消导入）
+    if on_progress is not None:
+        on_progress(processed)
+
+    if not dry_run:
+        store.add_many(accepted['bmi'], accepted['bmr'], accepted['intake'])
+
+    return {
+        'imported': {record_type: len(records) for record_type, records in accepted.items()},
+        'duplicates': duplicates,
+        'errors': errors
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量导入健康记录（CSV / JSON Lines）")
+    parser.add_argument("files", nargs="+", help="要导入的 .csv 或 .jsonl 文件")
+    parser.add_argument("--type", choices=RECORD_TYPES, help="文件中没有 type 字段时使用的记录类型")
+    parser.add_argument("--data-file", default="health_data.json", help="数据文件路径")
+    parser.add_argument("--profile", help="用户编号（见 profiles.json），指定后忽略 --data-file")
+    parser.add_argument("--dry-run", action="store_true", help="只校验和统计，不写入")
+    args = parser.parse_args(argv)
+
+    data_file = args.data_file
+    if args.profile:
+        data_file = ProfileIndex.load().data_file(args.profile)
+    store = open_store(data_file)
+    store.load()
+    try:
+        result = import_files(store, args.files, args.type, args.dry_run,
+                              on_progress=lambda n: print(f"\r已处理 {n} 行", end="", flush=True))
+    finally:
+        store.close()
+    print()
+
+    imported = result['imported']
+    print(f"{'校验完成（未写入）' if args.dry_run else '导入完成'}："
+          f"BMI {imported['bmi']} 条，代谢率 {imported['bmr']} 条，能量摄入 {imported['intake']} 条；"
+          f"跳过重复 {result['duplicates']} 条，错误 {len(result['errors'])} 行")
+    for path, line_no, message in result['errors'][:20]:
+        print(f"  {path} 第 {line_no} 行：{message}")
+    if len(result['errors']) > 20:
+        print(f"  …… 其余 {len(result['errors']) - 20} 行错误未显示")
+    return result
+
+
+if __name__ == "__main__":
+    main()
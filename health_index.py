@@ -0,0 +1,298 @@
+import bisect
+import contextlib
+import datetime
+import heapq
+import math
+
+
+class BmrDateIndex:
+    """代谢率记录的日期有序索引，用二分查找回答“某日当天或之前最近的TDEE”
+
+    同一天有多条记录时保留最早录入的一条，与原先对全部记录做稳定倒序排序后
+    取第一条的结果一致。
+
+    lock 为所属存储的锁：查询时持有它，insert 须由调用方在持有它时调用，
+    这样其他线程可以同时查询。
+    """
+
+    def __init__(self, records=(), lock=None):
+        self._lock = lock if lock is not None else contextlib.nullcontext()
+        self._tdee = {}
+        for record in records:
+            self._tdee.setdefault(record['date'], record['tdee'])
+        # 去重后按日期升序排列
+        self._dates = sorted(self._tdee)
+
+    def __len__(self):
+        return len(self._dates)
+
+    def insert(self, record):
+        """插入一条代谢率记录，保持日期有序"""
+        date = record['date']
+        if date in self._tdee:
+            return
+        # 先登记TDEE再插入日期，日期可见时它的TDEE一定已经存在
+        self._tdee[date] = record['tdee']
+        bisect.insort(self._dates, date)
+
+    def latest_tdee(self, target_date):
+        """O(log n) 查找目标日期当天或之前最近的TDEE"""
+        with self._lock:
+            i = bisect.bisect_right(self._dates, target_date)
+            if i == 0:
+                return None
+            return self._tdee[self._dates[i - 1]]
+
+    def latest_tdee_many(self, target_dates):
+        """批量查找：对目标日期排序后与索引做一次归并，结果与输入顺序对应"""
+        result = [None] * len(target_dates)
+        order = sorted(range(len(target_dates)), key=target_dates.__getitem__)
+
+        with self._lock:
+            dates = self._dates
+            j = 0
+            current = None
+            for k in order:
+                target = target_dates[k]
+                while j < len(dates) and dates[j] <= target:
+                    current = self._tdee[dates[j]]
+                    j += 1
+                result[k] = current
+        return result
+
+
+def date_ordinal(date):
+    """把 yyyy-mm-dd 日期字符串转换为日序号"""
+    return datetime.date.fromisoformat(date).toordinal()
+
+
+class IntakeTotals:
+    """每日摄入总量缓存，以及按日历天计算的前缀和
+
+    每日总量在添加记录时增量更新；前缀和覆盖从最早到最晚记录日期之间的每一天，
+    任意区间（周、月、年）的总量都只需两次下标访问。添加的是最后一天或之后的记录时
+    前缀和在末尾原地更新；添加更早的记录后前缀和作废，周、月总量改为逐日相加，
+    其他区间查询时才重建。
+
+    lock 的含义同 BmrDateIndex：查询时持有，add 须由调用方在持有它时调用。
+    """
+
+    def __init__(self, calorie_intake=None, lock=None):
+        self._lock = lock if lock is not None else contextlib.nullcontext()
+        self._daily = {}
+        for date, items in (calorie_intake or {}).items():
+            total = sum(item['calories'] for item in items)
+            if total:
+                self._daily[date] = total
+        self._prefix = None
+        self._base = 0
+
+    def add(self, date, calories):
+        """记录某天新增的摄入量"""
+        self._daily[date] = self._daily.get(date, 0) + calories
+        prefix = self._prefix
+        if prefix is None:
+            return
+        offset = date_ordinal(date) - self._base
+        span = len(prefix) - 1
+        if span == 0 or offset < span - 1:
+            self._prefix = None
+            return
+        # 只改动或追加末尾的元素：锁外读取的查询看到的其余下标都不变
+        if offset == span - 1:
+            prefix[-1] += calories
+        else:
+            prefix.extend([prefix[-1]] * (offset - span))
+            prefix.append(prefix[-1] + calories)
+
+    def total_on(self, date):
+        """某一天的摄入总量"""
+        return self._daily.get(date, 0)
+
+    def days(self):
+        """有摄入记录的日期，按先后排列"""
+        with self._lock:
+            return sorted(self._daily)
+
+    def total_between(self, start_date, end_date):
+        """从 start_date 到 end_date（含两端）的摄入总量"""
+        with self._lock:
+            if self._prefix is None:
+                self._rebuild()
+            prefix = self._prefix
+            base = self._base
+        span = len(prefix) - 1
+
+        start = max(date_ordinal(start_date) - base, 0)
+        end = min(date_ordinal(end_date) - base + 1, span)
+        if end <= start:
+            return 0
+        return prefix[end] - prefix[start]
+
+    def week_total(self, date):
+        """date 所在自然周（周一至周日）的摄入总量"""
+        day = datetime.date.fromisoformat(date)
+        monday = day - datetime.timedelta(days=day.weekday())
+        return self._window_total(monday, 7)
+
+    def month_total(self, date):
+        """date 所在自然月的摄入总量"""
+        day = datetime.date.fromisoformat(date)
+        first = day.replace(day=1)
+        next_month = (first + datetime.timedelta(days=32)).replace(day=1)
+        return self._window_total(first, (next_month - first).days)
+
+    def _window_total(self, first, days):
+        """从 first 开始连续 days 天的总量；前缀和已作废时逐日相加，不为此重建"""
+        dates = [(first + datetime.timedelta(days=i)).isoformat() for i in range(days)]
+        with self._lock:
+            if self._prefix is None:
+                return sum(self._daily.get(date, 0) for date in dates)
+        return self.total_between(dates[0], dates[-1])
+
+    def _rebuild(self):
+        """按日历天重建前缀和：prefix[i] 为前 i 天的总量（须持有锁）"""
+        if not self._daily:
+            self._prefix = [0]
+            self._base = 0
+            return
+
+        ordinals = {date_ordinal(date): total for date, total in list(self._daily.items())}
+        self._base = min(ordinals)
+        span = max(ordinals) - self._base + 1
+
+        prefix = [0] * (span + 1)
+        running = 0
+        for i in range(span):
+            running += ordinals.get(self._base + i, 0)
+            prefix[i + 1] = running
+        self._prefix = prefix
+
+
+class _FoodStats:
+    __slots__ = ('name', 'last_date', 'last_calories')
+
+    def __init__(self, name):
+        self.name = name
+        self.last_date = ""
+        self.last_calories = None
+
+
+class FoodIndex:
+    """吃过的食物的前缀索引，用于输入时自动补全
+
+    食物名称（忽略大小写）保存在有序数组中，前缀查询用二分查找定位区间。
+    排序分数综合次数和最近程度：每记录一次加上随日期指数增长的权重，
+    每过 HALF_LIFE_DAYS 天权重翻倍，相当于旧记录的分量每隔这么多天减半。
+    分数以 log2 保存，避免多年后数值溢出。
+
+    查询过的前缀缓存其分数最高的若干食物。分数只增不减，记录一次食物后
+    只需把它插入（或调整）在各个前缀的缓存中的位置，缓存始终准确。
+    单个字的前缀覆盖的食物最多、现算最慢，建立索引时一次性算好并常驻，不参与缓存淘汰。
+
+    lock 的含义同 BmrDateIndex：查询时持有，add 须由调用方在持有它时调用。
+    """
+
+    # 权重翻倍的天数
+    HALF_LIFE_DAYS = 30
+    # 缓存每个前缀的前若干个结果
+    CACHED_LIMIT = 10
+    # 缓存的前缀数上限，超过后整体清空
+    CACHE_SIZE = 4096
+
+    def __init__(self, calorie_intake=None, lock=None):
+        self._lock = lock if lock is not None else contextlib.nullcontext()
+        self._foods = {}
+        self._scores = {}
+        self._cache = {}
+        for date, items in (calorie_intake or {}).items():
+            weight = date_ordinal(date) / self.HALF_LIFE_DAYS
+            for item in items:
+                self._add(date, weight, item['food'], item['calories'])
+        self._keys = sorted(self._foods)
+
+        # 首字前缀 -> 分数最高的若干键；键已排序，同一首字的键相邻
+        self._heads = {}
+        start = 0
+        while start < len(self._keys):
+            head = self._keys[start][0]
+            end = bisect.bisect_left(self._keys, head + chr(0x10FFFF), start)
+            self._heads[head] = heapq.nlargest(self.CACHED_LIMIT, self._keys[start:end],
+                                               key=self._scores.__getitem__)
+            start = end
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, date, food, calories):
+        """记录一次食物摄入"""
+        key = food.casefold()
+        is_new = key not in self._foods
+        # 先登记统计和分数再插入键，键可见时它的数据一定已经存在
+        self._add(date, date_ordinal(date) / self.HALF_LIFE_DAYS, food, calories)
+        if is_new:
+            bisect.insort(self._keys, key)
+
+        scores = self._scores
+        for i in range(len(key) + 1):
+            if i == 1:
+                best = self._heads.setdefault(key[:1], [])
+            else:
+                best = self._cache.get(key[:i])
+            if best is None:
+                continue
+            if key not in best:
+                if len(best) < self.CACHED_LIMIT:
+                    # 缓存未满说明该前缀下的食物已全部在内
+                    best.append(key)
+                elif scores[key] > scores[best[-1]]:
+                    best[-1] = key
+                else:
+                    continue
+            best.sort(key=scores.__getitem__, reverse=True)
+
+    def _add(self, date, weight, food, calories):
+        key = food.casefold()
+        stats = self._foods.get(key)
+        if stats is None:
+            stats = self._foods[key] = _FoodStats(food)
+            self._scores[key] = weight
+        else:
+            score = self._scores[key]
+            high, low = max(score, weight), min(score, weight)
+            self._scores[key] = high + math.log2(1 + 2 ** (low - high))
+
+        # 同一天的多次记录以后录入的为准
+        if date >= stats.last_date:
+            stats.name = food
+            stats.last_date = date
+            stats.last_calories = calories
+
+    def suggest(self, prefix, limit=8):
+        """返回以 prefix 开头、分数最高的若干食物，每项为 (名称, 上次的卡路里)"""
+        key = prefix.casefold()
+        with self._lock:
+            if limit > self.CACHED_LIMIT:
+                best = self._search(key, limit)
+            elif len(key) == 1:
+                best = self._heads.get(key, [])
+            else:
+                best = self._cache.get(key)
+                if best is None:
+                    if len(self._cache) >= self.CACHE_SIZE:
+                        self._cache.clear()
+                    best = self._cache[key] = self._search(key, self.CACHED_LIMIT)
+            foods = self._foods
+            return [(foods[k].name, foods[k].last_calories) for k in best[:limit]]
+
+    def _search(self, key, limit):
+        """二分查找前缀区间，取分数最高的 limit 个键"""
+        lo = bisect.bisect_left(self._keys, key)
+        hi = bisect.bisect_left(self._keys, key + chr(0x10FFFF), lo)
+        return heapq.nlargest(limit, self._keys[lo:hi], key=self._scores.__getitem__)
+
+    def last_calories(self, food):
+        """某种食物最近一次记录的卡路里，没有记录时返回 None"""
+        with self._lock:
+            stats = self._foods.get(food.casefold())
+            return None if stats is None else stats.last_calories
@@ -0,0 +1,101 @@
+"""多用户档案：每个用户的数据存放在各自的数据文件（分片）中，只加载当前用户的分片
+
+档案索引 profiles.json 很小，启动时只读它来确定当前用户和对应的数据文件：
+    {"active": "default", "profiles": [{"id": "default", "name": "默认用户",
+                                         "data_file": "health_data.json"}, ...]}
+默认用户的数据仍是原来的 health_data.json；新建的用户存放在 profiles 目录下。
+没有索引文件时只有默认用户，直到第一次新建或切换用户才写入索引。
+"""
+import json
+import os
+
+from health_fileio import atomic_file
+
+INDEX_FILE = "profiles.json"
+PROFILE_DIR = "profiles"
+DEFAULT_PROFILE = {'id': "default", 'name': "默认用户", 'data_file': "health_data.json"}
+
+
+class ProfileIndex:
+    """档案索引：记录各用户的名称和数据文件，以及当前用户"""
+
+    def __init__(self, index_file=INDEX_FILE):
+        self.index_file = index_file
+        self.profiles = [dict(DEFAULT_PROFILE)]
+        self.active = DEFAULT_PROFILE['id']
+
+    @classmethod
+    def load(cls, index_file=INDEX_FILE):
+        """读取档案索引，不存在时只有默认用户"""
+        index = cls(index_file)
+        if os.path.exists(index_file):
+            with open(index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            index.profiles = data.get('profiles') or index.profiles
+            index.active = data.get('active', index.profiles[0]['id'])
+            if index.find(index.active) is None:
+                index.active = index.profiles[0]['id']
+        return index
+
+    def save(self):
+        """写入档案索引，先写临时文件并落盘再原子替换"""
+        with atomic_file(self.index_file, 'w', encoding='utf-8') as f:
+            json.dump({'active': self.active, 'profiles': self.profiles}, f,
+                      ensure_ascii=False, indent=4)
+
+    def find(self, profile_id):
+        """按编号查找档案，不存在时返回 None"""
+        for profile in self.profiles:
+            if profile['id'] == profile_id:
+                return profile
+        return None
+
+    def get(self, profile_id=None):
+        """返回档案（默认为当前用户）"""
+        profile = self.find(profile_id or self.active)
+        if profile is None:
+            raise KeyError(f"用户不存在: {profile_id}")
+        return profile
+
+    def data_file(self, profile_id=None):
+        """档案对应的数据文件路径（相对路径以索引文件所在目录为准）"""
+        path = self.get(profile_id)['data_file']
+        return os.path.join(os.path.dirname(self.index_file), path)
+
+    def add(self, name):
+        """新建用户档案并保存索引，返回档案"""
+        name = name.strip()
+        if not name:
+            raise ValueError("请输入用户名称")
+        if any(profile['name'] == name for profile in self.profiles):
+            raise ValueError(f"用户“{name}”已存在")
+
+        number = len(self.profiles)
+        while self.find(f"user{number}") is not None:
+            number += 1
+        profile_id = f"user{number}"
+        profile = {
+            'id': profile_id,
+            'name': name,
+            'data_file': f"{PROFILE_DIR}/{profile_id}.json"
+        }
+        os.makedirs(os.path.join(os.path.dirname(self.index_file), PROFILE_DIR), exist_ok=True)
+        self.profiles.append(profile)
+        self.save()
+        return profile
+
+    def rename(self, profile_id, name):
+        """修改用户名称并保存索引"""
+        name = name.strip()
+        if not name:
+            raise ValueError("请输入用户名称")
+        if any(p['name'] == name and p['id'] != profile_id for p in self.profiles):
+            raise ValueError(f"用户“{name}”已存在")
+        self.get(profile_id)['name'] = name
+        self.save()
+
+    def set_active(self, profile_id):
+        """切换当前用户并保存索引"""
+        self.get(profile_id)
+        self.active = profile_id
+        self.save()
@@ -0,0 +1,109 @@
+"""紧凑的内存记录：用带 __slots__ 的只读记录类代替每条记录一个字典
+
+多年的数据会有数以万计的记录，字典要为每条记录保存一份键表和哈希表。
+记录类只保存字段值，日期、食物名称、BMI类别、性别和活动水平描述等重复出现的
+字符串经 sys.intern 驻留后全部记录共用一份。
+
+记录类实现了只读的映射接口（record['date']、record.get、dict(record) 等），
+其余代码无需区分字典和记录类。只有字段及其顺序与界面生成的记录完全一致时才转换，
+其他记录（例如旧版本或手工编辑留下的字段）保持原字典，写回 JSON 时逐字节不变。
+"""
+import sys
+from collections.abc import Mapping
+
+
+class CompactRecord(Mapping):
+    """只读的定长记录，字段即 __slots__，按 JSON 中的键顺序排列"""
+
+    __slots__ = ()
+    # 需要驻留的字符串字段
+    INTERNED = ()
+
+    @classmethod
+    def from_dict(cls, record):
+        """字段与顺序完全一致时转换为记录类，否则原样返回，保证写回时无损"""
+        if type(record) is not dict or tuple(record) != cls.__slots__:
+            return record
+        compact = cls.__new__(cls)
+        for name, value in record.items():
+            if name in cls.INTERNED and type(value) is str:
+                value = sys.intern(value)
+            setattr(compact, name, value)
+        return compact
+
+    @classmethod
+    def from_values(cls, values):
+        """按字段顺序由一行值构造记录（值应已驻留）"""
+        compact = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, values):
+            setattr(compact, name, value)
+        return compact
+
+    def to_dict(self):
+        """转换回与原 JSON 结构相同的字典"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class BmiRecord(CompactRecord):
+    """一条BMI记录"""
+
+    __slots__ = ('date', 'weight', 'height', 'bmi', 'category')
+    INTERNED = ('date', 'category')
+
+
+class BmrRecord(CompactRecord):
+    """一条代谢率记录"""
+
+    __slots__ = ('date', 'weight', 'height', 'age', 'gender', 'activity_level',
+                 'activity_description', 'bmr', 'tdee')
+    INTERNED = ('date', 'gender', 'activity_description')
+
+
+class IntakeItem(CompactRecord):
+    """一条食物能量摄入记录（日期是所在分组的键）"""
+
+    __slots__ = ('food', 'calories')
+    INTERNED = ('food',)
+
+
+RECORD_CLASSES = {
+    'bmi_records': BmiRecord,
+    'bmr_records': BmrRecord
+}
+
+
+def compact_collection(name, value):
+    """把从 JSON 解析出的一个集合转换为紧凑记录；无法识别的结构原样返回"""
+    if name == 'calorie_intake':
+        if not isinstance(value, dict):
+            return value
+        return {
+            sys.intern(date): [IntakeItem.from_dict(item) for item in items]
+            if isinstance(items, list) else items
+            for date, items in value.items()
+        }
+    if name in RECORD_CLASSES and isinstance(value, list):
+        record_class = RECORD_CLASSES[name]
+        return [record_class.from_dict(record) for record in value]
+    return value
+
+
+def to_json(value):
+    """json.dump 的 default 参数：把紧凑记录转换回字典"""
+    if isinstance(value, CompactRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
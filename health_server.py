@@ -0,0 +1,344 @@
+"""本地 HTTP/JSON 接口：不打开界面，供体重秤、脚本等程序写入和查询记录
+
+用法：
+    python health_server.py                        # 监听 127.0.0.1:8765
+    python health_server.py --port 9000 --profile user1
+
+接口（请求体和响应均为 UTF-8 JSON）：
+    GET  /api/status
+    GET  /api/bmi?start=YYYY-MM-DD&end=YYYY-MM-DD   BMI记录，按日期先后，区间两端均可省略
+    GET  /api/bmr?start=&end=                       代谢率记录
+    GET  /api/intake?start=&end=                    能量摄入记录
+    GET  /api/balance?date=YYYY-MM-DD               某天的摄入、TDEE和热量缺口（默认今天）
+    GET  /api/balance?start=&end=                   区间内逐日热量平衡及汇总
+    POST /api/bmi       {"weight": 70, "height": 175, "date": "2024-01-01"}
+    POST /api/bmr       {"weight", "height", "age", "gender", "activity_level", "date"}
+    POST /api/intake    {"food", "calories", "date"}
+    POST /api/records   同上，每条用 type 字段注明 bmi / bmr / intake
+
+POST 的请求体可以是一个对象，也可以是对象数组（批量写入）。整批先全部校验，任何一条不合法时
+整批都不写入，返回 422 和各条的错误；全部合法时作为一批写入并落盘后返回 201。
+date 省略时为今天，字段和校验规则与 health_import 相同。
+
+连接默认保持（HTTP/1.1 keep-alive），同一连接上可以连续发送请求。
+界面可以同时打开同一个数据文件：写入经由存储的文件锁与界面合并，查询前先读入界面新写入的记录，
+界面也会定期读入这里写入的记录。没有身份验证，只应监听本机地址。
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from health_analytics import summarize_range
+from health_core import HealthTracker, InvalidInputError, today
+from health_import import parse_row
+from health_profiles import ProfileIndex
+from health_records import to_json
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# 请求头和请求体的大小上限（字节）
+MAX_HEADER_SIZE = 64 * 1024
+MAX_BODY_SIZE = 8 * 1024 * 1024
+# 单批最多条数
+MAX_BATCH = 10000
+# 区间查询最多天数
+MAX_RANGE_DAYS = 366 * 20
+# 保持连接的空闲超时（秒）
+KEEP_ALIVE_TIMEOUT = 30
+
+# 写入接口对应的记录类型；/api/records 的类型由每条记录的 type 字段决定
+POST_PATHS = {
+    '/api/bmi': 'bmi',
+    '/api/bmr': 'bmr',
+    '/api/intake': 'intake',
+    '/api/records': None
+}
+
+
+class HttpError(Exception):
+    """以指定状态码和 JSON 错误消息结束请求"""
+
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.body = {'error': message, **extra}
+
+
+def query_date(query, name, default=None):
+    """取出查询参数中的日期并校验格式"""
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return datetime.date.fromisoformat(values[0]).isoformat()
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{name} 的格式应为 YYYY-MM-DD")
+
+
+def parse_records(payload, record_type=None):
+    """把请求体（对象或对象数组）转换为 (类型, 记录) 列表；有不合法的条目时整批拒绝"""
+    items = payload if isinstance(payload, list) else [payload]
+    if not items:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "请求体不能为空数组")
+    if len(items) > MAX_BATCH:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"每批最多 {MAX_BATCH} 条")
+
+    records = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': "不是 JSON 对象"})
+            continue
+        row = dict(item)
+        if row.get('date') in (None, ""):
+            row['date'] = today()
+        if record_type is not None:
+            row['type'] = record_type
+        try:
+            records.append(parse_row(row))
+        except InvalidInputError as e:
+            errors.append({'index': index, 'error': str(e)})
+
+    if errors:
+        raise HttpError(HTTPStatus.UNPROCESSABLE_ENTITY, "记录不合法，整批未写入", errors=errors)
+    return records
+
+
+def record_output(record_type, record):
+    """写入结果中的一条记录"""
+    if record_type == 'intake':
+        date, item = record
+        return {'type': 'intake', 'date': date, **item}
+    return {'type': record_type, **record}
+
+
+class HealthServer:
+    """在 asyncio 事件循环中处理 HTTP 请求
+
+    存储操作交给单独的一个线程依次执行：慢查询不会阻塞其他连接，存储也不会被并发调用。
+    """
+
+    def __init__(self, tracker, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.tracker = tracker
+        self.store = tracker.store
+        self.host = host
+        self.port = port
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="health-store")
+        self._server = None
+        self._get_handlers = {
+            '/api/status': self._status,
+            '/api/bmi': lambda query: self._records(self.store.iter_bmi_records, query),
+            '/api/bmr': lambda query: self._records(self.store.iter_bmr_records, query),
+            '/api/intake': self._intake,
+            '/api/balance': self._balance
+        }
+
+    async def start(self):
+        """开始监听，返回实际监听的 (地址, 端口)"""
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_SIZE
+        )
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """开始监听并一直运行"""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        """停止执行存储操作的线程（存储本身由调用方关闭）"""
+        if self._server is not None:
+            self._server.close()
+        self._executor.shutdown(wait=True)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _handle_connection(self, reader, writer):
+        """处理一个连接上的连续请求，直到对方关闭、要求关闭或空闲超时"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HttpError as e:
+                    # 请求无法完整读取，连接上的后续数据已无法解析，回复后关闭
+                    await self._send(writer, e.status, e.body, keep_alive=False)
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+
+                method, path, query, body, keep_alive = request
+                try:
+                    status, payload = await self._dispatch(method, path, query, body)
+                except HttpError as e:
+                    status, payload = e.status, e.body
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"服务器内部错误：{e}"}
+                await self._send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _read_request(self, reader):
+        """读取一个请求，返回 (方法, 路径, 查询参数, 请求体, 是否保持连接)；对方已关闭连接时返回 None"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "请求头过大")
+
+        lines = head.decode('latin-1').split("\r\n")
+        parts = lines[0].split(" ")
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "请求行格式错误")
+        method, target, version = parts
+
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, sep, value = line.partition(":")
+                if not sep:
+                    raise HttpError(HTTPStatus.BAD_REQUEST, "请求头格式错误")
+                headers[name.strip().lower()] = value.strip()
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HttpError(HTTPStatus.NOT_IMPLEMENTED, "不支持分块传输，请提供 Content-Length")
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Content-Length 无效")
+        if length < 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Content-Length 无效")
+        if length > MAX_BODY_SIZE:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"请求体不能超过 {MAX_BODY_SIZE} 字节")
+        body = await reader.readexactly(length) if length else b""
+
+        connection = headers.get('connection', '').lower()
+        if version == "HTTP/1.0":
+            keep_alive = connection == 'keep-alive'
+        else:
+            keep_alive = connection != 'close'
+
+        url = urlsplit(target)
+        return method.upper(), url.path.rstrip('/') or '/', parse_qs(url.query), body, keep_alive
+
+    async def _dispatch(self, method, path, query, body):
+        """按方法和路径分派请求，返回 (状态码, 响应内容)"""
+        if method == 'GET' and path in self._get_handlers:
+            return HTTPStatus.OK, await self._run(self._get_handlers[path], query)
+        if method == 'POST' and path in POST_PATHS:
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise HttpError(HTTPStatus.BAD_REQUEST, "请求体不是有效的 JSON")
+            return HTTPStatus.CREATED, await self._run(self._add_records, payload, POST_PATHS[path])
+        if path in self._get_handlers or path in POST_PATHS:
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f"不支持 {method} 方法")
+        raise HttpError(HTTPStatus.NOT_FOUND, f"没有这个接口: {path}")
+
+    async def _send(self, writer, status, payload, keep_alive):
+        status = HTTPStatus(status)
+        body = json.dumps(payload, ensure_ascii=False, default=to_json).encode('utf-8')
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                "\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    # 以下方法在存储线程中执行
+
+    def _status(self, query):
+        return {'status': "ok", 'today': today()}
+
+    def _records(self, iterate, query):
+        self.store.sync()
+        start_date = query_date(query, 'start')
+        end_date = query_date(query, 'end')
+        return {'records': list(iterate(start_date, end_date))}
+
+    def _intake(self, query):
+        self.store.sync()
+        start_date = query_date(query, 'start')
+        end_date = query_date(query, 'end')
+        return {'records': [{'date': date, **item}
+                            for date, item in self.store.iter_intake(start_date, end_date)]}
+
+    def _balance(self, query):
+        self.store.sync()
+        start_date = query_date(query, 'start')
+        end_date = query_date(query, 'end')
+        if start_date is None and end_date is None:
+            return self.tracker.balance_on(query_date(query, 'date', today()))
+
+        if start_date is None or end_date is None:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "start 和 end 需同时提供")
+        days = (datetime.date.fromisoformat(end_date) - datetime.date.fromisoformat(start_date)).days
+        if days < 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "start 不能晚于 end")
+        if days >= MAX_RANGE_DAYS:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"区间不能超过 {MAX_RANGE_DAYS} 天")
+        rows = self.tracker.analyze_range(start_date, end_date)
+        return {'days': rows, 'summary': summarize_range(rows)}
+
+    def _add_records(self, payload, record_type):
+        records = parse_records(payload, record_type)
+        self.store.add_many(
+            [record for kind, record in records if kind == 'bmi'],
+            [record for kind, record in records if kind == 'bmr'],
+            [record for kind, record in records if kind == 'intake']
+        )
+        # 落盘后才回复，客户端收到 201 即可认为记录已保存
+        self.store.flush()
+        return {'added': len(records), 'records': [record_output(*record) for record in records]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地 HTTP/JSON 接口（无界面）")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址（默认 {DEFAULT_HOST}）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口（默认 {DEFAULT_PORT}）")
+    parser.add_argument("--data-file", default="health_data.json", help="数据文件路径")
+    parser.add_argument("--profile", help="用户编号（见 profiles.json），指定后忽略 --data-file")
+    args = parser.parse_args(argv)
+
+    data_file = args.data_file
+    if args.profile:
+        data_file = ProfileIndex.load().data_file(args.profile)
+    tracker = HealthTracker.open(data_file)
+    server = HealthServer(tracker, args.host, args.port)
+
+    async def run():
+        host, port = await server.start()
+        print(f"正在监听 http://{host}:{port}/api/ （数据文件 {data_file}），按 Ctrl+C 停止", flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        tracker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1211 @@
+import contextlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from health_binary import (MAGIC, header_seq, is_binary_file, iter_binary_snapshot, read_binary_snapshot,
+                           write_binary_snapshot)
+from health_fileio import (BACKUP_SUFFIX, LOCK_SUFFIX, FileLock, atomic_file, recover_interrupted_replace,
+                           truncate_torn_tail)
+from health_index import BmrDateIndex, FoodIndex, IntakeTotals
+from health_records import BmiRecord, BmrRecord, IntakeItem, compact_collection, to_json
+
+# 三类记录集合的名称，同时也是 JSON 顶层的键
+COLLECTIONS = ('bmi_records', 'bmr_records', 'calorie_intake')
+
+# 日志操作类型对应的集合
+OP_COLLECTIONS = {
+    'bmi': 'bmi_records',
+    'bmr': 'bmr_records',
+    'intake': 'calorie_intake'
+}
+
+
+def empty_data():
+    """返回空的数据结构"""
+    return {
+        'bmi_records': [],
+        'calorie_intake': {},
+        'bmr_records': []
+    }
+
+
+def apply_op(data, op):
+    """把一条日志操作应用到数据上"""
+    kind = op['op']
+    if kind == 'bmi':
+        data['bmi_records'].append(BmiRecord.from_dict(op['record']))
+    elif kind == 'bmr':
+        data['bmr_records'].append(BmrRecord.from_dict(op['record']))
+    elif kind == 'intake':
+        data['calorie_intake'].setdefault(op['date'], []).append(IntakeItem.from_dict(op['item']))
+    else:
+        raise ValueError(f"未知的日志操作: {kind}")
+
+
+def in_date_range(date, start_date=None, end_date=None):
+    """判断日期是否在区间内（含两端，None 表示不限）"""
+    return (start_date is None or date >= start_date) and (end_date is None or date <= end_date)
+
+
+def new_items(known, items):
+    """逐条产出 items 中比 known 多出的摄入（按食物和卡路里计数比较）"""
+    if len(items) == len(known):
+        return
+    seen = Counter((item['food'], item['calories']) for item in known)
+    for item in items:
+        key = (item['food'], item['calories'])
+        if seen[key]:
+            seen[key] -= 1
+        else:
+            yield item
+
+
+def iter_sorted_records(records, start_date=None, end_date=None):
+    """按日期先后（同一天保持录入顺序）逐条产出区间内的记录"""
+    for record in sorted(records, key=lambda x: x['date']):
+        if in_date_range(record['date'], start_date, end_date):
+            yield record
+
+
+def read_journal(path):
+    """逐行读取日志文件中的操作"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def is_journal_line(line):
+    """判断日志中的一行是否完整（能解析且带有序号）"""
+    try:
+        op = json.loads(line)
+    except ValueError:
+        return False
+    return isinstance(op, dict) and 'seq' in op
+
+
+def iter_snapshot(path):
+    """逐个解析快照文件的顶层字段，每解析完一个字段就产出 (键, 值)；自动识别二进制快照"""
+    if not os.path.exists(path):
+        return
+    if is_binary_file(path):
+        yield from iter_binary_snapshot(path)
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    decoder = json.JSONDecoder()
+    skip = json.decoder.WHITESPACE.match
+
+    pos = skip(text, 0).end()
+    if text[pos:pos + 1] != '{':
+        raise ValueError(f"数据文件格式错误: {path}")
+    pos = skip(text, pos + 1).end()
+
+    while text[pos:pos + 1] != '}':
+        key, pos = decoder.raw_decode(text, pos)
+        pos = skip(text, pos).end()
+        if text[pos:pos + 1] != ':':
+            raise ValueError(f"数据文件格式错误: {path}")
+        pos = skip(text, pos + 1).end()
+        value, pos = decoder.raw_decode(text, pos)
+        yield key, value
+
+        pos = skip(text, pos).end()
+        if text[pos:pos + 1] == ',':
+            pos = skip(text, pos + 1).end()
+        elif text[pos:pos + 1] != '}':
+            raise ValueError(f"数据文件格式错误: {path}")
+
+
+_JSON_SEQ = re.compile(rb'\{\s*"journal_seq"\s*:\s*(\d+)')
+
+
+def read_snapshot_seq(path):
+    """只读快照开头，返回其中的 journal_seq；文件不存在或开头没有该字段时返回 0"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(64)
+    except FileNotFoundError:
+        return 0
+    if head.startswith(MAGIC):
+        return header_seq(head)
+    match = _JSON_SEQ.match(head)
+    return int(match.group(1)) if match else 0
+
+
+def read_snapshot(path):
+    """读取快照文件（JSON 或二进制），返回 (数据, 快照包含的最后日志序号)"""
+    if not os.path.exists(path):
+        return empty_data(), 0
+    if is_binary_file(path):
+        data, seq = read_binary_snapshot(path)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        seq = data.pop('journal_seq', 0)
+    for key, value in empty_data().items():
+        data.setdefault(key, value)
+    return data, seq
+
+
+def write_snapshot(path, data, seq, binary=False, backup=True):
+    """写入快照文件（journal_seq 放在最前面），先写临时文件并落盘再原子替换
+
+    backup 为 True 时原快照保留为 .bak，快照损坏时加载会退回到它。
+    """
+    if binary:
+        write_binary_snapshot(path, data, seq, backup)
+        return
+    snapshot = {'journal_seq': seq}
+    snapshot.update(data)
+    with atomic_file(path, 'w', encoding='utf-8', backup=backup) as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=4, default=to_json)
+
+
+class JournalStore:
+    """追加式日志存储：每次修改只追加一行日志，后台再合并进快照文件
+
+    快照文件仍是原来的 health_data.json，日志文件为 health_data.json.journal。
+    每条日志带有递增序号 seq，快照中记录已合并的最后序号 journal_seq，
+    加载时跳过已合并的日志，因此合并过程中任何时刻崩溃都不会重复记录。
+
+    修改立即作用于内存，日志由后台写入线程落盘：短时间内的连续修改
+    （例如连续添加几样食物）会合并为一次写入。退出前需调用 close()。
+
+    内存中的记录是 health_records 中的紧凑记录类，写回快照时还原为原来的 JSON 结构。
+    快照也可以是 health_binary 中的二进制格式，加载时自动识别，写回时保持原格式。
+
+    日志每批写入后 fsync，快照经临时文件原子替换并保留上一版 .bak。
+    加载时丢弃日志末尾写了一半的行；快照丢失或损坏时从 .bak 加上日志恢复，
+    恢复过程记录在 recovery_notes 中供界面提示。
+
+    多个程序实例可以同时使用同一个数据文件（例如从共享目录启动）：
+    追加日志时持有文件锁，先读入其他实例新追加的日志并入内存，再分配全局唯一的序号写入，
+    锁内只做这几毫秒的读写，fsync 在释放锁之后进行。快照只由合并写入，合并以磁盘上的
+    快照和日志为准，而不是用内存覆盖，因此不会丢失其他实例的记录。合并另有一把锁，
+    同一时刻只有一个实例在合并。
+    """
+
+    # 日志累计到多少行时触发后台合并
+    COMPACT_THRESHOLD = 500
+    # 写入合并窗口（秒）：窗口内的修改一次写入
+    COALESCE_WINDOW = 0.2
+    # 写入失败后重试的间隔（秒）
+    RETRY_INTERVAL = 1.0
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+        self.journal_file = data_file + ".journal"
+        self.compacting_file = data_file + ".compacting"
+        self.backup_file = data_file + BACKUP_SUFFIX
+        # 文件锁：追加和轮换日志时持有（很短）；合并快照时持有另一把
+        self._file_lock = FileLock(data_file + LOCK_SUFFIX)
+        self._compact_lock = FileLock(data_file + ".compact" + LOCK_SUFFIX, timeout=None)
+        # 各日志文件已读到的位置和最后读到的一行，用来识别文件是否已被轮换（须持有文件锁访问）
+        self._journal_offsets = {}
+        self.data = empty_data()
+        # 快照是否为二进制格式，加载时按文件内容确定
+        self.binary = False
+        self._seq = 0
+        self._journal_lines = 0
+        self._lock = threading.Lock()
+        self._compactor = None
+        # 索引在持有 _lock 时修改，其他线程查询时同样持有它（见 health_index）
+        self._bmr_index = BmrDateIndex(lock=self._lock)
+        self._intake_totals = IntakeTotals(lock=self._lock)
+        # 食物自动补全索引，能量摄入加载完成后在后台建立；建立期间新增的摄入先记在 _food_backlog 中
+        self._food_index = None
+        self._food_backlog = None
+        # 后台写入：待写入的操作、已提交和已落盘的操作数、写入线程
+        self._changed = threading.Condition(self._lock)
+        self._pending = []
+        self._submitted = 0
+        self._durable = 0
+        # 读入其他实例日志的请求：已请求和已完成的次数
+        self._sync_requested = 0
+        self._sync_done = 0
+        self._flush_now = threading.Event()
+        self._writer = None
+        self._closing = False
+        self.write_error = None
+        # 最近一次轮换或合并日志失败的原因（日志已写入，只是暂未合并，稍后会重试）
+        self.compaction_error = None
+        # 已加载完成的集合；加载完成（或失败）后 _loaded 被置位
+        self._ready = set()
+        self._loaded = threading.Event()
+        self.load_error = None
+        # 加载时做过的修复（说明文字列表）
+        self.recovery_notes = []
+        # 各集合的版本号，每次修改加一，供界面缓存判断是否失效
+        self._versions = dict.fromkeys(COLLECTIONS, 0)
+
+    def load(self):
+        """加载快照并重放日志，每个集合解析完成后立即可用"""
+        self._ready = set()
+        self._loaded.clear()
+        self.load_error = None
+        try:
+            self._load()
+        except Exception as e:
+            self.load_error = e
+            raise
+        finally:
+            self._loaded.set()
+        return self.data
+
+    def load_in_background(self):
+        """在后台线程中加载数据，可通过 is_ready 查询各集合是否可用"""
+        def run():
+            try:
+                self.load()
+            except Exception:
+                # 错误已记录在 load_error 中，由界面负责提示
+                pass
+
+        threading.Thread(target=run, name="data-loader", daemon=True).start()
+
+    def is_ready(self, *collections):
+        """判断指定的集合是否已加载完成"""
+        return all(name in self._ready for name in collections)
+
+    def version(self, collection):
+        """返回集合的版本号，集合内容变化后版本号随之改变"""
+        return self._versions[collection]
+
+    def _load(self):
+        """修复上次异常退出留下的文件，再解析快照并重放日志（持有合并锁，期间快照不会被替换）"""
+        self.recovery_notes = []
+        with self._compact_lock:
+            if recover_interrupted_replace(self.data_file):
+                self.recovery_notes.append("上次保存在替换数据文件时中断，已使用已写完的新文件")
+            ops = self._read_journals()
+            self._load_recovering(ops)
+
+    def _read_journals(self):
+        """在文件锁内丢弃日志末尾的残行并整体读入日志：上次未完成合并的日志在前，当前日志在后"""
+        ops = []
+        with self._file_lock:
+            self._journal_offsets.clear()
+            for path in (self.compacting_file, self.journal_file):
+                if truncate_torn_tail(path, is_journal_line):
+                    self.recovery_notes.append("日志末尾有未写完的记录（上次异常退出），已丢弃")
+                lines = list(read_journal(path))
+                ops.extend(lines)
+            self._journal_lines = len(lines)
+        return ops
+
+    def _load_recovering(self, ops):
+        """解析快照；快照丢失或损坏时改用备份"""
+        if not os.path.exists(self.data_file) and os.path.exists(self.backup_file):
+            self.recovery_notes.append("数据文件丢失，已从备份和日志恢复")
+        else:
+            try:
+                self._load_snapshot(self.data_file, ops)
+                return
+            except ValueError as e:
+                if not os.path.exists(self.backup_file):
+                    raise
+                os.replace(self.data_file, self.data_file + ".corrupt")
+                self.recovery_notes.append(
+                    f"数据文件无法读取（{e}），已从备份和日志恢复，"
+                    f"损坏的文件保留为 {os.path.basename(self.data_file)}.corrupt"
+                )
+
+        # 备份可能缺少最近一次合并的记录，但日志中尚未合并的部分仍会重放；
+        # 日志保留不动，其中序号不大于新快照的部分加载时会被跳过
+        self._load_snapshot(self.backup_file, ops)
+        write_snapshot(self.data_file, self.data, self._seq, self.binary)
+
+    def _load_snapshot(self, snapshot_file, ops):
+        """解析快照：每解析完一个集合，就应用属于它的日志并发布"""
+        self.data = empty_data()
+        self._ready = set()
+        self.binary = is_binary_file(snapshot_file)
+
+        snapshot_seq = None
+        deferred = {}
+
+        def publish(name, value):
+            partial = {name: compact_collection(name, value)}
+            for op in ops:
+                if op['seq'] > snapshot_seq and OP_COLLECTIONS[op['op']] == name:
+                    apply_op(partial, op)
+            if name == 'bmr_records':
+                self._bmr_index = BmrDateIndex(partial[name], self._lock)
+            elif name == 'calorie_intake':
+                self._intake_totals = IntakeTotals(partial[name], self._lock)
+                self._food_index = None
+            self.data[name] = partial[name]
+            self._versions[name] += 1
+            self._ready.add(name)
+            if name == 'calorie_intake':
+                threading.Thread(target=self._build_food_index, name="food-index", daemon=True).start()
+
+        for key, value in iter_snapshot(snapshot_file):
+            if key == 'journal_seq':
+                snapshot_seq = value
+                for name, pending in deferred.items():
+                    publish(name, pending)
+                deferred.clear()
+            elif key not in COLLECTIONS:
+                self.data[key] = value
+            elif snapshot_seq is None:
+                # 旧版快照没有 journal_seq，或它不在文件开头，只能等解析完再发布
+                deferred[key] = value
+            else:
+                publish(key, value)
+
+        if snapshot_seq is None:
+            snapshot_seq = 0
+        for name in COLLECTIONS:
+            if name in deferred:
+                publish(name, deferred[name])
+            elif name not in self._ready:
+                publish(name, empty_data()[name])
+
+        self._seq = max([snapshot_seq] + [op['seq'] for op in ops])
+
+    def add_bmi_record(self, record):
+        """追加一条BMI记录"""
+        self._commit({'op': 'bmi', 'record': record})
+
+    def add_bmr_record(self, record):
+        """追加一条代谢率记录"""
+        self._commit({'op': 'bmr', 'record': record})
+
+    def add_intake(self, date, item):
+        """追加一条食物能量摄入记录"""
+        self._commit({'op': 'intake', 'date': date, 'item': item})
+
+    def add_many(self, bmi_records=(), bmr_records=(), intakes=()):
+        """批量追加记录（intakes 为 (日期, 摄入记录) 列表），全部记录作为一批写入日志"""
+        ops = [{'op': 'bmi', 'record': record} for record in bmi_records]
+        ops += [{'op': 'bmr', 'record': record} for record in bmr_records]
+        ops += [{'op': 'intake', 'date': date, 'item': item} for date, item in intakes]
+        if ops:
+            self._commit(*ops)
+
+    def _commit(self, *ops):
+        """应用操作并交给后台线程追加到日志，代价与历史数据量无关"""
+        # 后台加载尚未完成时，需等待日志序号确定后才能写入
+        self._loaded.wait()
+        if self.load_error is not None:
+            raise RuntimeError("数据尚未成功加载，无法保存记录")
+
+        with self._changed:
+            if self._closing:
+                raise RuntimeError("存储已关闭")
+            for op in ops:
+                self._apply(op)
+            # 序号在写入日志时才分配（须与其他实例的日志统一编号）
+            self._submitted += len(ops)
+            self._pending.extend(ops)
+            self._start_writer()
+            self._changed.notify_all()
+
+    def _start_writer(self):
+        """写入线程尚未启动时启动它（须持有 _lock）"""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="journal-writer", daemon=True)
+            self._writer.start()
+
+    def sync(self, wait=True):
+        """读入其他实例（另一个窗口、health_server 等）新写入的记录，有变化时相应集合的版本号加一
+
+        由写入线程在文件锁内完成；wait 为 False 时只发出请求，不等待完成。
+        """
+        if not self._loaded.is_set() or self.load_error is not None:
+            return
+        with self._changed:
+            if self._closing:
+                return
+            self._sync_requested += 1
+            target = self._sync_requested
+            self._start_writer()
+            self._flush_now.set()
+            self._changed.notify_all()
+            while wait and self._sync_done < target:
+                if self.write_error is not None:
+                    raise self.write_error
+                self._changed.wait()
+
+    def _apply(self, op):
+        """把操作应用到内存中的数据和索引（须持有 _lock）"""
+        apply_op(self.data, op)
+        if op['op'] == 'bmr':
+            self._bmr_index.insert(op['record'])
+        elif op['op'] == 'intake':
+            self._intake_totals.add(op['date'], op['item']['calories'])
+            self._note_food(op['date'], op['item'])
+        self._versions[OP_COLLECTIONS[op['op']]] += 1
+
+    def _note_food(self, date, item):
+        """把新增的摄入加入食物索引；索引正在建立时先记下（须持有 _lock）"""
+        if self._food_index is not None:
+            self._food_index.add(date, item['food'], item['calories'])
+        elif self._food_backlog is not None:
+            self._food_backlog.append((date, item['food'], item['calories']))
+
+    def _build_food_index(self):
+        """后台建立食物索引：在锁内复制一份摄入记录，建好后补上期间新增的摄入再启用"""
+        with self._lock:
+            intake = {date: list(items) for date, items in self.data['calorie_intake'].items()}
+            self._food_backlog = []
+        index = FoodIndex(intake, self._lock)
+        with self._lock:
+            for date, food, calories in self._food_backlog:
+                index.add(date, food, calories)
+            self._food_backlog = None
+            self._food_index = index
+
+    def _write_loop(self):
+        """后台写入线程：等待修改，合并窗口结束后一次性追加到日志"""
+        while True:
+            with self._changed:
+                while not self._pending and self._sync_done == self._sync_requested and not self._closing:
+                    self._changed.wait()
+                if not self._pending and self._sync_done == self._sync_requested:
+                    return
+
+            # 合并窗口内继续累积修改；flush/close/sync 时立即写入
+            self._flush_now.wait(self.COALESCE_WINDOW)
+
+            with self._changed:
+                batch = self._pending
+                self._pending = []
+                synced = self._sync_requested
+                if not self._closing:
+                    self._flush_now.clear()
+
+            try:
+                f = self._append_journal(batch)
+            except (OSError, ValueError) as e:
+                # 只有追加本身失败（这批操作没有写进日志）时才放回队列重试
+                with self._changed:
+                    self._pending[:0] = batch
+                    self.write_error = e
+                    self._changed.notify_all()
+                time.sleep(self.RETRY_INTERVAL)
+                continue
+
+            # 以下步骤出错时这批操作已在日志中（其他实例也已能读到），不能再次追加
+            sync_error = None
+            if f is not None:
+                # 落盘可能较慢，放在锁外进行
+                try:
+                    with f:
+                        os.fsync(f.fileno())
+                except OSError as e:
+                    sync_error = e
+
+            with self._changed:
+                self._durable += len(batch)
+                self._sync_done = synced
+                self.write_error = sync_error
+                self._changed.notify_all()
+
+            if self._journal_lines >= self.COMPACT_THRESHOLD:
+                self._start_compaction()
+
+    def _append_journal(self, batch):
+        """把一批操作追加到日志文件（仅在写入线程中调用），返回尚未 fsync 的文件
+
+        文件锁内先并入其他实例追加的日志，再接着最大序号为这批操作编号并写入；
+        batch 为空时只并入其他实例的日志，返回 None。抛出异常时这批操作没有写入。
+        """
+        base = None
+        while True:
+            with self._file_lock:
+                foreign = self._read_new_ops()
+                if foreign is None:
+                    # 可能是日志被轮换后又写入了不少，从头重读一次
+                    self._journal_offsets.clear()
+                    foreign = self._read_new_ops()
+                if foreign is not None:
+                    self._merge(foreign, base, batch)
+                    if not batch:
+                        return None
+                    f = self._write_ops(batch)
+                    break
+            # 缺少的日志已被其他实例合并进快照：在锁外重新读取快照，再重试
+            snapshot, self._seq = read_snapshot(self.data_file)
+            self._journal_offsets.clear()
+            base = self._prepare_base(snapshot)
+
+        self._journal_lines += len(batch)
+        return f
+
+    def _read_new_ops(self):
+        """读取其他实例新追加的日志操作（须持有文件锁）；序号与已知的不衔接时返回 None"""
+        ops = []
+        for path in (self.compacting_file, self.journal_file):
+            offset, last_line = self._journal_offsets.pop(path, (0, b""))
+            try:
+                f = open(path, 'r+b')
+            except FileNotFoundError:
+                continue
+            with f:
+                if offset:
+                    f.seek(offset - len(last_line))
+                    if f.read(len(last_line)) != last_line:
+                        # 上次读到的最后一行已不在原处：文件已被其他实例轮换，从头读取
+                        offset = 0
+                        last_line = b""
+                f.seek(offset)
+                chunk = f.read()
+                end = chunk.rfind(b"\n") + 1
+                if end < len(chunk):
+                    # 其他实例写到一半时异常退出留下的残行
+                    f.truncate(offset + end)
+
+            lines = chunk[:end].splitlines(keepends=True)
+            self._journal_offsets[path] = (offset + end, lines[-1] if lines else last_line)
+            if path == self.journal_file:
+                if offset == 0:
+                    self._journal_lines = 0
+                self._journal_lines += len(lines)
+            ops.extend(json.loads(line) for line in lines if line.strip())
+
+        ops = [op for op in ops if op['seq'] > self._seq]
+        for expected, op in enumerate(ops, self._seq + 1):
+            if op['seq'] != expected:
+                return None
+        # 其他实例合并后会删除已合并的日志：快照的序号更大说明漏掉了被删除的那部分
+        if self._seq + len(ops) < read_snapshot_seq(self.data_file):
+            return None
+        return ops
+
+    def _merge(self, foreign, base, batch):
+        """把其他实例的操作并入内存
+
+        base 为 _prepare_base 用重新读取的快照建好的数据时，以它加上日志替换内存中的数据，
+        并重放本实例尚未写入日志的操作；锁内只增量应用这些操作。
+        """
+        with self._changed:
+            if base is not None:
+                data, bmr_index, intake_totals, new_foods = base
+                ops = foreign + batch + self._pending
+                for op in ops:
+                    apply_op(data, op)
+                    if op['op'] == 'bmr':
+                        bmr_index.insert(op['record'])
+                    elif op['op'] == 'intake':
+                        intake_totals.add(op['date'], op['item']['calories'])
+                # 记录只增不减：食物索引只需补上重新读取后多出来的摄入，不必重建。
+                # 这些操作涉及的日期在锁内重新比较，其余日期沿用锁外比较的结果
+                touched = {op['date'] for op in ops if op['op'] == 'intake'}
+                old = self.data['calorie_intake']
+                for date, items in new_foods.items():
+                    if date not in touched:
+                        for item in items:
+                            self._note_food(date, item)
+                for date in touched:
+                    for item in new_items(old.get(date, ()), data['calorie_intake'][date]):
+                        self._note_food(date, item)
+                self.data = data
+                self._bmr_index = bmr_index
+                self._intake_totals = intake_totals
+                for name in COLLECTIONS:
+                    self._versions[name] += 1
+            else:
+                for op in foreign:
+                    self._apply(op)
+            if foreign:
+                self._seq = foreign[-1]['seq']
+
+    def _prepare_base(self, snapshot):
+        """在文件锁外用重新读取的快照建立数据和索引（仅在写入线程中调用）
+
+        返回 (数据, BMR 索引, 每日总量, 快照中比内存多出的摄入)，交给 _merge 在锁内替换。
+        """
+        data = empty_data()
+        data.update({key: compact_collection(key, value) for key, value in snapshot.items()})
+        with self._lock:
+            # 各天的列表只会追加；之后追加过的日期都在 _merge 的待应用操作中，会重新比较
+            known = dict(self.data['calorie_intake'])
+        new_foods = {}
+        for date, items in data['calorie_intake'].items():
+            added = list(new_items(known.get(date, ()), items))
+            if added:
+                new_foods[date] = added
+        return (data, BmrDateIndex(data['bmr_records'], self._lock),
+                IntakeTotals(data['calorie_intake'], self._lock), new_foods)
+
+    def _write_ops(self, batch):
+        """为操作编号并追加到日志（须持有文件锁），返回尚未 fsync 的文件"""
+        start = self._journal_offsets.get(self.journal_file, (0, b""))[0]
+        for seq, op in enumerate(batch, self._seq + 1):
+            op['seq'] = seq
+        lines = [(json.dumps(op, ensure_ascii=False, default=to_json) + "\n").encode('utf-8')
+                 for op in batch]
+
+        f = open(self.journal_file, 'ab')
+        try:
+            f.write(b"".join(lines))
+            f.flush()
+        except BaseException:
+            # 写入失败时去掉写了一部分的内容，重试时重新编号
+            with contextlib.suppress(OSError):
+                f.truncate(start)
+            f.close()
+            raise
+        self._seq = batch[-1]['seq']
+        self._journal_offsets[self.journal_file] = (f.tell(), lines[-1])
+        return f
+
+    def flush(self):
+        """等待此前的所有修改落盘；写入失败时抛出异常"""
+        with self._changed:
+            target = self._submitted
+            self._flush_now.set()
+            while self._durable < target:
+                if self.write_error is not None:
+                    raise self.write_error
+                self._changed.wait()
+
+    def _start_compaction(self):
+        """轮换日志文件并启动后台合并线程
+
+        失败（例如文件锁被其他实例占用超时）时只记在 compaction_error 中，
+        日志留待下次追加后再轮换。
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        try:
+            # 若已有待合并的日志（上次未完成，或其他实例正在合并），后台线程会等待或把它做完
+            if not self._rotate_journal() and not os.path.exists(self.compacting_file):
+                return
+        except OSError as e:
+            self.compaction_error = e
+            return
+
+        # 先启动再发布：save/close 可能在其他线程中随时 join 它
+        compactor = threading.Thread(target=self._compact_in_background, name="journal-compactor")
+        compactor.start()
+        self._compactor = compactor
+
+    def _compact_in_background(self):
+        """后台合并线程：出错时记下原因，待合并日志保留到下次合并"""
+        try:
+            self._compact()
+        except (OSError, ValueError) as e:
+            self.compaction_error = e
+        else:
+            self.compaction_error = None
+
+    def _rotate_journal(self):
+        """把当前日志改名为待合并日志（已有待合并日志时不轮换），返回是否轮换"""
+        with self._file_lock:
+            if os.path.exists(self.compacting_file) or not os.path.exists(self.journal_file):
+                return False
+            os.replace(self.journal_file, self.compacting_file)
+            if self.journal_file in self._journal_offsets:
+                self._journal_offsets[self.compacting_file] = self._journal_offsets.pop(self.journal_file)
+            self._journal_lines = 0
+            return True
+
+    def _compact(self, force=False):
+        """把待合并的日志合并进磁盘上的快照，只读写文件，不触碰内存中的数据
+
+        没有待合并的日志时什么也不做；force 为 True 时仍按当前格式重写快照。
+        """
+        with self._compact_lock:
+            # 持有合并锁时待合并日志不会消失；但它不存在时，其他实例随时可能轮换出新的，
+            # 只能删除这里确实读过的那一份
+            merging = os.path.exists(self.compacting_file)
+            if not merging and not force:
+                # 其他实例已经合并完成
+                return
+            data, seq = read_snapshot(self.data_file)
+            if merging:
+                for op in read_journal(self.compacting_file):
+                    if op['seq'] > seq:
+                        apply_op(data, op)
+                        seq = op['seq']
+
+            write_snapshot(self.data_file, data, seq, self.binary)
+            if merging:
+                with self._file_lock:
+                    os.remove(self.compacting_file)
+                    self._journal_offsets.pop(self.compacting_file, None)
+
+    def bmi_records(self):
+        """按日期从近到远返回BMI记录"""
+        return sorted(self.data['bmi_records'], key=lambda x: x['date'], reverse=True)
+
+    def bmr_records(self):
+        """按日期从近到远返回代谢率记录"""
+        return sorted(self.data['bmr_records'], key=lambda x: x['date'], reverse=True)
+
+    def intake_on(self, date):
+        """返回某一天的能量摄入记录"""
+        return self.data['calorie_intake'].get(date, [])
+
+    def iter_bmi_records(self, start_date=None, end_date=None):
+        """按日期先后逐条产出BMI记录，可限定日期区间（含两端）"""
+        return iter_sorted_records(self.data['bmi_records'], start_date, end_date)
+
+    def iter_bmr_records(self, start_date=None, end_date=None):
+        """按日期先后逐条产出代谢率记录，可限定日期区间（含两端）"""
+        return iter_sorted_records(self.data['bmr_records'], start_date, end_date)
+
+    def iter_intake(self, start_date=None, end_date=None):
+        """按日期先后逐条产出 (日期, 摄入记录)，可限定日期区间（含两端）"""
+        intake = self.data['calorie_intake']
+        # 写入线程可能同时新增日期，在锁内取一份日期列表
+        with self._lock:
+            dates = sorted(intake)
+        for date in dates:
+            if in_date_range(date, start_date, end_date):
+                for item in intake[date]:
+                    yield date, item
+
+    @property
+    def intake_totals(self):
+        """每日摄入总量缓存（IntakeTotals），支持按天、周、月和任意区间查询"""
+        return self._intake_totals
+
+    @property
+    def food_index(self):
+        """吃过的食物的前缀索引（FoodIndex）；能量摄入加载后在后台建立，建好之前为 None"""
+        return self._food_index
+
+    def latest_tdee(self, target_date):
+        """获取目标日期当天或之前最近的TDEE值"""
+        return self._bmr_index.latest_tdee(target_date)
+
+    def latest_tdee_many(self, target_dates):
+        """批量获取多个日期各自生效的TDEE值"""
+        return self._bmr_index.latest_tdee_many(target_dates)
+
+    def save(self):
+        """把磁盘上的全部日志（包括其他实例写入的）合并进快照并清空日志"""
+        self.flush()
+        if self._compactor is not None:
+            self._compactor.join()
+        # 先做完未完成的合并，再轮换当前日志合并一次
+        self._compact()
+        self._rotate_journal()
+        self._compact(force=True)
+
+    def close(self):
+        """把待写入的修改落盘，并等待后台线程结束"""
+        self.flush()
+        with self._changed:
+            self._closing = True
+            self._flush_now.set()
+            self._changed.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        if self._compactor is not None:
+            self._compactor.join()
+
+
+BMI_COLUMNS = ('date', 'weight', 'height', 'bmi', 'category')
+BMR_COLUMNS = ('date', 'weight', 'height', 'age', 'gender', 'activity_level',
+               'activity_description', 'bmr', 'tdee')
+INTAKE_COLUMNS = ('date', 'food', 'calories')
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bmi_records (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    weight REAL NOT NULL,
+    height REAL NOT NULL,
+    bmi REAL NOT NULL,
+    category TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bmi_records_date ON bmi_records (date);
+
+CREATE TABLE IF NOT EXISTS bmr_records (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    weight REAL NOT NULL,
+    height REAL NOT NULL,
+    age INTEGER NOT NULL,
+    gender TEXT NOT NULL,
+    activity_level INTEGER NOT NULL,
+    activity_description TEXT NOT NULL,
+    bmr INTEGER NOT NULL,
+    tdee INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bmr_records_date ON bmr_records (date);
+
+CREATE TABLE IF NOT EXISTS calorie_intake (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    food TEXT NOT NULL,
+    calories INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_calorie_intake_date ON calorie_intake (date);
+"""
+
+
+class SQLiteStore:
+    """SQLite 存储：三类记录各一张表并按日期建索引，查询走索引而不是全量加载
+
+    对外接口与 JournalStore 相同。同一日期的多条记录按插入顺序（id）排列，
+    与 JSON 存储中稳定排序的结果一致。
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._conn = None
+        self._lock = threading.Lock()
+        self._versions = dict.fromkeys(COLLECTIONS, 0)
+        # 索引在持有 _lock 时修改，其他线程查询时同样持有它（见 health_index）
+        self._intake_totals = IntakeTotals(lock=self._lock)
+        # 食物自动补全索引在后台建立，之后按行号补上新插入的摄入；关闭时通知建立线程停止并等待它
+        self._food_index = None
+        self._food_last_id = 0
+        self._food_builder = None
+        self._closing = threading.Event()
+
+    # SQLite 按需查询，不需要后台加载；崩溃恢复由 SQLite 自身的回滚日志完成
+    load_error = None
+    recovery_notes = ()
+
+    def load(self):
+        """打开数据库，建立每日总量缓存，并在后台建立食物索引"""
+        self._connect()
+        self._rebuild_caches()
+        self._food_builder = threading.Thread(target=self._build_food_index, name="food-index", daemon=True)
+        self._food_builder.start()
+
+    def _connect(self):
+        """打开数据库连接并确保表结构存在（不建立缓存，批量写入时只需这一步）"""
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        # 每次提交都等数据真正落盘；不用 WAL 模式，它在网络共享目录上不可靠
+        self._conn.execute("PRAGMA synchronous = FULL")
+        self._conn.executescript(SQLITE_SCHEMA)
+        self._conn.commit()
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _rebuild_caches(self):
+        """重建每日总量缓存（一次分组查询）"""
+        totals = IntakeTotals(lock=self._lock)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date, SUM(calories) FROM calorie_intake GROUP BY date"
+            ).fetchall()
+        for date, total in rows:
+            totals.add(date, total)
+        self._intake_totals = totals
+
+    def sync(self, wait=True):
+        """其他连接（另一个窗口、health_server 等）提交过修改时重建缓存，并使各集合的版本号加一"""
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        self._rebuild_caches()
+        self._update_food_index()
+        for name in COLLECTIONS:
+            self._versions[name] += 1
+
+    def load_in_background(self):
+        """打开数据库的开销很小，直接同步完成"""
+        self.load()
+
+    def is_ready(self, *collections):
+        """数据库打开后所有集合均可查询"""
+        return self._conn is not None
+
+    def version(self, collection):
+        """返回集合的版本号，集合内容变化后版本号随之改变"""
+        return self._versions[collection]
+
+    @property
+    def data(self):
+        """按 JSON 结构导出全部数据"""
+        data = empty_data()
+        data['bmi_records'] = self._select('bmi_records', BMI_COLUMNS, order="id")
+        data['bmr_records'] = self._select('bmr_records', BMR_COLUMNS, order="id")
+        for row in self._select('calorie_intake', INTAKE_COLUMNS, order="date, id"):
+            data['calorie_intake'].setdefault(row['date'], []).append(
+                {'food': row['food'], 'calories': row['calories']}
+            )
+        return data
+
+    def _select(self, table, columns, where="", params=(), order="id", limit=None):
+        """查询并把结果行转换为字典"""
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def _insert(self, table, columns, rows):
+        """批量插入记录并提交"""
+        sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' for _ in columns)})")
+        with self._lock:
+            self._conn.executemany(sql, [tuple(row[c] for c in columns) for row in rows])
+            self._conn.commit()
+
+    def add_bmi_record(self, record):
+        """追加一条BMI记录"""
+        self._insert('bmi_records', BMI_COLUMNS, [record])
+        self._versions['bmi_records'] += 1
+
+    def add_bmr_record(self, record):
+        """追加一条代谢率记录"""
+        self._insert('bmr_records', BMR_COLUMNS, [record])
+        self._versions['bmr_records'] += 1
+
+    def add_intake(self, date, item):
+        """追加一条食物能量摄入记录"""
+        self._insert('calorie_intake', INTAKE_COLUMNS, [dict(item, date=date)])
+        with self._lock:
+            self._intake_totals.add(date, item['calories'])
+        self._update_food_index()
+        self._versions['calorie_intake'] += 1
+
+    def add_many(self, bmi_records=(), bmr_records=(), intakes=()):
+        """批量追加记录（intakes 为 (日期, 摄入记录) 列表），在一个事务中提交"""
+        intake_rows = [dict(item, date=date) for date, item in intakes]
+        batches = [
+            ('bmi_records', BMI_COLUMNS, bmi_records),
+            ('bmr_records', BMR_COLUMNS, bmr_records),
+            ('calorie_intake', INTAKE_COLUMNS, intake_rows),
+        ]
+        with self._lock:
+            with self._conn:
+                for table, columns, rows in batches:
+                    if rows:
+                        sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                               f"VALUES ({', '.join('?' for _ in columns)})")
+                        self._conn.executemany(sql, [tuple(row[c] for c in columns) for row in rows])
+
+        for table, _, rows in batches:
+            if rows:
+                self._versions[table] += 1
+        with self._lock:
+            for row in intake_rows:
+                self._intake_totals.add(row['date'], row['calories'])
+        if intake_rows:
+            self._update_food_index()
+
+    def _iter_rows(self, table, columns, start_date, end_date):
+        """用独立连接分批读取区间内的记录，不占用主连接"""
+        where = []
+        params = []
+        if start_date is not None:
+            where.append("date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            where.append("date <= ?")
+            params.append(end_date)
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY date, id"
+
+        conn = sqlite3.connect(self.db_file)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(columns, row))
+        finally:
+            conn.close()
+
+    def iter_bmi_records(self, start_date=None, end_date=None):
+        """按日期先后逐条产出BMI记录，可限定日期区间（含两端）"""
+        return self._iter_rows('bmi_records', BMI_COLUMNS, start_date, end_date)
+
+    def iter_bmr_records(self, start_date=None, end_date=None):
+        """按日期先后逐条产出代谢率记录，可限定日期区间（含两端）"""
+        return self._iter_rows('bmr_records', BMR_COLUMNS, start_date, end_date)
+
+    def iter_intake(self, start_date=None, end_date=None):
+        """按日期先后逐条产出 (日期, 摄入记录)，可限定日期区间（含两端）"""
+        for row in self._iter_rows('calorie_intake', INTAKE_COLUMNS, start_date, end_date):
+            yield row['date'], {'food': row['food'], 'calories': row['calories']}
+
+    def bmi_records(self):
+        """按日期从近到远返回BMI记录"""
+        return self._select('bmi_records', BMI_COLUMNS, order="date DESC, id")
+
+    def bmr_records(self):
+        """按日期从近到远返回代谢率记录"""
+        return self._select('bmr_records', BMR_COLUMNS, order="date DESC, id")
+
+    def intake_on(self, date):
+        """返回某一天的能量摄入记录"""
+        return self._select('calorie_intake', ('food', 'calories'),
+                            where="date = ?", params=(date,))
+
+    @property
+    def intake_totals(self):
+        """每日摄入总量缓存（IntakeTotals），支持按天、周、月和任意区间查询"""
+        return self._intake_totals
+
+    @property
+    def food_index(self):
+        """吃过的食物的前缀索引（FoodIndex）；打开数据库后在后台建立，建好之前为 None"""
+        return self._food_index
+
+    def _build_food_index(self):
+        """后台建立食物索引：用独立连接读取全部摄入，不占用主连接"""
+        conn = sqlite3.connect(self.db_file)
+        try:
+            rows = conn.execute("SELECT id, date, food, calories FROM calorie_intake ORDER BY date, id").fetchall()
+        finally:
+            conn.close()
+
+        intake = {}
+        last_id = 0
+        for row_id, date, food, calories in rows:
+            intake.setdefault(date, []).append({'food': food, 'calories': calories})
+            last_id = max(last_id, row_id)
+        if self._closing.is_set():
+            return
+        index = FoodIndex(intake, self._lock)
+        with self._lock:
+            if self._conn is None:
+                return
+            self._food_index = index
+            self._food_last_id = last_id
+        # 读取之后新插入的摄入
+        self._update_food_index()
+
+    def _update_food_index(self):
+        """把上次之后插入的摄入（本实例或其他连接写入的）加入食物索引；记录只增不减，按行号即可"""
+        with self._lock:
+            # 索引未建好，或数据库已关闭
+            if self._food_index is None or self._conn is None:
+                return
+            rows = self._conn.execute(
+                "SELECT id, date, food, calories FROM calorie_intake WHERE id > ? ORDER BY id",
+                (self._food_last_id,)
+            ).fetchall()
+            for row_id, date, food, calories in rows:
+                self._food_index.add(date, food, calories)
+                self._food_last_id = row_id
+
+    def latest_tdee(self, target_date):
+        """获取目标日期当天或之前最近的TDEE值（走日期索引）"""
+        rows = self._select('bmr_records', ('tdee',), where="date <= ?",
+                            params=(target_date,), order="date DESC, id", limit=1)
+        return rows[0]['tdee'] if rows else None
+
+    def latest_tdee_many(self, target_dates):
+        """批量获取多个日期各自生效的TDEE值：一次范围查询后在内存中归并"""
+        if not target_dates:
+            return []
+        rows = self._select('bmr_records', ('date', 'tdee'), where="date <= ?",
+                            params=(max(target_dates),), order="date, id")
+        return BmrDateIndex(rows).latest_tdee_many(target_dates)
+
+    def save(self):
+        """提交未完成的事务"""
+        with self._lock:
+            self._conn.commit()
+
+    def flush(self):
+        """每次插入都已提交，无需等待"""
+        self.save()
+
+    def close(self):
+        """停止后台建立食物索引的线程，再关闭数据库连接"""
+        self._closing.set()
+        if self._food_builder is not None:
+            self._food_builder.join()
+            self._food_builder = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def sqlite_file_for(data_file):
+    """返回与 JSON 数据文件对应的 SQLite 数据库路径"""
+    return os.path.splitext(data_file)[0] + ".db"
+
+
+def open_store(data_file):
+    """打开数据存储：存在同名 .db 数据库时使用 SQLite，否则使用 JSON 日志存储"""
+    db_file = sqlite_file_for(data_file)
+    if os.path.exists(db_file):
+        return SQLiteStore(db_file)
+    return JournalStore(data_file)
+
+
+def migrate_json_to_sqlite(data_file, db_file=None):
+    """把 JSON 数据（含未合并的日志）一次性迁移到 SQLite 数据库"""
+    db_file = db_file or sqlite_file_for(data_file)
+    if os.path.exists(db_file):
+        raise FileExistsError(f"数据库已存在: {db_file}")
+
+    source = JournalStore(data_file)
+    try:
+        data = source.load()
+    finally:
+        source.close()
+
+    # 只做批量写入：不需要 load 建立的缓存和食物索引
+    store = SQLiteStore(db_file)
+    store._connect()
+    intake_rows = [
+        dict(item, date=date)
+        for date, items in data['calorie_intake'].items()
+        for item in items
+    ]
+    store._insert('bmi_records', BMI_COLUMNS, data['bmi_records'])
+    store._insert('bmr_records', BMR_COLUMNS, data['bmr_records'])
+    store._insert('calorie_intake', INTAKE_COLUMNS, intake_rows)
+    store.close()
+    return db_file
+
+
+def convert_snapshot(data_file, binary, output=None):
+    """在 JSON 与二进制快照格式之间转换（含未合并的日志）；不指定 output 时原地转换"""
+    store = JournalStore(data_file)
+    store.load()
+    try:
+        if output is None or os.path.abspath(output) == os.path.abspath(data_file):
+            store.binary = binary
+            store.save()
+            output = data_file
+        else:
+            write_snapshot(output, store.data, store._seq, binary)
+    finally:
+        store.close()
+    return output
+
+
+if __name__ == "__main__":
+    import sys
+
+    commands = ("migrate", "to-binary", "to-json")
+    if len(sys.argv) < 3 or sys.argv[1] not in commands:
+        print("用法: python health_storage.py migrate <health_data.json> [health_data.db]")
+        print("      python health_storage.py to-binary <health_data.json> [输出文件]")
+        print("      python health_storage.py to-json <health_data.json> [输出文件]")
+        sys.exit(1)
+
+    output = sys.argv[3] if len(sys.argv) > 3 else None
+    if sys.argv[1] == "migrate":
+        target = migrate_json_to_sqlite(sys.argv[2], output)
+        print(f"迁移完成: {target}")
+    else:
+        target = convert_snapshot(sys.argv[2], sys.argv[1] == "to-binary", output)
+        print(f"转换完成: {target}")
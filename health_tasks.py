@@ -0,0 +1,139 @@
+"""后台任务：耗时的计算和读写放到线程池中执行，结果再交回 Tk 线程处理
+
+Tk 的控件只能在主线程中访问，因此任务函数只做计算，不碰控件；
+完成、出错和进度回调都由 TaskRunner 通过 root.after 轮询，在 Tk 线程中调用。
+
+    task = runner.submit(work, arg, on_done=show, on_progress=update)
+
+work(task, arg) 在线程池中运行，可调用 task.progress(...) 报告进度，
+界面调用 task.cancel() 取消：此后任务的回调都不再调用，
+任务函数下一次报告进度（或调用 task.check()）时抛出 Cancelled 提前结束。
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class Cancelled(Exception):
+    """任务已被取消"""
+
+
+class Task:
+    """一个后台任务的句柄"""
+
+    def __init__(self, runner, on_done, on_error, on_progress):
+        self._runner = runner
+        self._on_done = on_done
+        self._on_error = on_error
+        self._on_progress = on_progress
+        self._cancelled = threading.Event()
+        self.future = None
+
+    @property
+    def cancelled(self):
+        """任务是否已被取消"""
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """取消任务；尚未开始的任务不再执行，已开始的任务在下一次检查时结束"""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check(self):
+        """任务已被取消时抛出 Cancelled（在任务函数中调用）"""
+        if self._cancelled.is_set():
+            raise Cancelled()
+
+    def progress(self, *args):
+        """报告进度（在任务函数中调用），on_progress(*args) 稍后在 Tk 线程中调用"""
+        self.check()
+        if self._on_progress is not None:
+            self._runner._post(self, self._on_progress, args)
+
+    def _run(self, func, args):
+        try:
+            self.check()
+            result = func(self, *args)
+        except Cancelled:
+            return
+        except Exception as e:
+            self._runner._post(self, self._on_error, (e,))
+            return
+        if self._on_done is not None:
+            self._runner._post(self, self._on_done, (result,))
+
+
+class TaskRunner:
+    """在线程池中执行任务，并在 Tk 线程中调用任务的回调
+
+    max_workers 为 1 时任务按提交顺序逐个执行，可用于需要保持先后顺序的写入。
+    on_error(异常) 为任务没有指定 on_error 时的出错处理。
+    """
+
+    # 有任务未完成时检查回调队列的间隔（毫秒）
+    POLL_INTERVAL = 30
+
+    def __init__(self, root, max_workers=2, on_error=None, name="health-task"):
+        self.root = root
+        self.on_error = on_error
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._callbacks = queue.Queue()
+        self._tasks = set()
+        self._poll_id = None
+        self._closed = False
+
+    def submit(self, func, *args, on_done=None, on_error=None, on_progress=None):
+        """提交任务 func(task, *args)，返回 Task（须在 Tk 线程中调用）"""
+        if self._closed:
+            raise RuntimeError("任务执行器已关闭")
+        task = Task(self, on_done, on_error or self.on_error, on_progress)
+        task.future = self._executor.submit(task._run, func, args)
+        self._tasks.add(task)
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.POLL_INTERVAL, self._poll)
+        return task
+
+    def cancel_all(self):
+        """取消全部未完成的任务"""
+        for task in self._tasks:
+            task.cancel()
+
+    def join(self):
+        """等待已提交的任务执行完（回调仍在之后的轮询中调用）"""
+        wait([task.future for task in self._tasks])
+
+    def shutdown(self, wait=False):
+        """关闭执行器：取消尚未开始的任务，wait 为 True 时等待正在执行的任务结束"""
+        self._closed = True
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        for task in self._tasks:
+            task.future.cancel()
+        self._executor.shutdown(wait=wait)
+
+    def _post(self, task, callback, args):
+        # 工作线程中调用：不能直接访问 Tk，放进队列等待轮询
+        if callback is not None:
+            self._callbacks.put((task, callback, args))
+
+    def _poll(self):
+        """在 Tk 线程中调用排队的回调，还有任务未完成时继续轮询"""
+        self._poll_id = None
+        # 先确定已结束的任务，保证它们排在队列中的回调都能在本轮取出
+        finished = {task for task in self._tasks if task.future.done()}
+        try:
+            while True:
+                try:
+                    task, callback, args = self._callbacks.get_nowait()
+                except queue.Empty:
+                    break
+                if not task.cancelled:
+                    callback(*args)
+        finally:
+            # 回调出错或在回调中提交了新任务时，轮询同样要继续且只保留一个
+            self._tasks -= finished
+            if (self._tasks or not self._callbacks.empty()) and not self._closed \
+                    and self._poll_id is None:
+                self._poll_id = self.root.after(self.POLL_INTERVAL, self._poll)
@@ -1,13 +1,33 @@
+import startup_profiler  # 需最先导入，用于记录启动各阶段耗时
+
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import datetime
-import json
 import os
-from tkcalendar import DateEntry  # 需要安装：pip install tkcalendar
+import sqlite3
+
+startup_profiler.mark("import_tkinter")
+
+# tkcalendar（需要安装：pip install tkcalendar）在第一次打开带日期选择的界面时才导入，
+# 这样主菜单无需等待它加载即可显示
+from health_core import (
+    ACTIVITY_DESCRIPTIONS, HealthTracker, InvalidInputError, calorie_balance, summarize_range
+)
+from health_charts import balance_series, record_series
+from health_index import date_ordinal
+from health_profiles import ProfileIndex
+from health_storage import COLLECTIONS, open_store
+from health_tasks import TaskRunner
+from health_widgets import Autocomplete, ProgressDialog, ScreenManager, TrendChart, VirtualListbox
 
 
 class HealthTrackerApp:
-    def __init__(self, root):
+    # 读入其他实例（另一个窗口、health_server）新写入记录的间隔（毫秒）
+    SYNC_INTERVAL = 2000
+    # 状态栏提示的显示时长（毫秒）
+    STATUS_DURATION = 4000
+
+    def __init__(self, root, lazy_load=True):
         self.root = root
         self.root.title("健康追踪应用")
         self.root.geometry("800x600")
@@ -17,46 +37,320 @@ class HealthTrackerApp:
         self.style = ttk.Style()
         self.style.configure(".", font=("SimHei", 10))
 
-        self.data_file = "health_data.json"
-        self.load_data()
+        # 多用户档案：启动时只读取很小的档案索引，并只加载当前用户的数据文件
+        self.profiles = ProfileIndex.load()
+        self.profile_var = tk.StringVar()
+
+        # 启动报告是否已输出（见 startup_profiler）
+        self._startup_reported = False
+
+        # 本地食物库，第一次在能量摄入界面查询时才打开
+        self._food_db = None
+        self._food_db_choice = None
+
+        # 加载进度轮询的定时器
+        self._poll_id = None
+
+        # 后台任务：查询、计算和导入导出在线程池中执行，结果交回界面线程显示；
+        # 保存记录单独用一个线程，按点击的先后顺序写入
+        self.tasks = TaskRunner(self.root, on_error=self._task_failed)
+        self.writes = TaskRunner(self.root, max_workers=1, on_error=self._task_failed,
+                                 name="health-write")
+        # 各界面正在执行的查询，重新查询时取消旧的：名称 -> Task
+        self._queries = {}
+        # 正在进行的导入或导出（同一时间只允许一个）
+        self._transfer = None
+
+        # 状态栏：保存成功等提示显示在这里，不弹出需要点击确认的对话框
+        self.status_var = tk.StringVar()
+        self._status_id = None
+        tk.Label(
+            self.root,
+            textvariable=self.status_var,
+            font=("SimHei", 10),
+            bg="#f0f0f0",
+            fg="#2E7D32",
+            anchor=tk.W
+        ).pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+
+        self._open_profile(lazy_load)
+        self.root.after(self.SYNC_INTERVAL, self._sync_store)
+
+        # 关闭窗口时同样要先把待写入的数据落盘
+        self.root.protocol("WM_DELETE_WINDOW", self.exit_app)
+
+        # 各界面只创建一次，切换时隐藏/显示
+        self.screens = ScreenManager(self.root)
+        self.screens.register("main", self._build_main_frame)
+        self.screens.register("bmi", self._build_bmi_frame, self._refresh_bmi_frame)
+        self.screens.register("calorie", self._build_calorie_frame, self.view_calorie_records)
+        self.screens.register("balance", self._build_calorie_balance_frame,
+                              self._refresh_calorie_balance_frame)
+        self.screens.register("bmr", self._build_bmr_frame, self._refresh_bmr_frame)
+        self.screens.register("history", self._build_history_frame, self.update_history_list)
+        self.screens.register("charts", self._build_charts_frame, self._refresh_charts_frame)
+
+        self.create_main_frame()
+        self.root.after_idle(self._on_first_paint)
+
+    def _on_first_paint(self):
+        """主界面第一次绘制完成"""
+        self.root.update_idletasks()
+        self._startup_stage("first_paint")
+
+    def _startup_stage(self, name):
+        """记录启动阶段；首屏绘制和数据加载都完成后输出启动报告，之后记录的阶段再补写进去"""
+        startup_profiler.mark(name)
+        if not startup_profiler.enabled():
+            return
+        if self._startup_reported:
+            # 启动之后才完成的阶段（第一次导入 tkcalendar）补写进报告
+            startup_profiler.write_report()
+        elif startup_profiler.has_marks("first_paint", "load_data"):
+            self._startup_reported = True
+            startup_profiler.write_report()
+            if startup_profiler.exit_after_startup():
+                self.root.after(0, self.exit_app)
+
+    def _show_profile(self):
+        """在窗口标题和主界面上显示当前用户（只有一个用户时标题不变）"""
+        name = self.profiles.get()['name']
+        if len(self.profiles.profiles) > 1:
+            self.root.title(f"健康追踪应用 - {name}")
+        else:
+            self.root.title("健康追踪应用")
+        self.profile_var.set(f"当前用户：{name}")
+
+    def _open_profile(self, lazy_load=True):
+        """打开当前用户的数据文件，并清空与上一个用户数据相关的界面缓存"""
+
+        # 计算与存储都在无界面的核心层（health_core）中，界面只负责输入和显示
+        self.data_file = self.profiles.data_file()
+        self.tracker = HealthTracker(open_store(self.data_file))
+        self.store = self.tracker.store
+
+        # 等待数据加载完成后需要刷新的界面：(所需集合, 刷新函数, 所属控件)
+        self._pending_refresh = None
+
+        # 历史记录排序结果缓存：记录类型 -> (集合版本号, 排好序的记录)
+        self._history_cache = {}
+
+        # 趋势图已反映的各集合版本号，趋势图界面创建前（或切换用户后）为 None
+        self._chart_versions = None
+        self._food_db_choice = None
+        self._recovery_reported = False
 
+        self._show_profile()
+
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        if lazy_load:
+            # 先显示主菜单，数据在后台线程中按集合逐个加载
+            self.store.load_in_background()
+            self._poll_id = self.root.after(50, self._poll_loading)
+        else:
+            self.load_data()
+            self._startup_stage("load_data")
+            self._report_recovery()
+
+    def switch_profile(self, profile_id):
+        """切换到另一个用户：先把当前用户的数据落盘，再加载目标用户的数据文件"""
+        if profile_id == self.profiles.active:
+            return
+        if self._transfer_running():
+            messagebox.showinfo("请稍候", "导入或导出尚未完成，请等待完成或取消后再切换用户")
+            return
+        # 已点击保存的记录先写入当前用户，其余查询的结果不再显示
+        self.writes.join()
+        self.writes.cancel_all()
+        self._cancel_queries()
+        try:
+            self.tracker.close()
+        except OSError as e:
+            messagebox.showerror("保存失败", f"当前用户的数据保存失败：{e}")
+            return
+        self.profiles.set_active(profile_id)
+        self._open_profile()
         self.create_main_frame()
 
     def load_data(self):
-        """加载已保存的数据"""
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
+        """加载已保存的数据（JSON 快照 + 追加日志，或 SQLite 数据库）"""
+        self.store.load()
+
+    def _poll_loading(self):
+        """轮询后台加载进度，所需数据就绪后刷新正在等待的界面"""
+        self._poll_id = None
+        if self.store.load_error is not None:
+            messagebox.showerror("加载失败", f"数据文件读取失败：{self.store.load_error}")
+            return
+
+        if self._pending_refresh is not None:
+            collections, refresh, widget = self._pending_refresh
+            if not widget.winfo_exists():
+                self._pending_refresh = None
+            elif self.store.is_ready(*collections):
+                self._pending_refresh = None
+                refresh()
+
+        if self.store.is_ready(*COLLECTIONS):
+            self._startup_stage("load_data")
+            self._report_recovery()
+
+        if self._pending_refresh is not None or not self.store.is_ready(*COLLECTIONS):
+            self._poll_id = self.root.after(50, self._poll_loading)
+
+    def _report_recovery(self):
+        """加载时修复过数据文件（上次异常退出等）则提示一次"""
+        if self._recovery_reported or not self.store.recovery_notes:
+            return
+        self._recovery_reported = True
+        messagebox.showwarning("数据已恢复", "\n".join(self.store.recovery_notes))
+
+    def _sync_store(self):
+        """定期读入其他实例写入的新记录（在后台完成，界面缓存按版本号自动失效）"""
+        self.store.sync(wait=False)
+        self.root.after(self.SYNC_INTERVAL, self._sync_store)
+
+    def _data_ready(self, collections, refresh, widget):
+        """数据已加载返回 True；否则记下刷新函数，待加载完成后自动重新调用"""
+        if self.store.is_ready(*collections):
+            return True
+        self._pending_refresh = (collections, refresh, widget)
+        return False
+
+    # 后台任务
+    def _task_failed(self, error):
+        """后台任务出错时提示（任务没有自己的出错处理时）"""
+        if isinstance(error, InvalidInputError):
+            messagebox.showerror("输入错误", str(error))
         else:
-            self.data = {
-                'bmi_records': [],
-                'calorie_intake': {},
-                'bmr_records': []
-            }
+            messagebox.showerror("操作失败", str(error))
+
+    def _show_status(self, text):
+        """在状态栏显示提示，过一会儿自动清除"""
+        if self._status_id is not None:
+            self.root.after_cancel(self._status_id)
+        self.status_var.set(text)
+        self._status_id = self.root.after(self.STATUS_DURATION, self._clear_status)
+
+    def _clear_status(self):
+        self._status_id = None
+        self.status_var.set("")
+
+    def _save_record(self, work, on_done, number_error):
+        """在写入线程中校验、计算并保存记录，完成后在界面线程中调用 on_done(结果)"""
+        def failed(error):
+            if isinstance(error, InvalidInputError):
+                messagebox.showerror("输入错误", str(error))
+            elif isinstance(error, ValueError):
+                messagebox.showerror("输入错误", number_error)
+            else:
+                self._task_failed(error)
+
+        self.writes.submit(lambda task: work(), on_done=on_done, on_error=failed)
+
+    def _query(self, name, work, on_done):
+        """在后台执行界面的查询 work()，同名的旧查询尚未完成时取消它"""
+        self._cancel_query(name)
+        self._queries[name] = self.tasks.submit(lambda task: work(), on_done=on_done)
+
+    def _cancel_query(self, name):
+        task = self._queries.pop(name, None)
+        if task is not None:
+            task.cancel()
+
+    def _cancel_queries(self):
+        """取消全部查询（离开界面或切换用户后，结果已不需要显示）"""
+        for name in list(self._queries):
+            self._cancel_query(name)
+
+    def _transfer_running(self):
+        return self._transfer is not None and not self._transfer.future.done()
 
     def save_data(self):
-        """保存数据到文件"""
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=4)
+        """把全部数据落盘保存"""
+        self.store.save()
+
+    def exit_app(self):
+        """把待写入的数据落盘后退出"""
+        if self._food_db is not None:
+            self._food_db.close()
+        # 已点击保存的记录先写入，再一起落盘
+        self.writes.join()
+        try:
+            self.tracker.close()
+        except OSError as e:
+            if not messagebox.askyesno("保存失败", f"数据保存失败：{e}\n仍要退出吗？（未保存的记录将丢失）"):
+                return
+        # 取消进行中的查询和导入导出，不等待它们结束
+        self.tasks.shutdown()
+        self.writes.shutdown()
+        self.root.destroy()
 
+    # 界面切换
     def create_main_frame(self):
-        """创建主界面"""
-        # 清除现有界面
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        """显示主界面"""
+        self._cancel_queries()
+        self.screens.show("main")
+
+    def open_bmi_frame(self):
+        """打开BMI计算界面"""
+        self.screens.show("bmi")
+
+    def open_calorie_frame(self):
+        """打开能量摄入记录界面"""
+        self.screens.show("calorie")
+
+    def open_calorie_balance_frame(self):
+        """打开热量摄入与消耗分析界面"""
+        self.screens.show("balance")
+
+    def open_bmr_frame(self):
+        """打开基础代谢率计算界面"""
+        self.screens.show("bmr")
+
+    def open_history_frame(self):
+        """打开历史记录界面"""
+        self.screens.show("history")
 
+    def open_charts_frame(self):
+        """打开趋势图界面"""
+        self.screens.show("charts")
+
+    def _build_main_frame(self, frame):
+        """创建主界面"""
         # 标题
         title_label = tk.Label(
-            self.root,
+            frame,
             text="健康追踪应用",
             font=("SimHei", 24, "bold"),
             bg="#f0f0f0",
             fg="#333333"
         )
-        title_label.pack(pady=30)
+        title_label.pack(pady=(30, 10))
+
+        # 当前用户与切换
+        profile_frame = tk.Frame(frame, bg="#f0f0f0")
+        profile_frame.pack()
+
+        tk.Label(
+            profile_frame,
+            textvariable=self.profile_var,
+            font=("SimHei", 12),
+            bg="#f0f0f0"
+        ).pack(side=tk.LEFT, padx=10)
+
+        tk.Button(
+            profile_frame,
+            text="切换用户",
+            command=self.open_profile_dialog,
+            font=("SimHei", 10),
+            width=10
+        ).pack(side=tk.LEFT, padx=10)
 
         # 功能按钮框架
-        button_frame = tk.Frame(self.root, bg="#f0f0f0")
+        button_frame = tk.Frame(frame, bg="#f0f0f0")
         button_frame.pack(expand=True)
 
         # 按钮样式
@@ -114,13 +408,22 @@ class HealthTrackerApp:
             command=self.open_history_frame,
             **button_style
         )
-        history_btn.grid(row=2, column=0, padx=20, pady=15, columnspan=2)
+        history_btn.grid(row=2, column=0, padx=20, pady=15)
+
+        # 趋势图按钮
+        charts_btn = tk.Button(
+            button_frame,
+            text="趋势图",
+            command=self.open_charts_frame,
+            **button_style
+        )
+        charts_btn.grid(row=2, column=1, padx=20, pady=15)
 
         # 退出按钮
         exit_btn = tk.Button(
-            self.root,
+            frame,
             text="退出",
-            command=self.root.quit,
+            command=self.exit_app,
             font=("SimHei", 10),
             width=10,
             bg="#f44336",
@@ -128,15 +431,81 @@ class HealthTrackerApp:
         )
         exit_btn.pack(side=tk.BOTTOM, pady=20)
 
-    # BMI相关功能
-    def open_bmi_frame(self):
-        """打开BMI计算界面"""
-        for widget in self.root.winfo_children():
-            widget.destroy()
+    def open_profile_dialog(self):
+        """用户管理对话框：切换、新建和重命名用户"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("切换用户")
+        dialog.configure(bg="#f0f0f0")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+
+        listbox = tk.Listbox(dialog, width=30, height=8, font=("SimHei", 12),
+                             exportselection=False)
+        listbox.pack(padx=20, pady=(20, 10))
+
+        def fill():
+            listbox.delete(0, tk.END)
+            for i, profile in enumerate(self.profiles.profiles):
+                mark = "（当前）" if profile['id'] == self.profiles.active else ""
+                listbox.insert(tk.END, profile['name'] + mark)
+                if profile['id'] == self.profiles.active:
+                    listbox.selection_set(i)
+
+        def selected():
+            selection = listbox.curselection()
+            return self.profiles.profiles[selection[0]] if selection else None
+
+        def switch():
+            profile = selected()
+            if profile is not None:
+                dialog.destroy()
+                self.switch_profile(profile['id'])
+
+        def add():
+            name = simpledialog.askstring("新建用户", "用户名称：", parent=dialog)
+            if name is None:
+                return
+            try:
+                self.profiles.add(name)
+            except (ValueError, OSError) as e:
+                messagebox.showerror("新建失败", str(e), parent=dialog)
+                return
+            self._show_profile()
+            fill()
+
+        def rename():
+            profile = selected()
+            if profile is None:
+                return
+            name = simpledialog.askstring("重命名用户", "新的名称：", parent=dialog,
+                                          initialvalue=profile['name'])
+            if name is None:
+                return
+            try:
+                self.profiles.rename(profile['id'], name)
+            except (ValueError, OSError) as e:
+                messagebox.showerror("重命名失败", str(e), parent=dialog)
+                return
+            self._show_profile()
+            fill()
+
+        btn_frame = tk.Frame(dialog, bg="#f0f0f0")
+        btn_frame.pack(pady=(0, 20))
+        for text, command in (("切换", switch), ("新建", add), ("重命名", rename),
+                              ("关闭", dialog.destroy)):
+            tk.Button(btn_frame, text=text, command=command, font=("SimHei", 10),
+                      width=8).pack(side=tk.LEFT, padx=5)
+        listbox.bind("<Double-Button-1>", lambda e: switch())
+
+        fill()
+        dialog.grab_set()
 
+    # BMI相关功能
+    def _build_bmi_frame(self, frame):
+        """创建BMI计算界面"""
         # 标题
         title_label = tk.Label(
-            self.root,
+            frame,
             text="BMI计算与记录",
             font=("SimHei", 18, "bold"),
             bg="#f0f0f0",
@@ -145,7 +514,7 @@ class HealthTrackerApp:
         title_label.pack(pady=20)
 
         # 输入框架
-        input_frame = tk.Frame(self.root, bg="#f0f0f0")
+        input_frame = tk.Frame(frame, bg="#f0f0f0")
         input_frame.pack(pady=20)
 
         # 体重输入
@@ -181,7 +550,7 @@ class HealthTrackerApp:
         # 结果显示
         self.bmi_result_var = tk.StringVar()
         result_label = tk.Label(
-            self.root,
+            frame,
             textvariable=self.bmi_result_var,
             font=("SimHei", 14),
             bg="#f0f0f0",
@@ -190,7 +559,7 @@ class HealthTrackerApp:
         result_label.pack(pady=20)
 
         # 按钮框架
-        btn_frame = tk.Frame(self.root, bg="#f0f0f0")
+        btn_frame = tk.Frame(frame, bg="#f0f0f0")
         btn_frame.pack(pady=20)
 
         # 计算按钮
@@ -217,59 +586,36 @@ class HealthTrackerApp:
         )
         back_btn.grid(row=0, column=1, padx=10)
 
-    def calculate_and_record_bmi(self):
-        """计算并记录BMI"""
-        try:
-            weight = float(self.weight_entry.get())
-            height = float(self.height_entry.get())
+    def _refresh_bmi_frame(self):
+        """重新显示BMI界面时清空上次的结果"""
+        self.bmi_result_var.set("")
 
-            if weight <= 0 or height <= 0:
-                messagebox.showerror("输入错误", "体重和身高必须为正数")
-                return
+    def calculate_and_record_bmi(self):
+        """计算并记录BMI（在写入线程中完成，界面不等待）"""
+        weight = self.weight_entry.get()
+        height = self.height_entry.get()
 
-            # 计算BMI
-            height_m = height / 100
-            bmi = weight / (height_m ** 2)
-            bmi = round(bmi, 1)
-
-            # 确定BMI类别
-            if bmi < 18.5:
-                category = "偏瘦"
-            elif 18.5 <= bmi < 24:
-                category = "正常"
-            elif 24 <= bmi < 28:
-                category = "超重"
-            else:
-                category = "肥胖"
+        def work():
+            # 计算BMI（先校验，避免显示无效结果）并记录
+            return self.tracker.record_bmi(float(weight), float(height))
 
+        def done(record):
             # 显示结果
-            self.bmi_result_var.set(f"BMI值: {bmi} ({category})")
-
-            # 记录数据
-            record = {
-                'date': datetime.date.today().isoformat(),
-                'weight': weight,
-                'height': height,
-                'bmi': bmi,
-                'category': category
-            }
+            self.bmi_result_var.set(f"BMI值: {record['bmi']} ({record['category']})")
+            self._update_charts('bmi_records', record=record)
+            self._show_status("BMI记录已保存")
 
-            self.data['bmi_records'].append(record)
-            self.save_data()
-            messagebox.showinfo("成功", "BMI记录已保存")
-
-        except ValueError:
-            messagebox.showerror("输入错误", "请输入有效的数字")
+        self._save_record(work, done, "请输入有效的数字")
 
     # 能量摄入相关功能
-    def open_calorie_frame(self):
-        """打开能量摄入记录界面"""
-        for widget in self.root.winfo_children():
-            widget.destroy()
+    def _build_calorie_frame(self, frame):
+        """创建能量摄入记录界面"""
+        from tkcalendar import DateEntry
+        self._startup_stage("import_tkcalendar")
 
         # 标题
         title_label = tk.Label(
-            self.root,
+            frame,
             text="食物能量摄入记录",
             font=("SimHei", 18, "bold"),
             bg="#f0f0f0",
@@ -278,7 +624,7 @@ class HealthTrackerApp:
         title_label.pack(pady=20)
 
         # 日期选择
-        date_frame = tk.Frame(self.root, bg="#f0f0f0")
+        date_frame = tk.Frame(frame, bg="#f0f0f0")
         date_frame.pack(pady=10)
 
         tk.Label(
@@ -299,7 +645,7 @@ class HealthTrackerApp:
         self.calorie_date.pack(side=tk.LEFT, padx=10)
 
         # 输入框架
-        input_frame = tk.Frame(self.root, bg="#f0f0f0")
+        input_frame = tk.Frame(frame, bg="#f0f0f0")
         input_frame.pack(pady=10)
 
         # 食物名称输入
@@ -332,8 +678,51 @@ class HealthTrackerApp:
         )
         self.calorie_entry.grid(row=1, column=1, padx=10, pady=10)
 
+        # 食物名称自动补全：按吃的次数和最近程度排序，选中后填入上次的能量
+        self.food_autocomplete = Autocomplete(
+            self.food_entry, frame, self._suggest_foods, self._choose_food
+        )
+
+        # 查询食物库：选中后按份量换算能量
+        tk.Label(
+            input_frame,
+            text="查询食物库:",
+            font=("SimHei", 12),
+            bg="#f0f0f0"
+        ).grid(row=2, column=0, padx=10, pady=10, sticky="e")
+
+        food_db_frame = tk.Frame(input_frame, bg="#f0f0f0")
+        food_db_frame.grid(row=2, column=1, padx=10, pady=10, sticky="w")
+
+        self.food_db_entry = tk.Entry(
+            food_db_frame,
+            font=("SimHei", 12),
+            width=12
+        )
+        self.food_db_entry.pack(side=tk.LEFT)
+
+        tk.Label(
+            food_db_frame,
+            text="份量(克):",
+            font=("SimHei", 12),
+            bg="#f0f0f0"
+        ).pack(side=tk.LEFT, padx=(10, 5))
+
+        self.portion_var = tk.StringVar(value="100")
+        tk.Entry(
+            food_db_frame,
+            textvariable=self.portion_var,
+            font=("SimHei", 12),
+            width=6
+        ).pack(side=tk.LEFT)
+        self.portion_var.trace_add("write", lambda *args: self._apply_portion())
+
+        self.food_db_autocomplete = Autocomplete(
+            self.food_db_entry, frame, self._search_food_db, self._choose_food_db
+        )
+
         # 按钮框架
-        btn_frame1 = tk.Frame(self.root, bg="#f0f0f0")
+        btn_frame1 = tk.Frame(frame, bg="#f0f0f0")
         btn_frame1.pack(pady=10)
 
         # 添加按钮
@@ -362,16 +751,16 @@ class HealthTrackerApp:
 
         # 记录列表
         tk.Label(
-            self.root,
+            frame,
             text="当日记录:",
             font=("SimHei", 12, "bold"),
             bg="#f0f0f0"
         ).pack(pady=5, anchor="w", padx=50)
 
         self.calorie_listbox = tk.Listbox(
-            self.root,
+            frame,
             width=70,
-            height=8,
+            height=6,
             font=("SimHei", 10)
         )
         self.calorie_listbox.pack(pady=10)
@@ -379,7 +768,7 @@ class HealthTrackerApp:
         # 热量平衡显示 - 新增
         self.calorie_balance_var = tk.StringVar()
         balance_label = tk.Label(
-            self.root,
+            frame,
             textvariable=self.calorie_balance_var,
             font=("SimHei", 12, "bold"),
             bg="#f0f0f0",
@@ -390,7 +779,7 @@ class HealthTrackerApp:
         # 总计显示
         self.calorie_total_var = tk.StringVar()
         total_label = tk.Label(
-            self.root,
+            frame,
             textvariable=self.calorie_total_var,
             font=("SimHei", 12, "bold"),
             bg="#f0f0f0",
@@ -400,7 +789,7 @@ class HealthTrackerApp:
 
         # 返回按钮
         back_btn = tk.Button(
-            self.root,
+            frame,
             text="返回主菜单",
             command=self.create_main_frame,
             font=("SimHei", 12),
@@ -410,44 +799,105 @@ class HealthTrackerApp:
         )
         back_btn.pack(side=tk.BOTTOM, pady=20)
 
-        # 初始加载记录
-        self.view_calorie_records()
-
     def add_calorie_record(self):
-        """添加食物能量记录"""
-        try:
-            food = self.food_entry.get().strip()
-            calories = int(self.calorie_entry.get())
-            date = self.calorie_date.get()
+        """添加食物能量记录（在写入线程中完成，界面不等待）"""
+        food = self.food_entry.get()
+        calories = self.calorie_entry.get()
+        date = self.calorie_date.get()
 
-            if not food:
-                messagebox.showerror("输入错误", "请输入食物名称")
-                return
+        def work():
+            return self.tracker.add_intake(date, food, int(calories))
 
-            if calories <= 0:
-                messagebox.showerror("输入错误", "卡路里必须为正数")
-                return
+        def done(item):
+            self._update_charts('calorie_intake', date=date)
+            self._show_status(f"已添加：{item['food']} ({item['calories']} 卡路里)")
 
-            if date not in self.data['calorie_intake']:
-                self.data['calorie_intake'][date] = []
+            # 清空输入框（保存期间又输入了新内容时保留）
+            if self.food_entry.get() == food and self.calorie_entry.get() == calories:
+                self.food_entry.delete(0, tk.END)
+                self.calorie_entry.delete(0, tk.END)
 
-            self.data['calorie_intake'][date].append({
-                'food': food,
-                'calories': calories
-            })
+            # 刷新列表和热量平衡
+            self.view_calorie_records()
 
-            self.save_data()
-            messagebox.showinfo("成功", f"已添加：{food} ({calories} 卡路里)")
+        self._save_record(work, done, "请输入有效的卡路里数值")
+
+    def _suggest_foods(self, text):
+        """自动补全候选：以输入内容开头的食物"""
+        text = text.strip()
+        # 食物索引在后台建立，建好之前不提示
+        index = self.store.food_index
+        if not text or index is None:
+            return []
+        return [
+            (f"{food}（上次 {calories} 卡路里）", food)
+            for food, calories in index.suggest(text)
+        ]
 
-            # 清空输入框
-            self.food_entry.delete(0, tk.END)
+    def _choose_food(self, food):
+        """选中候选食物：填入名称和上次记录的能量"""
+        self.food_entry.delete(0, tk.END)
+        self.food_entry.insert(0, food)
+        index = self.store.food_index
+        calories = None if index is None else index.last_calories(food)
+        if calories is not None:
             self.calorie_entry.delete(0, tk.END)
+            self.calorie_entry.insert(0, str(calories))
+        self.calorie_entry.focus_set()
+        self.calorie_entry.select_range(0, tk.END)
 
-            # 刷新列表和热量平衡
-            self.view_calorie_records()
-
+    def _portion_grams(self):
+        """当前填写的份量（克），无效时返回 None"""
+        try:
+            grams = float(self.portion_var.get())
         except ValueError:
-            messagebox.showerror("输入错误", "请输入有效的卡路里数值")
+            return None
+        return grams if grams > 0 else None
+
+    def _search_food_db(self, text):
+        """食物库查询候选：显示每100克能量和按份量换算后的能量"""
+        from health_fooddb import FoodDatabase, scale_calories
+
+        if not text.strip():
+            return []
+        if self._food_db is None:
+            self._food_db = FoodDatabase()
+        try:
+            foods = self._food_db.search(text)
+        except (OSError, sqlite3.Error) as e:
+            self.food_db_autocomplete.hide()
+            messagebox.showerror("食物库错误", f"无法打开食物库：{e}")
+            return []
+
+        grams = self._portion_grams()
+        candidates = []
+        for food in foods:
+            label = f"{food['name']}（{food['kcal_per_100g']:g} 千卡/100克）"
+            if grams is not None:
+                label += f" → {scale_calories(food['kcal_per_100g'], grams)} 卡路里"
+            candidates.append((label, food))
+        return candidates
+
+    def _choose_food_db(self, food):
+        """选中食物库中的食物：填入名称和按份量换算的能量"""
+        self._food_db_choice = food
+        self.food_db_entry.delete(0, tk.END)
+        self.food_db_entry.insert(0, food['name'])
+        self.food_entry.delete(0, tk.END)
+        self.food_entry.insert(0, food['name'])
+        self.food_autocomplete.hide()
+        self._apply_portion()
+
+    def _apply_portion(self):
+        """份量变化时重新换算所选食物的能量"""
+        from health_fooddb import scale_calories
+
+        food = self._food_db_choice
+        grams = self._portion_grams()
+        if food is None or grams is None or self.food_entry.get() != food['name']:
+            return
+        self.calorie_entry.delete(0, tk.END)
+        self.calorie_entry.insert(0, str(scale_calories(food['kcal_per_100g'], grams)))
 
     def view_calorie_records(self):
         """查看当日能量摄入记录，并计算热量平衡"""
@@ -456,32 +906,44 @@ class HealthTrackerApp:
         # 清空列表
         self.calorie_listbox.delete(0, tk.END)
 
-        if date not in self.data['calorie_intake'] or not self.data['calorie_intake'][date]:
+        if not self._data_ready(('calorie_intake', 'bmr_records'),
+                                self.view_calorie_records, self.calorie_listbox):
+            self.calorie_listbox.insert(tk.END, "数据加载中，请稍候…")
+            self.calorie_total_var.set("")
+            self.calorie_balance_var.set("")
+            return
+
+        records = self.store.intake_on(date)
+
+        if not records:
             self.calorie_listbox.insert(tk.END, "当日暂无记录")
             self.calorie_total_var.set("总计：0 卡路里")
             self.calorie_balance_var.set("热量平衡：暂无数据（请先计算代谢率）")
             return
 
-        records = self.data['calorie_intake'][date]
-        total_intake = sum(item['calories'] for item in records)
+        totals = self.store.intake_totals
+        total_intake = totals.total_on(date)
 
         for item in records:
             self.calorie_listbox.insert(tk.END, f"{item['food']}: {item['calories']} 卡路里")
 
-        self.calorie_total_var.set(f"总计摄入：{total_intake} 卡路里")
+        self.calorie_total_var.set(
+            f"总计摄入：{total_intake} 卡路里"
+            f"（本周 {totals.week_total(date)}，本月 {totals.month_total(date)}）"
+        )
 
         # 计算热量平衡
         self.calculate_calorie_balance(date, total_intake)
 
     # 新增：热量平衡分析功能
-    def open_calorie_balance_frame(self):
-        """打开热量摄入与消耗分析界面"""
-        for widget in self.root.winfo_children():
-            widget.destroy()
+    def _build_calorie_balance_frame(self, frame):
+        """创建热量摄入与消耗分析界面"""
+        from tkcalendar import DateEntry
+        self._startup_stage("import_tkcalendar")
 
         # 标题
         title_label = tk.Label(
-            self.root,
+            frame,
             text="热量摄入与消耗分析",
             font=("SimHei", 18, "bold"),
             bg="#f0f0f0",
@@ -490,7 +952,7 @@ class HealthTrackerApp:
         title_label.pack(pady=20)
 
         # 日期选择
-        date_frame = tk.Frame(self.root, bg="#f0f0f0")
+        date_frame = tk.Frame(frame, bg="#f0f0f0")
         date_frame.pack(pady=20)
 
         tk.Label(
@@ -522,8 +984,8 @@ class HealthTrackerApp:
         analyze_btn.pack(side=tk.LEFT, padx=10)
 
         # 结果显示框架
-        result_frame = tk.Frame(self.root, bg="#f0f0f0")
-        result_frame.pack(pady=30, fill=tk.X, padx=50)
+        result_frame = tk.Frame(frame, bg="#f0f0f0")
+        result_frame.pack(pady=15, fill=tk.X, padx=50)
 
         # 摄入热量
         tk.Label(
@@ -579,7 +1041,7 @@ class HealthTrackerApp:
         # 说明文字
         self.balance_note_var = tk.StringVar(value="请选择日期并点击分析按钮")
         note_label = tk.Label(
-            self.root,
+            frame,
             textvariable=self.balance_note_var,
             font=("SimHei", 11),
             bg="#f0f0f0",
@@ -587,11 +1049,77 @@ class HealthTrackerApp:
             wraplength=600,
             justify=tk.LEFT
         )
-        note_label.pack(pady=20, padx=50, anchor="w")
+        note_label.pack(pady=10, padx=50, anchor="w")
+
+        # 区间分析：任意起止日期的逐日热量平衡与累计缺口
+        range_frame = tk.Frame(frame, bg="#f0f0f0")
+        range_frame.pack(pady=5)
+
+        tk.Label(
+            range_frame,
+            text="区间:",
+            font=("SimHei", 12),
+            bg="#f0f0f0"
+        ).pack(side=tk.LEFT, padx=5)
+
+        self.range_start_date = DateEntry(
+            range_frame,
+            width=12,
+            background='darkblue',
+            foreground='white',
+            borderwidth=2,
+            date_pattern='yyyy-mm-dd'
+        )
+        self.range_start_date.set_date(datetime.date.today() - datetime.timedelta(days=6))
+        self.range_start_date.pack(side=tk.LEFT, padx=5)
+
+        tk.Label(
+            range_frame,
+            text="至",
+            font=("SimHei", 12),
+            bg="#f0f0f0"
+        ).pack(side=tk.LEFT, padx=5)
+
+        self.range_end_date = DateEntry(
+            range_frame,
+            width=12,
+            background='darkblue',
+            foreground='white',
+            borderwidth=2,
+            date_pattern='yyyy-mm-dd'
+        )
+        self.range_end_date.pack(side=tk.LEFT, padx=5)
+
+        range_btn = tk.Button(
+            range_frame,
+            text="分析区间",
+            command=self.analyze_calorie_range,
+            font=("SimHei", 12),
+            bg="#2196F3",
+            fg="white"
+        )
+        range_btn.pack(side=tk.LEFT, padx=10)
+
+        self.range_summary_var = tk.StringVar()
+        tk.Label(
+            frame,
+            textvariable=self.range_summary_var,
+            font=("SimHei", 11, "bold"),
+            bg="#f0f0f0",
+            fg="#FF5722"
+        ).pack(pady=2)
+
+        self.range_listbox = VirtualListbox(
+            frame,
+            width=80,
+            height=6,
+            font=("SimHei", 10)
+        )
+        self.range_listbox.pack(pady=5)
 
         # 返回按钮
         back_btn = tk.Button(
-            self.root,
+            frame,
             text="返回主菜单",
             command=self.create_main_frame,
             font=("SimHei", 12),
@@ -601,6 +1129,15 @@ class HealthTrackerApp:
         )
         back_btn.pack(side=tk.BOTTOM, pady=20)
 
+    def _refresh_calorie_balance_frame(self):
+        """重新显示分析界面时恢复初始提示"""
+        self.intake_result_var.set("-- 卡路里")
+        self.expenditure_result_var.set("-- 卡路里")
+        self.balance_result_var.set("-- 卡路里")
+        self.balance_note_var.set("请选择日期并点击分析按钮")
+        self.range_summary_var.set("")
+        self.range_listbox.set_lines([])
+
     def calculate_calorie_balance(self, date, total_intake):
         """计算并显示热量平衡"""
         # 获取当天的TDEE（使用最近的代谢率记录）
@@ -611,7 +1148,7 @@ class HealthTrackerApp:
             return
 
         # 计算热量缺口（消耗 - 摄入）
-        balance = tdee - total_intake
+        balance = calorie_balance(tdee, total_intake)
 
         # 显示热量平衡
         if balance > 0:
@@ -625,16 +1162,26 @@ class HealthTrackerApp:
         """分析指定日期的热量平衡"""
         date = self.balance_date.get()
 
-        # 获取当日摄入热量
-        if date in self.data['calorie_intake'] and self.data['calorie_intake'][date]:
-            total_intake = sum(item['calories'] for item in self.data['calorie_intake'][date])
+        if not self._data_ready(('calorie_intake', 'bmr_records'),
+                                self.analyze_calorie_balance, self.balance_date):
+            self.intake_result_var.set("加载中…")
+            self.expenditure_result_var.set("加载中…")
+            self.balance_result_var.set("加载中…")
+            self.balance_note_var.set("数据加载中，请稍候…")
+            return
+
+        # 当日摄入热量、TDEE（使用最近的代谢率记录）和热量缺口
+        self._query("balance", lambda: self.tracker.balance_on(date), self._show_balance)
+
+    def _show_balance(self, result):
+        """显示某一天的热量平衡分析结果"""
+        total_intake = result['intake']
+        if total_intake:
             self.intake_result_var.set(f"{total_intake} 卡路里")
         else:
-            total_intake = 0
             self.intake_result_var.set("0 卡路里（无记录）")
 
-        # 获取当日的TDEE（使用最近的代谢率记录）
-        tdee = self.get_latest_tdee(date)
+        tdee = result['tdee']
 
         if tdee is None:
             self.expenditure_result_var.set("无代谢率数据")
@@ -644,8 +1191,7 @@ class HealthTrackerApp:
 
         self.expenditure_result_var.set(f"{tdee} 卡路里")
 
-        # 计算热量缺口
-        balance = tdee - total_intake
+        balance = result['balance']
 
         # 显示热量缺口
         if balance > 0:
@@ -666,33 +1212,59 @@ class HealthTrackerApp:
                 "热量摄入与消耗达到平衡，这有助于维持当前体重。"
             )
 
-    def get_latest_tdee(self, target_date):
-        """获取目标日期当天或最近的TDEE值"""
-        if not self.data['bmr_records']:
-            return None
+    def analyze_calorie_range(self):
+        """分析日期区间内每天的热量平衡及累计缺口"""
+        start_date = self.range_start_date.get()
+        end_date = self.range_end_date.get()
 
-        # 筛选出不晚于目标日期的记录
-        valid_records = [
-            record for record in self.data['bmr_records']
-            if record['date'] <= target_date
-        ]
+        if start_date > end_date:
+            messagebox.showerror("输入错误", "开始日期不能晚于结束日期")
+            return
 
-        if not valid_records:
-            return None
+        if not self._data_ready(('calorie_intake', 'bmr_records'),
+                                self.analyze_calorie_range, self.range_listbox):
+            self.range_summary_var.set("数据加载中，请稍候…")
+            return
 
-        # 按日期排序，取最近的一条
-        latest_record = sorted(valid_records, key=lambda x: x['date'], reverse=True)[0]
-        return latest_record['tdee']
+        def work():
+            rows = self.tracker.analyze_range(start_date, end_date)
+            return rows, summarize_range(rows)
+
+        self.range_summary_var.set("正在分析，请稍候…")
+        self.range_listbox.set_lines([])
+        self._query("range", work, self._show_range)
+
+    def _show_range(self, result):
+        """显示日期区间的逐日分析和汇总"""
+        rows, summary = result
+        balance = summary['balance']
+        sign = "+" if balance > 0 else ""
+        self.range_summary_var.set(
+            f"{summary['days']} 天共摄入 {summary['total_intake']} 卡路里，"
+            f"消耗 {summary['total_tdee']} 卡路里，累计缺口 {sign}{balance} 卡路里"
+            + ("" if summary['days_with_tdee'] == summary['days']
+               else f"（{summary['days'] - summary['days_with_tdee']} 天无代谢率数据）")
+        )
 
-    # 基础代谢率相关功能
-    def open_bmr_frame(self):
-        """打开基础代谢率计算界面"""
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        def row_text(i):
+            row = rows[i]
+            if row['tdee'] is None:
+                return f"{row['date']} - 摄入: {row['intake']} 卡路里, 无代谢率数据"
+            return (f"{row['date']} - 摄入: {row['intake']}, TDEE: {row['tdee']}, "
+                    f"缺口: {row['balance']:+d}, 累计: {row['cumulative']:+d} 卡路里")
+
+        self.range_listbox.set_rows(len(rows), row_text)
 
+    def get_latest_tdee(self, target_date):
+        """获取目标日期当天或最近的TDEE值"""
+        return self.store.latest_tdee(target_date)
+
+    # 基础代谢率相关功能
+    def _build_bmr_frame(self, frame):
+        """创建基础代谢率计算界面"""
         # 标题
         title_label = tk.Label(
-            self.root,
+            frame,
             text="基础代谢率计算",
             font=("SimHei", 18, "bold"),
             bg="#f0f0f0",
@@ -701,7 +1273,7 @@ class HealthTrackerApp:
         title_label.pack(pady=20)
 
         # 输入框架
-        input_frame = tk.Frame(self.root, bg="#f0f0f0")
+        input_frame = tk.Frame(frame, bg="#f0f0f0")
         input_frame.pack(pady=10)
 
         # 体重输入
@@ -791,20 +1363,12 @@ class HealthTrackerApp:
         activity_frame = tk.Frame(input_frame, bg="#f0f0f0")
         activity_frame.grid(row=4, column=1, padx=10, pady=10, sticky="w")
 
-        activities = [
-            "1. 几乎不运动或久坐不动",
-            "2. 轻度活动（每周1-3天）",
-            "3. 中度活动（每周3-5天）",
-            "4. 高度活动（每周6-7天）",
-            "5. 极高度活动（每天）"
-        ]
-
-        for i, activity in enumerate(activities):
+        for level, description in ACTIVITY_DESCRIPTIONS.items():
             tk.Radiobutton(
                 activity_frame,
-                text=activity,
+                text=f"{level}. {description}",
                 variable=self.activity_level,
-                value=i + 1,
+                value=level,
                 font=("SimHei", 10),
                 bg="#f0f0f0"
             ).pack(anchor="w")
@@ -812,7 +1376,7 @@ class HealthTrackerApp:
         # 结果显示
         self.bmr_result_var = tk.StringVar()
         result_label = tk.Label(
-            self.root,
+            frame,
             textvariable=self.bmr_result_var,
             font=("SimHei", 12),
             bg="#f0f0f0",
@@ -822,7 +1386,7 @@ class HealthTrackerApp:
         result_label.pack(pady=10, padx=50, anchor="w")
 
         # 按钮框架
-        btn_frame = tk.Frame(self.root, bg="#f0f0f0")
+        btn_frame = tk.Frame(frame, bg="#f0f0f0")
         btn_frame.pack(pady=20)
 
         # 计算按钮
@@ -849,75 +1413,42 @@ class HealthTrackerApp:
         )
         back_btn.grid(row=0, column=1, padx=10)
 
-    def calculate_and_record_bmr(self):
-        """计算并记录基础代谢率"""
-        try:
-            weight = float(self.bmr_weight_entry.get())
-            height = float(self.bmr_height_entry.get())
-            age = int(self.age_entry.get())
-            gender = self.gender_var.get()
-            activity_level = self.activity_level.get()
-
-            if weight <= 0 or height <= 0 or age <= 0:
-                messagebox.showerror("输入错误", "体重、身高和年龄必须为正数")
-                return
-
-            # 计算BMR (Mifflin-St Jeor公式)
-            if gender == "男":
-                bmr = 10 * weight + 6.25 * height - 5 * age + 5
-            else:
-                bmr = 10 * weight + 6.25 * height - 5 * age - 161
-
-            bmr = round(bmr)
-
-            # 计算TDEE
-            activity_factors = {1: 1.2, 2: 1.375, 3: 1.55, 4: 1.725, 5: 1.9}
-            tdee = round(bmr * activity_factors[activity_level])
-
-            # 活动水平描述
-            activity_descriptions = {
-                1: "几乎不运动或久坐不动",
-                2: "轻度活动（每周1-3天）",
-                3: "中度活动（每周3-5天）",
-                4: "高度活动（每周6-7天）",
-                5: "极高度活动（每天）"
-            }
+    def _refresh_bmr_frame(self):
+        """重新显示代谢率界面时清空上次的结果"""
+        self.bmr_result_var.set("")
 
+    def calculate_and_record_bmr(self):
+        """计算并记录基础代谢率（在写入线程中完成，界面不等待）"""
+        weight = self.bmr_weight_entry.get()
+        height = self.bmr_height_entry.get()
+        age = self.age_entry.get()
+        gender = self.gender_var.get()
+        activity_level = self.activity_level.get()
+
+        def work():
+            # 计算BMR (Mifflin-St Jeor公式) 和TDEE并记录
+            return self.tracker.record_bmr(float(weight), float(height), int(age), gender, activity_level)
+
+        def done(record):
             # 显示结果
-            result_text = (f"基础代谢率(BMR): {bmr} 卡路里/天\n"
-                           f"总能量消耗(TDEE): {tdee} 卡路里/天\n"
-                           f"活动水平: {activity_descriptions[activity_level]}")
+            result_text = (f"基础代谢率(BMR): {record['bmr']} 卡路里/天\n"
+                           f"总能量消耗(TDEE): {record['tdee']} 卡路里/天\n"
+                           f"活动水平: {record['activity_description']}")
             self.bmr_result_var.set(result_text)
+            self._update_charts('bmr_records', record=record)
+            self._show_status("基础代谢率记录已保存")
 
-            # 记录数据
-            record = {
-                'date': datetime.date.today().isoformat(),
-                'weight': weight,
-                'height': height,
-                'age': age,
-                'gender': gender,
-                'activity_level': activity_level,
-                'activity_description': activity_descriptions[activity_level],
-                'bmr': bmr,
-                'tdee': tdee
-            }
-
-            self.data['bmr_records'].append(record)
-            self.save_data()
-            messagebox.showinfo("成功", "基础代谢率记录已保存")
-
-        except ValueError:
-            messagebox.showerror("输入错误", "请输入有效的数字")
+        self._save_record(work, done, "请输入有效的数字")
 
     # 历史记录功能
-    def open_history_frame(self):
-        """打开历史记录界面"""
-        for widget in self.root.winfo_children():
-            widget.destroy()
+    def _build_history_frame(self, frame):
+        """创建历史记录界面"""
+        from tkcalendar import DateEntry
+        self._startup_stage("import_tkcalendar")
 
         # 标题
         title_label = tk.Label(
-            self.root,
+            frame,
             text="历史记录",
             font=("SimHei", 18, "bold"),
             bg="#f0f0f0",
@@ -927,7 +1458,7 @@ class HealthTrackerApp:
 
         # 记录类型选择
         self.history_type = tk.StringVar(value="bmi")
-        type_frame = tk.Frame(self.root, bg="#f0f0f0")
+        type_frame = tk.Frame(frame, bg="#f0f0f0")
         type_frame.pack(pady=10)
 
         tk.Label(
@@ -968,7 +1499,7 @@ class HealthTrackerApp:
         ).pack(side=tk.LEFT, padx=10)
 
         # 日期选择（仅用于能量摄入）
-        self.history_date_frame = tk.Frame(self.root, bg="#f0f0f0")
+        self.history_date_frame = tk.Frame(frame, bg="#f0f0f0")
         self.history_date_frame.pack(pady=10)
 
         tk.Label(
@@ -1001,18 +1532,38 @@ class HealthTrackerApp:
         # 初始隐藏日期选择（仅能量摄入需要）
         self.history_date_frame.pack_forget()
 
-        # 记录列表
-        self.history_listbox = tk.Listbox(
-            self.root,
+        # 记录列表（虚拟列表，只渲染可见的行）
+        self.history_listbox = VirtualListbox(
+            frame,
             width=80,
             height=15,
             font=("SimHei", 10)
         )
         self.history_listbox.pack(pady=10)
 
+        # 导入与导出（在后台执行，显示进度并可取消）
+        transfer_frame = tk.Frame(frame, bg="#f0f0f0")
+        transfer_frame.pack(pady=5)
+
+        tk.Button(
+            transfer_frame,
+            text="导入记录…",
+            command=self.import_from_files,
+            font=("SimHei", 10),
+            width=14
+        ).pack(side=tk.LEFT, padx=10)
+
+        tk.Button(
+            transfer_frame,
+            text="导出当前类型…",
+            command=self.export_to_file,
+            font=("SimHei", 10),
+            width=14
+        ).pack(side=tk.LEFT, padx=10)
+
         # 返回按钮
         back_btn = tk.Button(
-            self.root,
+            frame,
             text="返回主菜单",
             command=self.create_main_frame,
             font=("SimHei", 12),
@@ -1022,15 +1573,11 @@ class HealthTrackerApp:
         )
         back_btn.pack(side=tk.BOTTOM, pady=20)
 
-        # 初始加载BMI记录
-        self.update_history_list()
-
     def update_history_list(self):
         """更新历史记录列表"""
-        # 清空列表
-        self.history_listbox.delete(0, tk.END)
-
         record_type = self.history_type.get()
+        # 上一次查询（例如切换类型前的排序）的结果不再需要
+        self._cancel_query("history")
 
         # 显示或隐藏日期选择框
         if record_type == "calorie":
@@ -1038,70 +1585,261 @@ class HealthTrackerApp:
         else:
             self.history_date_frame.pack_forget()
 
-        if record_type == "bmi":
-            # 显示BMI记录
-            if not self.data['bmi_records']:
-                self.history_listbox.insert(tk.END, "暂无BMI记录")
-                return
+        collection = {
+            "bmi": 'bmi_records',
+            "bmr": 'bmr_records',
+            "calorie": 'calorie_intake'
+        }[record_type]
+        if not self._data_ready((collection,), self.update_history_list, self.history_listbox):
+            self.history_listbox.set_lines(["数据加载中，请稍候…"])
+            return
 
-            # 按日期排序，最近的在前
-            sorted_records = sorted(
-                self.data['bmi_records'],
-                key=lambda x: x['date'],
-                reverse=True
-            )
+        if record_type == "bmi":
+            # 显示BMI记录，按日期排序，最近的在前
+            def show(sorted_records):
+                if not sorted_records:
+                    self.history_listbox.set_lines(["暂无BMI记录"])
+                    return
 
-            for record in sorted_records:
-                self.history_listbox.insert(
-                    tk.END,
-                    f"{record['date']} - 体重: {record['weight']}kg, 身高: {record['height']}cm, "
-                    f"BMI: {record['bmi']}, 类别: {record['category']}"
-                )
+                def row_text(i):
+                    record = sorted_records[i]
+                    return (f"{record['date']} - 体重: {record['weight']}kg, 身高: {record['height']}cm, "
+                            f"BMI: {record['bmi']}, 类别: {record['category']}")
 
-        elif record_type == "bmr":
-            # 显示代谢率记录
-            if not self.data['bmr_records']:
-                self.history_listbox.insert(tk.END, "暂无代谢率记录")
-                return
+                self.history_listbox.set_rows(len(sorted_records), row_text)
 
-            # 按日期排序，最近的在前
-            sorted_records = sorted(
-                self.data['bmr_records'],
-                key=lambda x: x['date'],
-                reverse=True
-            )
+            self._sorted_history("bmi", self.store.bmi_records, show)
 
-            for record in sorted_records:
-                self.history_listbox.insert(
-                    tk.END,
-                    f"{record['date']} - 年龄: {record['age']}岁, 性别: {record['gender']}, "
-                    f"活动水平: {record['activity_description']}"
-                )
-                self.history_listbox.insert(
-                    tk.END,
-                    f"   BMR: {record['bmr']} 卡路里/天, TDEE: {record['tdee']} 卡路里/天"
-                )
-                self.history_listbox.insert(tk.END, "")
+        elif record_type == "bmr":
+            # 显示代谢率记录，按日期排序，最近的在前
+            def show(sorted_records):
+                if not sorted_records:
+                    self.history_listbox.set_lines(["暂无代谢率记录"])
+                    return
+
+                # 每条记录占三行：基本信息、BMR/TDEE、空行
+                def row_text(i):
+                    record = sorted_records[i // 3]
+                    line = i % 3
+                    if line == 0:
+                        return (f"{record['date']} - 年龄: {record['age']}岁, 性别: {record['gender']}, "
+                                f"活动水平: {record['activity_description']}")
+                    if line == 1:
+                        return f"   BMR: {record['bmr']} 卡路里/天, TDEE: {record['tdee']} 卡路里/天"
+                    return ""
+
+                self.history_listbox.set_rows(len(sorted_records) * 3, row_text)
+
+            self._sorted_history("bmr", self.store.bmr_records, show)
 
         elif record_type == "calorie":
             # 显示能量摄入记录
             date = self.history_date.get()
+            records = self.store.intake_on(date)
 
-            if date not in self.data['calorie_intake'] or not self.data['calorie_intake'][date]:
-                self.history_listbox.insert(tk.END, f"{date} 暂无能量摄入记录")
+            if not records:
+                self.history_listbox.set_lines([f"{date} 暂无能量摄入记录"])
                 return
 
-            records = self.data['calorie_intake'][date]
-            total = sum(item['calories'] for item in records)
+            total = self.store.intake_totals.total_on(date)
+
+            lines = [f"{date} 的能量摄入记录：", ""]
+            lines.extend(f"{item['food']}: {item['calories']} 卡路里" for item in records)
+            lines.extend(["", f"总计：{total} 卡路里"])
+            self.history_listbox.set_lines(lines)
+
+    def _sorted_history(self, record_type, query, show):
+        """把排好序的历史记录交给 show；集合未变化时直接使用缓存，否则在后台排序"""
+        collection = 'bmi_records' if record_type == "bmi" else 'bmr_records'
+        version = self.store.version(collection)
+        cached = self._history_cache.get(record_type)
+        if cached is not None and cached[0] == version:
+            show(cached[1])
+            return
+
+        def done(records):
+            # 排序期间又有新记录时缓存的是旧版本，下次显示会重新排序
+            self._history_cache[record_type] = (version, records)
+            show(records)
+
+        self.history_listbox.set_lines(["正在整理记录，请稍候…"])
+        self._query("history", query, done)
+
+    def import_from_files(self):
+        """从 CSV / JSON Lines 文件导入记录，在后台执行并显示进度"""
+        if self._transfer_running():
+            messagebox.showinfo("请稍候", "已有导入或导出正在进行")
+            return
+        if not self.store.is_ready(*COLLECTIONS):
+            messagebox.showinfo("请稍候", "数据尚在加载，请稍后再导入")
+            return
+        paths = filedialog.askopenfilenames(
+            parent=self.root,
+            title="导入记录",
+            filetypes=[("CSV / JSON Lines", "*.csv *.jsonl *.ndjson"), ("所有文件", "*.*")]
+        )
+        if not paths:
+            return
+        # 文件中没有 type 字段时，按当前选择的记录类型导入
+        default_type = {"bmi": 'bmi', "bmr": 'bmr', "calorie": 'intake'}[self.history_type.get()]
+
+        def work(task):
+            from health_import import import_files
+            return import_files(self.store, paths, default_type, on_progress=task.progress)
+
+        def done(result):
+            dialog.close()
+            imported = result['imported']
+            message = (f"BMI {imported['bmi']} 条，代谢率 {imported['bmr']} 条，"
+                       f"能量摄入 {imported['intake']} 条；跳过重复 {result['duplicates']} 条")
+            errors = result['errors']
+            if errors:
+                message += f"\n\n{len(errors)} 行有错误未导入："
+                message += "".join(f"\n{os.path.basename(path)} 第 {line_no} 行：{error}"
+                                   for path, line_no, error in errors[:10])
+                if len(errors) > 10:
+                    message += f"\n…… 其余 {len(errors) - 10} 行未显示"
+            messagebox.showinfo("导入完成", message)
+            self.update_history_list()
+
+        def failed(error):
+            dialog.close()
+            messagebox.showerror("导入失败", str(error))
+
+        self._transfer = task = self.tasks.submit(
+            work, on_done=done, on_error=failed,
+            on_progress=lambda n: dialog.set_progress(n, f"已处理 {n} 行…")
+        )
+        dialog = ProgressDialog(self.root, "导入记录", "正在读取文件…", on_cancel=task.cancel)
+
+    def export_to_file(self):
+        """把当前选择的记录类型导出到文件，在后台执行并显示进度"""
+        if self._transfer_running():
+            messagebox.showinfo("请稍候", "已有导入或导出正在进行")
+            return
+        record_type = {"bmi": 'bmi', "bmr": 'bmr', "calorie": 'intake'}[self.history_type.get()]
+        collection = {'bmi': 'bmi_records', 'bmr': 'bmr_records', 'intake': 'calorie_intake'}[record_type]
+        if not self.store.is_ready(collection):
+            messagebox.showinfo("请稍候", "数据尚在加载，请稍后再导出")
+            return
+        path = filedialog.asksaveasfilename(
+            parent=self.root,
+            title="导出记录",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet")]
+        )
+        if not path:
+            return
+
+        def work(task):
+            # 写完才替换目标文件，取消或出错时原有文件保持不变
+            from health_export import export_records
+            return export_records(self.store, record_type, path, on_progress=task.progress)
 
-            self.history_listbox.insert(tk.END, f"{date} 的能量摄入记录：")
-            self.history_listbox.insert(tk.END, "")
+        def done(count):
+            dialog.close()
+            self._show_status(f"已导出 {count} 条记录到 {os.path.basename(path)}")
 
-            for item in records:
-                self.history_listbox.insert(tk.END, f"{item['food']}: {item['calories']} 卡路里")
+        def failed(error):
+            dialog.close()
+            messagebox.showerror("导出失败", str(error))
 
-            self.history_listbox.insert(tk.END, "")
-            self.history_listbox.insert(tk.END, f"总计：{total} 卡路里")
+        self._transfer = task = self.tasks.submit(
+            work, on_done=done, on_error=failed,
+            on_progress=lambda n: dialog.set_progress(n, f"已导出 {n} 条…")
+        )
+        dialog = ProgressDialog(self.root, "导出记录", "正在导出…", on_cancel=task.cancel)
+
+    # 趋势图
+    def _build_charts_frame(self, frame):
+        """创建趋势图界面"""
+        # 标题
+        title_label = tk.Label(
+            frame,
+            text="趋势图",
+            font=("SimHei", 18, "bold"),
+            bg="#f0f0f0",
+            fg="#333333"
+        )
+        title_label.pack(pady=10)
+
+        # 返回按钮（先于图表放置，保证窗口较矮时仍可见）
+        back_btn = tk.Button(
+            frame,
+            text="返回主菜单",
+            command=self.create_main_frame,
+            font=("SimHei", 12),
+            width=15,
+            bg="#f44336",
+            fg="white"
+        )
+        back_btn.pack(side=tk.BOTTOM, pady=10)
+
+        charts_frame = tk.Frame(frame, bg="#f0f0f0")
+        charts_frame.pack(fill=tk.BOTH, expand=True, padx=20)
+
+        chart_options = {"width": 760, "height": 105}
+        self.charts = {
+            'weight': TrendChart(charts_frame, "体重", "#2196F3", "kg", **chart_options),
+            'bmi': TrendChart(charts_frame, "BMI", "#4CAF50", **chart_options),
+            'tdee': TrendChart(charts_frame, "每日总能量消耗（TDEE）", "#FF9800", "卡路里",
+                               **chart_options),
+            'balance': TrendChart(charts_frame, "每日热量缺口（TDEE - 摄入）", "#FF5722", "卡路里",
+                                  **chart_options)
+        }
+        for chart in self.charts.values():
+            chart.pack(fill=tk.X, pady=3)
+
+    def _refresh_charts_frame(self):
+        """显示趋势图；数据有过未增量反映到图上的变化时重新读取全部序列"""
+        if not self._data_ready(COLLECTIONS, self._refresh_charts_frame, self.charts['weight']):
+            return
+
+        versions = {name: self.store.version(name) for name in COLLECTIONS}
+        if versions == self._chart_versions:
+            return
+
+        def work():
+            bmi_records = list(self.store.iter_bmi_records())
+            return {
+                'weight': record_series(bmi_records, 'weight'),
+                'bmi': record_series(bmi_records, 'bmi'),
+                'tdee': record_series(self.store.iter_bmr_records(), 'tdee'),
+                'balance': balance_series(self.store)
+            }
+
+        def done(series):
+            for name, (xs, ys) in series.items():
+                self.charts[name].set_series(xs, ys)
+            # 读取期间又有新记录时这里记下的是旧版本，下次显示会重新读取
+            self._chart_versions = versions
+
+        # 读取完成前不做增量更新，图上的序列即将整体替换
+        self._chart_versions = None
+        self._query("charts", work, done)
+
+    def _update_charts(self, collection, record=None, date=None):
+        """新增一条记录后增量更新趋势图
+
+        趋势图尚未创建，或此前还有未反映到图上的变化时，留到下次显示时整体刷新。
+        """
+        versions = self._chart_versions
+        if versions is None or versions[collection] != self.store.version(collection) - 1:
+            return
+        versions[collection] += 1
+
+        if collection == 'bmi_records':
+            x = date_ordinal(record['date'])
+            self.charts['weight'].add_point(x, record['weight'])
+            self.charts['bmi'].add_point(x, record['bmi'])
+        elif collection == 'bmr_records':
+            self.charts['tdee'].add_point(date_ordinal(record['date']), record['tdee'])
+            # 新的TDEE会改变此后每一天的热量缺口
+            self.charts['balance'].set_series(*balance_series(self.store))
+        else:
+            balance = self.tracker.balance_on(date)['balance']
+            if balance is not None:
+                self.charts['balance'].set_point(date_ordinal(date), balance)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,394 @@
+import bisect
+import datetime
+import tkinter as tk
+from tkinter import ttk
+
+from health_charts import bucket_of, minmax_buckets, rebucket
+
+
+class VirtualListbox(tk.Frame):
+    """虚拟列表：只把当前可见的几行插入 Listbox，行文本在显示时才生成
+
+    set_rows(count, row_text) 设置总行数和按行号生成文本的函数，
+    滚动时只重绘可见窗口，因此行数再多切换和滚动也不会变慢。
+    """
+
+    def __init__(self, master, height=15, **listbox_options):
+        super().__init__(master, bg=master.cget("bg"))
+        self.visible_rows = height
+        self._count = 0
+        self._row_text = None
+        self._top = 0
+
+        self.listbox = tk.Listbox(self, height=height, **listbox_options)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Windows/macOS 使用 MouseWheel，Linux 使用 Button-4/5
+        self.listbox.bind("<MouseWheel>", self._on_mousewheel)
+        self.listbox.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll(3))
+        self.listbox.bind("<Prior>", lambda e: self.scroll(-self.visible_rows))
+        self.listbox.bind("<Next>", lambda e: self.scroll(self.visible_rows))
+
+    def set_rows(self, count, row_text):
+        """设置总行数和行文本生成函数，并回到顶部"""
+        self._count = count
+        self._row_text = row_text
+        self._top = 0
+        self._render()
+
+    def set_lines(self, lines):
+        """直接显示少量固定文本行"""
+        self.set_rows(len(lines), lines.__getitem__)
+
+    def scroll(self, rows):
+        """向下（正数）或向上（负数）滚动若干行"""
+        self._scroll_to(self._top + rows)
+        return "break"
+
+    def yview(self, *args):
+        """滚动条回调"""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self._scroll_to(round(float(args[1]) * self._count))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_rows
+            self._scroll_to(self._top + amount)
+
+    def _on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def _scroll_to(self, top):
+        top = max(0, min(top, self._count - self.visible_rows))
+        if top != self._top:
+            self._top = top
+            self._render()
+
+    def _render(self):
+        """只重绘可见窗口内的行"""
+        end = min(self._top + self.visible_rows, self._count)
+        self.listbox.delete(0, tk.END)
+        if end > self._top:
+            self.listbox.insert(tk.END, *(self._row_text(i) for i in range(self._top, end)))
+
+        if self._count:
+            self.scrollbar.set(self._top / self._count, end / self._count)
+        else:
+            self.scrollbar.set(0, 1)
+
+
+class Autocomplete:
+    """输入框的自动补全：内容变化时调用 suggest(文本) 取候选，显示在输入框下方
+
+    suggest 返回 (显示文本, 值) 列表；选中候选（回车、单击或 Tab）后调用 on_select(值)。
+    候选列表用 place 覆盖在 container 中输入框的正下方，不改变原有布局。
+    监听的是输入框内容而不是按键，因此输入法上屏的中文同样能触发补全。
+    """
+
+    def __init__(self, entry, container, suggest, on_select, rows=6):
+        self.entry = entry
+        self.suggest = suggest
+        self.on_select = on_select
+        self.rows = rows
+        self._values = []
+        self._selecting = False
+
+        self.text = tk.StringVar()
+        entry.configure(textvariable=self.text)
+        self.text.trace_add("write", lambda *args: self.refresh())
+
+        self.listbox = tk.Listbox(container, height=rows, font=entry.cget("font"),
+                                  activestyle="dotbox", exportselection=False)
+        self.listbox.bind("<Return>", self._choose)
+        self.listbox.bind("<Tab>", self._choose)
+        self.listbox.bind("<ButtonRelease-1>", self._choose)
+        self.listbox.bind("<Escape>", lambda e: self._back_to_entry())
+        self.listbox.bind("<FocusOut>", lambda e: self._hide_later())
+
+        entry.bind("<Down>", self._focus_list, add="+")
+        entry.bind("<Escape>", lambda e: self.hide(), add="+")
+        entry.bind("<FocusOut>", lambda e: self._hide_later(), add="+")
+
+    def refresh(self):
+        """按当前内容更新候选列表"""
+        if self._selecting:
+            return
+        candidates = self.suggest(self.text.get())
+        # 唯一的候选就是已输入的内容时无需再显示
+        if len(candidates) == 1 and candidates[0][1] == self.text.get():
+            candidates = []
+        if not candidates:
+            self.hide()
+            return
+
+        self._values = [value for _, value in candidates]
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, *(label for label, _ in candidates))
+        self.listbox.configure(height=min(len(candidates), self.rows))
+        self.listbox.place(in_=self.entry, x=0, rely=1.0, relwidth=1.0, bordermode="outside")
+        self.listbox.lift()
+
+    def hide(self):
+        """隐藏候选列表"""
+        self.listbox.place_forget()
+        self._values = []
+
+    def _hide_later(self):
+        # 焦点在输入框和候选列表之间切换时不隐藏
+        def check():
+            if self.entry.focus_get() not in (self.entry, self.listbox):
+                self.hide()
+        self.entry.after(100, check)
+
+    def _focus_list(self, event):
+        if not self._values:
+            return None
+        self.listbox.focus_set()
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(0)
+        self.listbox.activate(0)
+        return "break"
+
+    def _back_to_entry(self):
+        self.hide()
+        self.entry.focus_set()
+        return "break"
+
+    def _choose(self, event):
+        selection = self.listbox.curselection()
+        if not selection or selection[0] >= len(self._values):
+            return "break"
+        value = self._values[selection[0]]
+        self.hide()
+        self._selecting = True
+        try:
+            self.on_select(value)
+        finally:
+            self._selecting = False
+        return "break"
+
+
+class TrendChart(tk.Canvas):
+    """折线趋势图：横坐标为日序号，数据按像素宽度分桶降采样后绘制
+
+    set_series(xs, ys) 设置按横坐标排序的完整序列并重绘；add_point(x, y) 插入一个点，
+    set_point(x, y) 设置某个横坐标上唯一的点（如每日汇总值）。新点落在当前坐标范围内时
+    只重算它所在的桶并更新折线坐标，坐标轴和文字不动；超出范围才整体重绘。
+    """
+
+    MARGIN_LEFT = 60
+    MARGIN_RIGHT = 15
+    MARGIN_TOP = 22
+    MARGIN_BOTTOM = 18
+    # 每个桶占的像素宽度
+    BUCKET_PIXELS = 2
+
+    def __init__(self, master, title, color="#2196F3", unit="", **canvas_options):
+        super().__init__(master, bg="white", highlightthickness=0, **canvas_options)
+        self.title = title
+        self.color = color
+        self.unit = unit
+        self._xs = []
+        self._ys = []
+        self._buckets = []
+        self._line = None
+        self._latest = None
+        self._plot = (0, 0, 1, 1)
+        self._x_range = (0, 1)
+        self._y_range = (0, 1)
+        self.bind("<Configure>", lambda e: self.redraw())
+
+    def set_series(self, xs, ys):
+        """设置完整序列（横坐标须已排序）并重绘"""
+        self._xs = list(xs)
+        self._ys = list(ys)
+        self.redraw()
+
+    def add_point(self, x, y):
+        """插入一个点，同一横坐标可以有多个点"""
+        i = bisect.bisect_right(self._xs, x)
+        self._xs.insert(i, x)
+        self._ys.insert(i, y)
+        self._point_changed(x, y)
+
+    def set_point(self, x, y):
+        """设置横坐标 x 上唯一的点，已有则替换"""
+        i = bisect.bisect_left(self._xs, x)
+        if i < len(self._xs) and self._xs[i] == x:
+            self._ys[i] = y
+        else:
+            self._xs.insert(i, x)
+            self._ys.insert(i, y)
+        self._point_changed(x, y)
+
+    def _point_changed(self, x, y):
+        x0, x1 = self._x_range
+        y0, y1 = self._y_range
+        if self._line is None or not (x0 <= x <= x1 and y0 <= y <= y1):
+            self.redraw()
+            return
+        count = len(self._buckets)
+        i = bucket_of(x, x0, x1, count)
+        self._buckets[i] = rebucket(self._xs, self._ys, x0, x1, count, i)
+        self._update_line()
+
+    def _size(self):
+        width, height = self.winfo_width(), self.winfo_height()
+        if width <= 1:
+            # 尚未显示时按创建时指定的尺寸计算
+            width, height = int(self.cget("width")), int(self.cget("height"))
+        return width, height
+
+    def redraw(self):
+        """重新计算坐标范围和全部桶，重画坐标轴和折线"""
+        self.delete("all")
+        self._line = None
+        width, height = self._size()
+        left, top = self.MARGIN_LEFT, self.MARGIN_TOP
+        right, bottom = width - self.MARGIN_RIGHT, height - self.MARGIN_BOTTOM
+        if right <= left or bottom <= top:
+            return
+        self._plot = (left, top, right, bottom)
+
+        self.create_text(left, 4, anchor="nw", text=self.title, font=("SimHei", 10, "bold"))
+        self.create_rectangle(left, top, right, bottom, outline="#cccccc")
+        if not self._xs:
+            self.create_text((left + right) / 2, (top + bottom) / 2, text="暂无数据", fill="#999999",
+                             font=("SimHei", 10))
+            return
+
+        # 右侧和上下留出余量，之后追加的点大多仍在范围内，无需整体重绘
+        first, last = self._xs[0], self._xs[-1]
+        self._x_range = (first, last + max(7, (last - first) * 0.1))
+        low, high = min(self._ys), max(self._ys)
+        pad = max((high - low) * 0.1, abs(high) * 0.02, 1)
+        self._y_range = (low - pad, high + pad)
+
+        count = max(1, (right - left) // self.BUCKET_PIXELS)
+        self._buckets = minmax_buckets(self._xs, self._ys, *self._x_range, count)
+
+        y0, y1 = self._y_range
+        if y0 < 0 < y1:
+            zero = self._to_canvas(first, 0)[1]
+            self.create_line(left, zero, right, zero, fill="#bbbbbb", dash=(4, 2))
+        for value, y in ((y1, top), (y0, bottom)):
+            self.create_text(left - 4, y, anchor="e", text=f"{value:.1f}", font=("SimHei", 8))
+        x0, x1 = self._x_range
+        for value, x, anchor in ((x0, left, "nw"), (x1, right, "ne")):
+            self.create_text(x, bottom + 2, anchor=anchor, font=("SimHei", 8),
+                             text=datetime.date.fromordinal(int(value)).isoformat())
+
+        self._latest = self.create_text(right, 4, anchor="ne", font=("SimHei", 9), fill=self.color)
+        self._line = self.create_line(0, 0, 0, 0, fill=self.color, width=1.5)
+        self._update_line()
+
+    def _to_canvas(self, x, y):
+        left, top, right, bottom = self._plot
+        x0, x1 = self._x_range
+        y0, y1 = self._y_range
+        return (left + (x - x0) / (x1 - x0) * (right - left),
+                bottom - (y - y0) / (y1 - y0) * (bottom - top))
+
+    def _update_line(self):
+        """按各桶的点更新折线坐标和最新值"""
+        coords = []
+        for bucket in self._buckets:
+            for x, y in bucket:
+                coords.extend(self._to_canvas(x, y))
+        if len(coords) == 2:
+            coords *= 2
+        self.coords(self._line, *coords)
+        self.itemconfigure(self._latest, text=f"最新：{self._ys[-1]:g} {self.unit}".rstrip())
+
+
+class ProgressDialog(tk.Toplevel):
+    """后台任务的进度窗口：显示进度文字和进度条，提供取消按钮
+
+    total 为 None 时进度条来回滚动（总量未知），否则 set_progress(done) 按比例显示。
+    点击取消或关闭窗口时调用 on_cancel()，并关闭窗口。
+    """
+
+    def __init__(self, master, title, text, on_cancel=None, total=None):
+        super().__init__(master)
+        self.title(title)
+        self.resizable(False, False)
+        self.transient(master)
+        self.total = total
+        self._on_cancel = on_cancel
+
+        self.text_var = tk.StringVar(value=text)
+        tk.Label(self, textvariable=self.text_var, font=("SimHei", 11), width=36,
+                 anchor=tk.W).pack(padx=20, pady=(15, 5))
+
+        self.bar = ttk.Progressbar(self, length=300,
+                                   mode="indeterminate" if total is None else "determinate",
+                                   maximum=total or 100)
+        self.bar.pack(padx=20, pady=5)
+        if total is None:
+            self.bar.start(15)
+
+        tk.Button(self, text="取消", command=self.cancel, font=("SimHei", 10),
+                  width=10).pack(pady=(5, 15))
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+
+    def set_progress(self, done, text=None):
+        """更新进度（已完成的数量）和说明文字"""
+        if text is not None:
+            self.text_var.set(text)
+        if self.total is not None:
+            self.bar['value'] = min(done, self.total)
+
+    def cancel(self):
+        """取消任务并关闭窗口"""
+        if self._on_cancel is not None:
+            self._on_cancel()
+        self.close()
+
+    def close(self):
+        """关闭窗口（任务完成时调用）"""
+        if self.winfo_exists():
+            self.bar.stop()
+            self.destroy()
+
+
+class ScreenManager:
+    """界面管理器：每个界面只在第一次显示时创建，之后切换时仅隐藏和显示
+
+    register(name, build, refresh) 登记界面：build(frame) 在给定的 Frame 中创建控件，
+    refresh() 在每次显示时调用，用于刷新与数据绑定的变量。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.current = None
+        self._builders = {}
+        self._frames = {}
+
+    def register(self, name, build, refresh=None):
+        """登记一个界面"""
+        self._builders[name] = (build, refresh)
+
+    def show(self, name):
+        """显示指定界面，首次显示时才创建"""
+        build, refresh = self._builders[name]
+
+        frame = self._frames.get(name)
+        if frame is None:
+            frame = tk.Frame(self.root, bg=self.root.cget("bg"))
+            build(frame)
+            self._frames[name] = frame
+
+        if self.current is not None and self.current != name:
+            self._frames[self.current].pack_forget()
+        if self.current != name:
+            frame.pack(fill=tk.BOTH, expand=True)
+        self.current = name
+
+        if refresh is not None:
+            refresh()
@@ -1,10 +1,26 @@
+import argparse
 import os
 import shutil
 import subprocess
 from pathlib import Path
 
-def package_health_tracker():
-    """将健康追踪应用打包为独立的Windows可执行文件"""
+APP_NAME = "健康追踪应用"
+
+
+def build_output(current_dir, mode):
+    """返回某种打包模式生成的可执行文件路径"""
+    exe_name = APP_NAME + (".exe" if os.name == "nt" else "")
+    if mode == "onedir":
+        return current_dir / "dist" / "onedir" / APP_NAME / exe_name
+    return current_dir / "dist" / exe_name
+
+
+def package_health_tracker(mode="onefile"):
+    """将健康追踪应用打包为独立的Windows可执行文件
+
+    onefile：单个 EXE（UPX 压缩），每次启动都要先解压到临时目录；
+    onedir：目录形式，不使用 UPX 并预编译优化字节码，启动时无需解压，速度更快。
+    """
     # 确保打包工具已安装
     try:
         import pyinstaller
@@ -29,39 +45,98 @@ def package_health_tracker():
         print("请确保此打包脚本与应用主文件在同一目录下")
         return
     
-    # 清理之前的打包文件
-    for folder in ["build", "dist", "__pycache__"]:
-        folder_path = current_dir / folder
-        if folder_path.exists():
-            print(f"清理目录: {folder_path}")
-            shutil.rmtree(folder_path, ignore_errors=True)
+    # 清理之前的打包文件（只清理本模式的输出，保留另一种模式的结果和 dist 中的数据文件）
+    output = build_output(current_dir, mode)
+    work_dir = current_dir / "build" / ("onedir" if mode == "onedir" else APP_NAME)
+    stale = [work_dir, current_dir / "__pycache__"]
+    stale.append(output.parent if mode == "onedir" else output)
+    for path in stale:
+        if path.is_dir():
+            print(f"清理目录: {path}")
+            shutil.rmtree(path, ignore_errors=True)
+        elif path.exists():
+            print(f"清理文件: {path}")
+            path.unlink()
     
     # 打包命令
-    # -F: 打包成单个文件
+    # -F: 打包成单个文件；-D: 打包成目录
     # -w: 不显示控制台窗口
     # --name: 应用名称
     # --add-data: 添加必要的数据文件（如果有的话）
-    print("开始打包应用...")
+    # --hidden-import: tkcalendar 在函数内延迟导入，其依赖 babel.numbers 需显式声明
+    print(f"开始打包应用（{mode}）...")
     command = [
         "pyinstaller",
-        "-F",
         "-w",
-        "--name", "健康追踪应用",
-        str(app_script_path)
+        "--name", APP_NAME,
+        "--hidden-import", "babel.numbers",
+        # 附带的食物营养表（见 health_fooddb），打包后位于程序解压目录的根下
+        "--add-data", f"{current_dir / 'food_nutrition.csv'}{os.pathsep}.",
     ]
+    if mode == "onedir":
+        # --noupx: 不压缩，省去启动时的解压
+        # --optimize 1: 预编译优化后的字节码
+        # 输出到独立目录，避免覆盖单文件版本和仓库中的 spec
+        command += [
+            "-D",
+            "--noupx",
+            "--optimize", "1",
+            "--distpath", str(current_dir / "dist" / "onedir"),
+            "--workpath", str(current_dir / "build" / "onedir"),
+            "--specpath", str(current_dir / "build" / "onedir"),
+        ]
+    else:
+        command += ["-F"]
+    command.append(str(app_script_path))
     
     try:
         subprocess.check_call(command)
         print("\n打包完成！")
-        print(f"可执行文件位置: {current_dir / 'dist' / '健康追踪应用.exe'}")
+        print(f"可执行文件位置: {output}")
         print("\n使用说明：")
-        print("1. 找到dist文件夹中的'健康追踪应用.exe'")
-        print("2. 可以直接运行，或发送给他人")
+        if mode == "onedir":
+            print(f"1. 找到'{output.parent}'文件夹，其中的'{output.name}'即为程序")
+            print("2. 发送给他人时需要复制整个文件夹")
+        else:
+            print("1. 找到dist文件夹中的'健康追踪应用.exe'")
+            print("2. 可以直接运行，或发送给他人")
         print("3. 首次运行可能会有安全提示，选择'更多信息'->'仍要运行'")
-        print("4. 数据会保存在与exe同一目录下的health_data.json文件中")
+        print("4. 数据会保存在启动时所在目录下的health_data.json文件中")
     except Exception as e:
         print(f"打包过程出错: {str(e)}")
 
+
+def compare_launch_time(runs):
+    """对已打包的单文件版和目录版分别做冷启动测试，比较启动耗时"""
+    from benchmark_startup import benchmark
+
+    current_dir = Path(__file__).parent
+    results = {}
+    for mode in ("onefile", "onedir"):
+        exe = build_output(current_dir, mode)
+        if not exe.exists():
+            print(f"未找到 {mode} 版本（{exe}），跳过")
+            continue
+        results[mode] = benchmark(mode, [str(exe)], str(current_dir), runs, 120)
+
+    print("首屏绘制耗时 p50（毫秒，距启动）：")
+    for mode, summary in results.items():
+        if "first_paint" in summary:
+            print(f"  {mode:<8}{summary['first_paint'][50]:>10.1f}")
+    return results
+
+
 if __name__ == "__main__":
-    package_health_tracker()
+    parser = argparse.ArgumentParser(description="打包健康追踪应用")
+    parser.add_argument("--mode", choices=["onefile", "onedir", "both"], default="onefile",
+                        help="onefile: 单文件 EXE；onedir: 目录形式（启动更快）；both: 两种都打包")
+    parser.add_argument("--benchmark", type=int, default=0, metavar="N",
+                        help="打包后对两种版本各冷启动 N 次并比较启动耗时")
+    args = parser.parse_args()
+
+    for build_mode in (["onefile", "onedir"] if args.mode == "both" else [args.mode]):
+        package_health_tracker(build_mode)
+
+    if args.benchmark:
+        compare_launch_time(args.benchmark)
     
\ No newline at end of file
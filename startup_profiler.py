@@ -0,0 +1,70 @@
+"""启动耗时分析：记录应用启动各阶段的时间点
+
+设置环境变量 HEALTH_TRACKER_PROFILE=<输出文件> 后启用，启动完成时把结果写成 JSON。
+启动者可通过 HEALTH_TRACKER_LAUNCH_TIME 传入发起启动时的 time.time()，
+这样报告中的时间包含解释器启动（以及单文件 EXE 解压）的开销。
+"""
+import json
+import os
+import time
+
+PROFILE_ENV = "HEALTH_TRACKER_PROFILE"
+LAUNCH_TIME_ENV = "HEALTH_TRACKER_LAUNCH_TIME"
+EXIT_ENV = "HEALTH_TRACKER_EXIT_AFTER_STARTUP"
+
+# 本模块被导入的时刻，近似为脚本开始执行的时刻
+_wall_start = time.time()
+_perf_start = time.perf_counter()
+
+_marks = {}
+
+
+def enabled():
+    """是否启用了启动耗时分析"""
+    return bool(os.environ.get(PROFILE_ENV))
+
+
+def exit_after_startup():
+    """是否要求启动完成后立即退出（用于基准测试）"""
+    return bool(os.environ.get(EXIT_ENV))
+
+
+def mark(name):
+    """记录一个启动阶段完成的时间点，同名阶段只记录第一次"""
+    if name not in _marks:
+        _marks[name] = time.perf_counter()
+
+
+def has_marks(*names):
+    """判断指定的阶段是否都已记录"""
+    return all(name in _marks for name in names)
+
+
+def report():
+    """生成报告：各阶段距启动时刻与脚本开始执行的毫秒数"""
+    launch_time = os.environ.get(LAUNCH_TIME_ENV)
+    # 脚本开始执行前已经过去的时间（解释器启动、EXE 解压等）
+    before_script = (_wall_start - float(launch_time)) * 1000 if launch_time else None
+
+    stages = []
+    for name, t in sorted(_marks.items(), key=lambda item: item[1]):
+        since_script = (t - _perf_start) * 1000
+        stages.append({
+            'name': name,
+            'since_script_ms': round(since_script, 2),
+            'since_launch_ms': round(before_script + since_script, 2) if before_script is not None else None
+        })
+
+    return {
+        'interpreter_start_ms': round(before_script, 2) if before_script is not None else None,
+        'stages': stages
+    }
+
+
+def write_report():
+    """把报告写入 HEALTH_TRACKER_PROFILE 指定的文件"""
+    path = os.environ.get(PROFILE_ENV)
+    if not path:
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report(), f, ensure_ascii=False, indent=4)
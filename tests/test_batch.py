@@ -0,0 +1,42 @@
+"""批量计算（health_batch）的 NumPy 与逐条计算两种方式"""
+import math
+
+import pytest
+
+from health_batch import compute_batch, compute_bmi_batch
+from health_core import InvalidInputError, calculate_bmr, calculate_tdee
+
+USE_NUMPY = [False, True]
+
+
+def _skip_without_numpy(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+
+
+@pytest.mark.parametrize("use_numpy", USE_NUMPY)
+@pytest.mark.parametrize("weight, height", [
+    (math.nan, 170), (70, math.nan), (math.inf, 170), (70, math.inf), (-math.inf, 170),
+])
+def test_bmi_batch_rejects_non_finite_values(use_numpy, weight, height):
+    _skip_without_numpy(use_numpy)
+    with pytest.raises(InvalidInputError, match="第 2 行"):
+        compute_bmi_batch([70, weight], [170, height], use_numpy=use_numpy)
+
+
+@pytest.mark.parametrize("use_numpy", USE_NUMPY)
+@pytest.mark.parametrize("age", [math.nan, math.inf])
+def test_batch_rejects_non_finite_age(use_numpy, age):
+    _skip_without_numpy(use_numpy)
+    with pytest.raises(InvalidInputError, match="第 2 行"):
+        compute_batch([70, 70], [170, 170], [30, age], ["男", "女"], [2, 3], use_numpy=use_numpy)
+
+
+@pytest.mark.parametrize("use_numpy", USE_NUMPY)
+def test_batch_matches_single_calculation(use_numpy):
+    _skip_without_numpy(use_numpy)
+    result = compute_batch([70, 55.5], [175, 160], [30, 25], ["男", "女"], [2, 3], use_numpy=use_numpy)
+    assert list(result['bmi']) == [22.9, 21.7]
+    assert list(result['category']) == ["正常", "正常"]
+    assert list(result['bmr']) == [calculate_bmr(70, 175, 30, "男"), calculate_bmr(55.5, 160, 25, "女")]
+    assert list(result['tdee']) == [calculate_tdee(result['bmr'][0], 2), calculate_tdee(result['bmr'][1], 3)]
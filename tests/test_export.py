@@ -0,0 +1,57 @@
+"""导出记录（health_export）：写出格式、原子替换与缺少 pyarrow 时的提示"""
+import csv
+import os
+import sys
+
+import pytest
+
+import health_export
+from health_core import make_intake_item
+from health_export import export_records, main
+from health_fileio import TMP_SUFFIX
+from health_storage import JournalStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JournalStore(str(tmp_path / "health_data.json"))
+    store.load()
+    for i in range(30):
+        store.add_intake("2024-01-01", make_intake_item(f"food{i}", 100 + i))
+    store.flush()
+    yield store
+    store.close()
+
+
+def test_export_csv(store, tmp_path):
+    path = str(tmp_path / "intake.csv")
+    assert export_records(store, 'intake', path) == 30
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0] == {'date': "2024-01-01", 'food': "food0", 'calories': "100"}
+    assert not os.path.exists(path + TMP_SUFFIX)
+
+
+def test_failed_export_keeps_existing_file(store, tmp_path, monkeypatch):
+    path = tmp_path / "intake.jsonl"
+    path.write_text("旧内容", encoding='utf-8')
+    monkeypatch.setattr(health_export, "PROGRESS_INTERVAL", 10)
+
+    def cancel(count):
+        raise RuntimeError("取消")
+
+    with pytest.raises(RuntimeError):
+        export_records(store, 'intake', str(path), on_progress=cancel)
+    assert path.read_text(encoding='utf-8') == "旧内容"
+    assert not os.path.exists(str(path) + TMP_SUFFIX)
+
+
+def test_main_reports_missing_pyarrow(store, tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    path = str(tmp_path / "intake.parquet")
+    with pytest.raises(SystemExit) as exc_info:
+        main(["intake", "-o", path, "--data-file", store.data_file])
+    assert exc_info.value.code == 1
+    assert "pyarrow" in capsys.readouterr().err
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + TMP_SUFFIX)
@@ -0,0 +1,101 @@
+"""食物自动补全索引：后台建立，之后随本实例和其他实例的写入增量更新"""
+import threading
+import time
+
+from health_core import make_intake_item
+from health_storage import JournalStore, SQLiteStore, migrate_json_to_sqlite
+
+
+def ready_index(store, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while store.food_index is None:
+        assert time.monotonic() < deadline, "食物索引没有在后台建立"
+        time.sleep(0.01)
+    return store.food_index
+
+
+def suggested(index, prefix):
+    return [food for food, _ in index.suggest(prefix)]
+
+
+def test_journal_store_index_follows_own_and_foreign_writes(tmp_path):
+    data_file = str(tmp_path / "health_data.json")
+    first = JournalStore(data_file)
+    first.load()
+    first.add_intake("2024-01-01", make_intake_item("苹果", 52))
+    first.save()
+
+    second = JournalStore(data_file)
+    second.load()
+    index = ready_index(second)
+    assert suggested(index, "苹") == ["苹果"]
+
+    second.add_intake("2024-01-02", make_intake_item("苹果派", 300))
+    first.add_intake("2024-01-02", make_intake_item("苹果汁", 120))
+    # 合并进快照后日志被删除，second 须重新读取快照才能并入
+    first.save()
+    second.sync()
+
+    # 重新读取快照后仍是同一个索引，没有被丢弃重建
+    assert second.food_index is index
+    assert sorted(suggested(index, "苹果")) == ["苹果", "苹果汁", "苹果派"]
+    assert index.last_calories("苹果汁") == 120
+    first.close()
+    second.close()
+
+
+def test_sqlite_store_index_follows_other_connections(tmp_path):
+    db_file = str(tmp_path / "health_data.db")
+    first = SQLiteStore(db_file)
+    first.load()
+    first.add_intake("2024-01-01", make_intake_item("Rice", 130))
+
+    second = SQLiteStore(db_file)
+    second.load()
+    index = ready_index(second)
+    assert suggested(index, "r") == ["Rice"]
+
+    first.add_intake("2024-01-02", make_intake_item("Rice noodles", 190))
+    second.sync()
+    second.add_intake("2024-01-03", make_intake_item("Ramen", 450))
+
+    assert second.food_index is index
+    assert sorted(suggested(index, "r")) == ["Ramen", "Rice", "Rice noodles"]
+    first.close()
+    second.close()
+
+
+def test_sqlite_close_stops_index_builder(tmp_path, monkeypatch):
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", lambda args: errors.append(args.exc_value))
+    db_file = str(tmp_path / "health_data.db")
+    store = SQLiteStore(db_file)
+    store.load()
+    store.add_many(intakes=[("2024-01-01", make_intake_item(f"food{i}", 100)) for i in range(2000)])
+    store.close()
+
+    # 打开后立即关闭：后台线程不能在连接关闭后再访问它
+    for _ in range(20):
+        store = SQLiteStore(db_file)
+        store.load()
+        store.close()
+    assert errors == []
+    assert not any(thread.name == "food-index" for thread in threading.enumerate())
+
+
+def test_migrate_json_to_sqlite(tmp_path, monkeypatch):
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", lambda args: errors.append(args.exc_value))
+    data_file = str(tmp_path / "health_data.json")
+    source = JournalStore(data_file)
+    source.load()
+    source.add_intake("2024-01-01", make_intake_item("米饭", 130))
+    source.add_intake("2024-01-02", make_intake_item("面条", 190))
+    source.close()
+
+    db_file = migrate_json_to_sqlite(data_file)
+    store = SQLiteStore(db_file)
+    store.load()
+    assert [item['food'] for _, item in store.iter_intake()] == ["米饭", "面条"]
+    store.close()
+    assert errors == []
@@ -0,0 +1,46 @@
+"""导入和 API 共用的逐行校验（health_import.parse_row）"""
+import math
+
+import pytest
+
+from health_core import InvalidInputError, make_bmi_record, make_bmr_record, make_intake_item
+from health_import import parse_row
+
+
+@pytest.mark.parametrize("row", [
+    {'type': 'bmi', 'date': "2024-01-01", 'weight': "nan", 'height': "170"},
+    {'type': 'bmi', 'date': "2024-01-01", 'weight': "inf", 'height': "170"},
+    {'type': 'bmi', 'date': "2024-01-01", 'weight': math.nan, 'height': 170},
+    {'type': 'bmi', 'date': "2024-01-01", 'weight': True, 'height': 170},
+    {'type': 'bmr', 'date': "2024-01-01", 'weight': 70, 'height': "-inf", 'age': 30,
+     'gender': "男", 'activity_level': 2},
+    {'type': 'bmr', 'date': "2024-01-01", 'weight': 70, 'height': 170, 'age': True,
+     'gender': "男", 'activity_level': 2},
+    {'type': 'intake', 'date': "2024-01-01", 'food': "米饭", 'calories': True},
+    {'type': 'intake', 'date': "2024-01-01", 'food': "米饭", 'calories': math.inf},
+])
+def test_parse_row_rejects_non_finite_and_boolean_values(row):
+    with pytest.raises(InvalidInputError):
+        parse_row(row)
+
+
+def test_parse_row_accepts_numeric_strings():
+    record_type, record = parse_row({'type': 'bmi', 'date': "2024-01-01", 'weight': "70.5", 'height': 175})
+    assert record_type == 'bmi'
+    assert record['weight'] == 70.5
+
+
+@pytest.mark.parametrize("make", [
+    lambda: make_bmi_record(math.nan, 170),
+    lambda: make_bmr_record(70, math.inf, 30, "男", 2),
+    lambda: make_intake_item("米饭", math.nan),
+])
+def test_core_rejects_non_finite_values(make):
+    with pytest.raises(InvalidInputError):
+        make()
+
+
+@pytest.mark.parametrize("calories", [True, 100.5, 100.0, "100"])
+def test_intake_calories_must_be_integer(calories):
+    with pytest.raises(InvalidInputError):
+        make_intake_item("米饭", calories)
@@ -0,0 +1,105 @@
+"""索引的增量更新，以及在一个线程修改、其他线程查询时的正确性"""
+import datetime
+import random
+import sys
+import threading
+
+from health_index import BmrDateIndex, FoodIndex, IntakeTotals
+
+
+def run_concurrently(lock, write, read, rounds=3000):
+    """一个线程持有 lock 写入，当前线程同时反复查询，返回查询中抛出的异常"""
+    errors = []
+    done = threading.Event()
+
+    def writer():
+        for i in range(rounds):
+            with lock:
+                write(i)
+        done.set()
+
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        thread = threading.Thread(target=writer)
+        thread.start()
+        while not done.is_set():
+            try:
+                read()
+            except Exception as e:
+                errors.append(e)
+                break
+        thread.join()
+    finally:
+        sys.setswitchinterval(old_interval)
+    return errors
+
+
+def day(i):
+    return f"{2000 + i // 336:04d}-{i // 28 % 12 + 1:02d}-{i % 28 + 1:02d}"
+
+
+def test_food_index_suggest_while_adding():
+    lock = threading.Lock()
+    index = FoodIndex(lock=lock)
+    errors = run_concurrently(lock, lambda i: index.add(day(i), f"a{i}", i),
+                              lambda: index.suggest("a"))
+    assert errors == []
+    assert len(index) == 3000
+
+
+def test_intake_totals_query_while_adding():
+    lock = threading.Lock()
+    totals = IntakeTotals(lock=lock)
+
+    def read():
+        totals.month_total("2001-06-15")
+        totals.days()
+
+    errors = run_concurrently(lock, lambda i: totals.add(day(i), 100), read)
+    assert errors == []
+    assert totals.total_between("2000-01-01", "2099-12-31") == 3000 * 100
+
+
+def test_bmr_index_query_while_inserting():
+    lock = threading.Lock()
+    index = BmrDateIndex(lock=lock)
+    errors = run_concurrently(lock, lambda i: index.insert({'date': day(i), 'tdee': 2000 + i}),
+                              lambda: index.latest_tdee("2099-01-01"))
+    assert errors == []
+    assert index.latest_tdee("2099-01-01") == 2000 + 2999
+
+
+def test_intake_totals_incremental_updates_match_recount():
+    rng = random.Random(1)
+    start = datetime.date(2024, 1, 1)
+    totals = IntakeTotals()
+    daily = {}
+    for i in range(500):
+        # 大多按时间先后添加，偶尔补录更早的日期
+        offset = i // 3 if rng.random() < 0.8 else rng.randrange(i // 3 + 1)
+        date = (start + datetime.timedelta(days=offset)).isoformat()
+        calories = rng.randint(1, 1000)
+        totals.add(date, calories)
+        daily[date] = daily.get(date, 0) + calories
+
+        query = start + datetime.timedelta(days=rng.randrange(200))
+        monday = query - datetime.timedelta(days=query.weekday())
+        week = [(monday + datetime.timedelta(days=d)).isoformat() for d in range(7)]
+        assert totals.week_total(query.isoformat()) == sum(daily.get(d, 0) for d in week)
+        month = query.isoformat()[:7]
+        assert totals.month_total(query.isoformat()) == sum(
+            total for d, total in daily.items() if d.startswith(month))
+        if rng.random() < 0.1:
+            assert totals.total_between("2024-01-01", "2024-12-31") == sum(daily.values())
+
+
+def test_intake_totals_appending_keeps_prefix():
+    totals = IntakeTotals({'2024-01-01': [{'calories': 100}]})
+    assert totals.total_between("2024-01-01", "2024-01-01") == 100
+    prefix = totals._prefix
+    totals.add("2024-01-01", 50)
+    totals.add("2024-01-05", 200)
+    assert totals._prefix is prefix
+    assert totals.total_between("2024-01-02", "2024-01-05") == 200
+    assert totals.total_between("2024-01-01", "2024-01-31") == 350
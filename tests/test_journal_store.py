@@ -0,0 +1,140 @@
+"""JournalStore 的日志写入、合并与崩溃恢复"""
+import json
+import os
+
+import pytest
+
+from health_core import make_intake_item
+from health_fileio import BACKUP_SUFFIX, TMP_SUFFIX
+from health_storage import JournalStore, empty_data, write_snapshot
+
+
+def open_store(path, **settings):
+    store = JournalStore(str(path))
+    for name, value in settings.items():
+        setattr(store, name, value)
+    store.load()
+    return store
+
+
+def foods(path):
+    store = open_store(path)
+    try:
+        return [item['food'] for _, item in store.iter_intake()]
+    finally:
+        store.close()
+
+
+def add_foods(store, names, date="2024-01-01"):
+    for name in names:
+        store.add_intake(date, make_intake_item(name, 100))
+
+
+def intake_data(names, date="2024-01-01"):
+    data = empty_data()
+    data['calorie_intake'][date] = [make_intake_item(name, 100) for name in names]
+    return data
+
+
+def journal_line(seq, name, date="2024-01-01"):
+    op = {'op': 'intake', 'date': date, 'item': make_intake_item(name, 100), 'seq': seq}
+    return json.dumps(op, ensure_ascii=False) + "\n"
+
+
+def write_journal(data_file, *lines):
+    with open(str(data_file) + ".journal", 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_journal_replay_skips_ops_already_in_snapshot(tmp_path, binary):
+    data_file = tmp_path / "health_data.json"
+    # 合并到序号 2 后、删除日志前中断：日志中前两条已在快照里
+    write_snapshot(str(data_file), intake_data(["f0", "f1"]), 2, binary=binary)
+    write_journal(data_file, journal_line(1, "f0"), journal_line(2, "f1"), journal_line(3, "f2"))
+
+    assert foods(data_file) == ["f0", "f1", "f2"]
+
+    # 新记录接着最大序号编号，再次加载时不会被当作已合并而跳过
+    store = open_store(data_file)
+    add_foods(store, ["f3"])
+    store.close()
+    assert foods(data_file) == ["f0", "f1", "f2", "f3"]
+
+
+def test_torn_journal_tail_is_truncated(tmp_path):
+    data_file = tmp_path / "health_data.json"
+    write_snapshot(str(data_file), empty_data(), 0)
+    valid = journal_line(1, "f0") + journal_line(2, "f1")
+    write_journal(data_file, valid, journal_line(3, "f2")[:20])
+
+    store = open_store(data_file)
+    assert [item['food'] for _, item in store.iter_intake()] == ["f0", "f1"]
+    assert store.recovery_notes
+    with open(str(data_file) + ".journal", encoding='utf-8') as f:
+        assert f.read() == valid
+
+    # 截掉残行后追加的记录能正常读回
+    add_foods(store, ["f2"])
+    store.close()
+    assert foods(data_file) == ["f0", "f1", "f2"]
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_corrupt_snapshot_recovers_from_backup_and_journal(tmp_path, binary):
+    data_file = tmp_path / "health_data.json"
+    write_snapshot(str(data_file), intake_data(["f0"]), 1, binary=binary)
+    write_snapshot(str(data_file), intake_data(["f0", "f1"]), 2, binary=binary)
+    assert os.path.exists(str(data_file) + BACKUP_SUFFIX)
+    # 快照损坏（中间被写坏），备份只到序号 1，序号 2 及之后仍在日志中
+    with open(data_file, 'r+b') as f:
+        f.seek(os.path.getsize(data_file) // 2)
+        f.write(b"\xff\x00garbage\x00")
+    write_journal(data_file, journal_line(2, "f1"), journal_line(3, "f2"))
+
+    store = open_store(data_file)
+    assert [item['food'] for _, item in store.iter_intake()] == ["f0", "f1", "f2"]
+    assert store.recovery_notes
+    store.close()
+    assert os.path.exists(str(data_file) + ".corrupt")
+    assert foods(data_file) == ["f0", "f1", "f2"]
+
+
+def test_missing_snapshot_recovers_from_backup(tmp_path):
+    data_file = tmp_path / "health_data.json"
+    write_snapshot(str(data_file), intake_data(["f0"]), 1)
+    write_snapshot(str(data_file), intake_data(["f0", "f1"]), 2)
+    os.remove(data_file)
+    write_journal(data_file, journal_line(2, "f1"))
+
+    assert foods(data_file) == ["f0", "f1"]
+
+
+def test_interrupted_replace_promotes_finished_temp_file(tmp_path):
+    data_file = tmp_path / "health_data.json"
+    write_snapshot(str(data_file), intake_data(["f0"]), 1)
+    write_snapshot(str(data_file), intake_data(["f0", "f1"]), 2)
+    # 原文件已改名为 .bak、临时文件还没改名时断电
+    os.replace(data_file, str(data_file) + TMP_SUFFIX)
+
+    store = open_store(data_file)
+    assert [item['food'] for _, item in store.iter_intake()] == ["f0", "f1"]
+    assert store.recovery_notes
+    store.close()
+    assert not os.path.exists(str(data_file) + TMP_SUFFIX)
+
+
+def test_rotation_failure_does_not_duplicate_batch(tmp_path):
+    data_file = tmp_path / "health_data.json"
+    store = open_store(data_file, COMPACT_THRESHOLD=1, RETRY_INTERVAL=0.01)
+
+    def fail_rotation():
+        raise PermissionError("日志正被其他实例使用")
+
+    store._rotate_journal = fail_rotation
+    add_foods(store, ["f0", "f1", "f2"])
+    store.close()
+    assert isinstance(store.compaction_error, PermissionError)
+    assert store.write_error is None
+
+    assert foods(data_file) == ["f0", "f1", "f2"]
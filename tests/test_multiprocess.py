@@ -0,0 +1,86 @@
+"""多个进程同时写同一个数据文件：文件锁、日志合并与快照合并"""
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from health_fileio import FileLock
+from health_storage import JournalStore, read_journal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程：写入若干条记录，合并阈值很小，写入期间会反复轮换日志和合并快照
+WRITER = """
+import sys
+from health_core import make_intake_item
+from health_storage import JournalStore
+
+data_file, name, count = sys.argv[1], sys.argv[2], int(sys.argv[3])
+store = JournalStore(data_file)
+store.COMPACT_THRESHOLD = 20
+store.COALESCE_WINDOW = 0.001
+store.load()
+for i in range(count):
+    store.add_intake("2024-01-01", make_intake_item(f"{name}-{i}", 100))
+    if i % 50 == 49:
+        store.save()
+store.close()
+"""
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_concurrent_writers_keep_every_record_once(tmp_path, binary):
+    data_file = str(tmp_path / "health_data.json")
+    store = JournalStore(data_file)
+    store.load()
+    store.binary = binary
+    store.save()
+    store.close()
+
+    names = ["p0", "p1", "p2"]
+    count = 200
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    writers = [subprocess.Popen([sys.executable, "-c", WRITER, data_file, name, str(count)], env=env)
+               for name in names]
+    for writer in writers:
+        assert writer.wait(timeout=120) == 0
+
+    store = JournalStore(data_file)
+    store.load()
+    foods = [item['food'] for _, item in store.iter_intake()]
+    store.close()
+
+    expected = [f"{name}-{i}" for name in names for i in range(count)]
+    assert sorted(foods) == sorted(expected)
+
+    # 尚未合并的日志中序号不重复
+    seqs = [op['seq'] for path in (data_file + ".compacting", data_file + ".journal")
+            for op in read_journal(path)]
+    assert len(seqs) == len(set(seqs))
+
+
+def test_file_lock_excludes_other_holders(tmp_path):
+    path = str(tmp_path / "data.lock")
+    holder = FileLock(path)
+    other = FileLock(path, timeout=0.05)
+    holder.acquire()
+    try:
+        # 另一个锁对象（另一个进程或另一份打开的锁文件）拿不到锁
+        with pytest.raises(TimeoutError):
+            other.acquire()
+    finally:
+        holder.release()
+    with other:
+        pass
+
+    # 同一个锁对象在线程之间同样互斥
+    order = []
+    with holder:
+        thread = threading.Thread(target=lambda: (holder.acquire(), order.append("thread"), holder.release()))
+        thread.start()
+        thread.join(0.05)
+        order.append("main")
+    thread.join()
+    assert order == ["main", "thread"]
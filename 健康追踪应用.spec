@@ -5,8 +5,8 @@ a = Analysis(
     ['C:\\Users\\11\\Desktop\\健康追踪应用\\health_tracker_app.py'],
     pathex=[],
     binaries=[],
-    datas=[],
-    hiddenimports=[],
+    datas=[('food_nutrition.csv', '.')],
+    hiddenimports=['babel.numbers'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],